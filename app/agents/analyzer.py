@@ -1,11 +1,11 @@
 import json
 import logging
-from langchain_aws import ChatBedrock
 from langchain_core.messages import HumanMessage, SystemMessage
 from pydantic import BaseModel, Field
 from enum import Enum
 from typing import TypedDict, Optional, Any
-from app.config import settings
+from app.core.executor import run_blocking
+from app.core.llm import get_llm
 
 logger = logging.getLogger(__name__)
 
@@ -81,35 +81,41 @@ def parse_analysis_result(llm_output: str) -> AnalysisResult:
     return AnalysisResult(**data)
 
 
-def analyze(state: AgentState) -> dict[str, Any]:
-    try:
-        task = state["original_task"]
-        llm = ChatBedrock(
-            model_id=settings.BEDROCK_MODEL_ID,
-            region_name=settings.AWS_REGION,
-            model_kwargs={
-                "max_tokens": 2000,
-                "temperature": 0.0,
-            },
-        )
-
-        messages = [
-            SystemMessage(content=SYSTEM_PROMPT),
-            HumanMessage(content=create_user_prompt(task)),
-        ]
-        response = llm.invoke(messages)
-        result = parse_analysis_result(response.content)
-        return {"analysis": result.model_dump()}
+def _messages(task: str) -> list:
+    return [
+        SystemMessage(content=SYSTEM_PROMPT),
+        HumanMessage(content=create_user_prompt(task)),
+    ]
 
-    except json.JSONDecodeError as e:
+
+def _error_output(e: Exception) -> dict[str, Any]:
+    if isinstance(e, json.JSONDecodeError):
         logger.error("[analyzer] JSONパースエラー: %s", e, exc_info=True)
         return {
             "analysis": None,
             "error": f"JSON パースエラー: {e}"
         }
+    logger.error("[analyzer] 分析エラー: %s", e, exc_info=True)
+    return {
+        "analysis": None,
+        "error": f"分析エラー: {e}"
+    }
+
+
+def analyze(state: AgentState) -> dict[str, Any]:
+    try:
+        response = get_llm().invoke(_messages(state["original_task"]))
+        result = parse_analysis_result(response.content)
+        return {"analysis": result.model_dump(mode="json")}
     except Exception as e:
-        logger.error("[analyzer] 分析エラー: %s", e, exc_info=True)
-        return {
-            "analysis": None,
-            "error": f"分析エラー: {e}"
-        }
+        return _error_output(e)
+
+
+async def aanalyze(state: AgentState) -> dict[str, Any]:
+    """analyze の非同期版。LLM の応答待ちは AWS I/O 専用スレッドプールで行う。"""
+    try:
+        response = await run_blocking(get_llm().invoke, _messages(state["original_task"]))
+        result = parse_analysis_result(response.content)
+        return {"analysis": result.model_dump(mode="json")}
+    except Exception as e:
+        return _error_output(e)
@@ -0,0 +1,504 @@
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Iterator, Optional, Sequence
+
+from boto3.dynamodb.conditions import Key
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+    writes_sort_key,
+)
+
+from app.config import settings
+from app.core.aws_clients import get_dynamodb_table
+from app.core.executor import run_blocking
+
+logger = logging.getLogger(__name__)
+
+# 保存形式: (serde の型名, バイト列)
+Typed = tuple[str, bytes]
+
+
+class _StoredCheckpointSaver(BaseCheckpointSaver):
+    """チェックポイントを丸ごと1レコードとして保存する checkpointer の共通部分。
+
+    エージェントの state は小さいので、チャネルごとに分けずに checkpoint 全体を直列化する。
+    サブクラスは thread_id（= task_id）単位の読み書きだけを実装する。
+    非同期版は AWS I/O 専用スレッドプールで同期版を呼ぶ（astream から使うため）。
+    """
+
+    # ---- サブクラスが実装する保存先の操作 ----
+
+    def _load(self, thread_id: str, ns: str, checkpoint_id: Optional[str]) -> Optional[dict[str, Any]]:
+        """checkpoint_id が None なら最新のレコードを返す。"""
+        raise NotImplementedError
+
+    def _load_many(
+        self, thread_id: str, ns: str, before: Optional[str], limit: Optional[int]
+    ) -> list[dict[str, Any]]:
+        """新しい順にレコードを返す。"""
+        raise NotImplementedError
+
+    def _save(self, thread_id: str, ns: str, record: dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def _load_writes(self, thread_id: str, ns: str, checkpoint_id: str) -> list[dict[str, Any]]:
+        raise NotImplementedError
+
+    def _save_writes(
+        self, thread_id: str, ns: str, checkpoint_id: str, rows: list[dict[str, Any]]
+    ) -> None:
+        raise NotImplementedError
+
+    # ---- BaseCheckpointSaver ----
+
+    def _to_tuple(self, thread_id: str, ns: str, record: dict[str, Any]) -> CheckpointTuple:
+        checkpoint_id = record["checkpointId"]
+        writes = sorted(
+            self._load_writes(thread_id, ns, checkpoint_id),
+            key=lambda w: writes_sort_key(w["taskPath"], w["taskId"], w["idx"]),
+        )
+        parent_id = record.get("parentCheckpointId")
+        return CheckpointTuple(
+            config=_config(thread_id, ns, checkpoint_id),
+            checkpoint=self.serde.loads_typed(record["checkpoint"]),
+            metadata=self.serde.loads_typed(record["metadata"]),
+            parent_config=_config(thread_id, ns, parent_id) if parent_id else None,
+            pending_writes=[
+                (w["taskId"], w["channel"], self.serde.loads_typed(w["value"])) for w in writes
+            ],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        record = self._load(thread_id, ns, get_checkpoint_id(config))
+        return self._to_tuple(thread_id, ns, record) if record else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        if not config:
+            raise ValueError("チェックポイントの一覧には thread_id が必要です")
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        before_id = get_checkpoint_id(before) if before else None
+        # メタデータで絞り込む場合は件数を保存先に渡せない
+        records = self._load_many(thread_id, ns, before_id, None if filter else limit)
+        count = 0
+        for record in records:
+            if checkpoint_id and record["checkpointId"] != checkpoint_id:
+                continue
+            if filter:
+                metadata = self.serde.loads_typed(record["metadata"])
+                if any(metadata.get(k) != v for k, v in filter.items()):
+                    continue
+            if limit is not None and count >= limit:
+                return
+            count += 1
+            yield self._to_tuple(thread_id, ns, record)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        self._save(thread_id, ns, {
+            "checkpointId": checkpoint["id"],
+            "parentCheckpointId": config["configurable"].get("checkpoint_id"),
+            "checkpoint": self.serde.dumps_typed(checkpoint),
+            "metadata": self.serde.dumps_typed(get_checkpoint_metadata(config, metadata)),
+        })
+        return _config(thread_id, ns, checkpoint["id"])
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        rows = [
+            {
+                "taskId": task_id,
+                "taskPath": task_path,
+                "idx": WRITES_IDX_MAP.get(channel, idx),
+                "channel": channel,
+                "value": self.serde.dumps_typed(value),
+            }
+            for idx, (channel, value) in enumerate(writes)
+        ]
+        self._save_writes(thread_id, ns, config["configurable"]["checkpoint_id"], rows)
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await run_blocking(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        tuples = await run_blocking(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for checkpoint_tuple in tuples:
+            yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await run_blocking(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await run_blocking(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await run_blocking(self.delete_thread, thread_id)
+
+
+def _config(thread_id: str, ns: str, checkpoint_id: str) -> RunnableConfig:
+    return {"configurable": {
+        "thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": checkpoint_id,
+    }}
+
+
+class DynamoDBCheckpointSaver(_StoredCheckpointSaver):
+    """チェックポイントを DynamoDB に保存する。
+
+    パーティションキー `threadId` (S)、ソートキー `sortKey` (S)。チェックポイントは
+    `checkpoint#<ns>#<checkpointId>`、途中の書き込みは `writes#<ns>#<checkpointId>#...` に置く。
+    checkpointId は時刻順に増えるので、ソートキーの降順がそのまま新しい順になる。
+    `expiresAt` (N) を TTL 属性として設定しておくこと。
+    """
+
+    def __init__(self, table_name: str, ttl_seconds: int):
+        super().__init__()
+        self._table_name = table_name
+        self._ttl_seconds = ttl_seconds
+
+    @property
+    def _table(self):
+        return get_dynamodb_table(self._table_name)
+
+    def _expires_at(self) -> int:
+        return int(time.time()) + self._ttl_seconds
+
+    @staticmethod
+    def _typed(item: dict[str, Any], name: str) -> Typed:
+        return item[f"{name}Type"], bytes(item[name])
+
+    def _to_record(self, item: dict[str, Any]) -> dict[str, Any]:
+        return {
+            "checkpointId": item["checkpointId"],
+            "parentCheckpointId": item.get("parentCheckpointId"),
+            "checkpoint": self._typed(item, "checkpoint"),
+            "metadata": self._typed(item, "metadata"),
+        }
+
+    def _query(self, **params) -> list[dict[str, Any]]:
+        items: list[dict[str, Any]] = []
+        while True:
+            response = self._table.query(**params)
+            items.extend(response.get("Items", []))
+            if "LastEvaluatedKey" not in response or (
+                "Limit" in params and len(items) >= params["Limit"]
+            ):
+                return items
+            params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    def _load(self, thread_id: str, ns: str, checkpoint_id: Optional[str]) -> Optional[dict[str, Any]]:
+        if checkpoint_id:
+            item = self._table.get_item(
+                Key={"threadId": thread_id, "sortKey": f"checkpoint#{ns}#{checkpoint_id}"}
+            ).get("Item")
+            return self._to_record(item) if item else None
+        records = self._load_many(thread_id, ns, None, 1)
+        return records[0] if records else None
+
+    def _load_many(
+        self, thread_id: str, ns: str, before: Optional[str], limit: Optional[int]
+    ) -> list[dict[str, Any]]:
+        prefix = f"checkpoint#{ns}#"
+        condition = Key("threadId").eq(thread_id)
+        if before:
+            condition &= Key("sortKey").between(prefix, f"{prefix}{before}")
+        else:
+            condition &= Key("sortKey").begins_with(prefix)
+        params: dict[str, Any] = {"KeyConditionExpression": condition, "ScanIndexForward": False}
+        if limit is not None:
+            params["Limit"] = limit + 1 if before else limit
+        items = [
+            item for item in self._query(**params)
+            if not before or item["checkpointId"] < before
+        ]
+        return [self._to_record(item) for item in items[:limit]]
+
+    def _save(self, thread_id: str, ns: str, record: dict[str, Any]) -> None:
+        (checkpoint_type, checkpoint), (metadata_type, metadata) = record["checkpoint"], record["metadata"]
+        item = {
+            "threadId": thread_id,
+            "sortKey": f"checkpoint#{ns}#{record['checkpointId']}",
+            "checkpointId": record["checkpointId"],
+            "checkpointType": checkpoint_type,
+            "checkpoint": checkpoint,
+            "metadataType": metadata_type,
+            "metadata": metadata,
+            "expiresAt": self._expires_at(),
+        }
+        if record["parentCheckpointId"]:
+            item["parentCheckpointId"] = record["parentCheckpointId"]
+        self._table.put_item(Item=item)
+
+    def _load_writes(self, thread_id: str, ns: str, checkpoint_id: str) -> list[dict[str, Any]]:
+        items = self._query(
+            KeyConditionExpression=Key("threadId").eq(thread_id)
+            & Key("sortKey").begins_with(f"writes#{ns}#{checkpoint_id}#"),
+        )
+        return [
+            {
+                "taskId": item["taskId"],
+                "taskPath": item.get("taskPath", ""),
+                "idx": int(item["idx"]),
+                "channel": item["channel"],
+                "value": self._typed(item, "value"),
+            }
+            for item in items
+        ]
+
+    def _save_writes(
+        self, thread_id: str, ns: str, checkpoint_id: str, rows: list[dict[str, Any]]
+    ) -> None:
+        expires_at = self._expires_at()
+        with self._table.batch_writer(overwrite_by_pkeys=["threadId", "sortKey"]) as batch:
+            for row in rows:
+                value_type, value = row["value"]
+                batch.put_item(Item={
+                    "threadId": thread_id,
+                    "sortKey": f"writes#{ns}#{checkpoint_id}#{row['taskId']}#{row['idx']}",
+                    "taskId": row["taskId"],
+                    "taskPath": row["taskPath"],
+                    "idx": row["idx"],
+                    "channel": row["channel"],
+                    "valueType": value_type,
+                    "value": value,
+                    "expiresAt": expires_at,
+                })
+
+    def delete_thread(self, thread_id: str) -> None:
+        items = self._query(
+            KeyConditionExpression=Key("threadId").eq(thread_id),
+            ProjectionExpression="threadId, sortKey",
+        )
+        with self._table.batch_writer() as batch:
+            for item in items:
+                batch.delete_item(Key={"threadId": item["threadId"], "sortKey": item["sortKey"]})
+
+
+class SQLiteCheckpointSaver(_StoredCheckpointSaver):
+    """チェックポイントを SQLite（WAL モード）に保存する（ローカル開発用）。"""
+
+    def __init__(self, path: Path):
+        super().__init__()
+        self._path = path
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._connect().executescript(
+            """
+            BEGIN;
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                thread_id            TEXT NOT NULL,
+                checkpoint_ns        TEXT NOT NULL,
+                checkpoint_id        TEXT NOT NULL,
+                parent_checkpoint_id TEXT,
+                checkpoint_type      TEXT NOT NULL,
+                checkpoint           BLOB NOT NULL,
+                metadata_type        TEXT NOT NULL,
+                metadata             BLOB NOT NULL,
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+            );
+            CREATE TABLE IF NOT EXISTS writes (
+                thread_id     TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL,
+                checkpoint_id TEXT NOT NULL,
+                task_id       TEXT NOT NULL,
+                idx           INTEGER NOT NULL,
+                task_path     TEXT NOT NULL,
+                channel       TEXT NOT NULL,
+                value_type    TEXT NOT NULL,
+                value         BLOB NOT NULL,
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+            );
+            COMMIT;
+            """
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _to_record(row: sqlite3.Row) -> dict[str, Any]:
+        return {
+            "checkpointId": row["checkpoint_id"],
+            "parentCheckpointId": row["parent_checkpoint_id"],
+            "checkpoint": (row["checkpoint_type"], row["checkpoint"]),
+            "metadata": (row["metadata_type"], row["metadata"]),
+        }
+
+    def _load(self, thread_id: str, ns: str, checkpoint_id: Optional[str]) -> Optional[dict[str, Any]]:
+        if checkpoint_id:
+            row = self._connect().execute(
+                """
+                SELECT * FROM checkpoints
+                WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?
+                """,
+                (thread_id, ns, checkpoint_id),
+            ).fetchone()
+            return self._to_record(row) if row else None
+        records = self._load_many(thread_id, ns, None, 1)
+        return records[0] if records else None
+
+    def _load_many(
+        self, thread_id: str, ns: str, before: Optional[str], limit: Optional[int]
+    ) -> list[dict[str, Any]]:
+        rows = self._connect().execute(
+            """
+            SELECT * FROM checkpoints
+            WHERE thread_id = ? AND checkpoint_ns = ? AND (? IS NULL OR checkpoint_id < ?)
+            ORDER BY checkpoint_id DESC LIMIT ?
+            """,
+            (thread_id, ns, before, before, -1 if limit is None else limit),
+        ).fetchall()
+        return [self._to_record(row) for row in rows]
+
+    def _save(self, thread_id: str, ns: str, record: dict[str, Any]) -> None:
+        (checkpoint_type, checkpoint), (metadata_type, metadata) = record["checkpoint"], record["metadata"]
+        self._connect().execute(
+            """
+            INSERT OR REPLACE INTO checkpoints
+                (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id,
+                 checkpoint_type, checkpoint, metadata_type, metadata)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                thread_id, ns, record["checkpointId"], record["parentCheckpointId"],
+                checkpoint_type, checkpoint, metadata_type, metadata,
+            ),
+        )
+
+    def _load_writes(self, thread_id: str, ns: str, checkpoint_id: str) -> list[dict[str, Any]]:
+        rows = self._connect().execute(
+            """
+            SELECT * FROM writes
+            WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?
+            """,
+            (thread_id, ns, checkpoint_id),
+        ).fetchall()
+        return [
+            {
+                "taskId": row["task_id"],
+                "taskPath": row["task_path"],
+                "idx": row["idx"],
+                "channel": row["channel"],
+                "value": (row["value_type"], row["value"]),
+            }
+            for row in rows
+        ]
+
+    def _save_writes(
+        self, thread_id: str, ns: str, checkpoint_id: str, rows: list[dict[str, Any]]
+    ) -> None:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                """
+                INSERT OR REPLACE INTO writes
+                    (thread_id, checkpoint_ns, checkpoint_id, task_id, idx,
+                     task_path, channel, value_type, value)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    (
+                        thread_id, ns, checkpoint_id, row["taskId"], row["idx"],
+                        row["taskPath"], row["channel"], *row["value"],
+                    )
+                    for row in rows
+                ],
+            )
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def delete_thread(self, thread_id: str) -> None:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+            conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+
+def create_checkpointer() -> Optional[BaseCheckpointSaver]:
+    """settings.CHECKPOINT_BACKEND に応じた checkpointer を返す（none なら None）。
+
+    未指定なら DYNAMODB_CHECKPOINT_TABLE があれば DynamoDB、なければ SQLite を使う。
+    """
+    backend = settings.CHECKPOINT_BACKEND or (
+        "dynamodb" if settings.DYNAMODB_CHECKPOINT_TABLE else "sqlite"
+    )
+    if backend == "dynamodb":
+        return DynamoDBCheckpointSaver(
+            settings.DYNAMODB_CHECKPOINT_TABLE,
+            ttl_seconds=settings.checkpoint_ttl_days * 86400,
+        )
+    if backend == "sqlite":
+        return SQLiteCheckpointSaver(Path(settings.LOCAL_CHECKPOINT_DB))
+    if backend == "none":
+        return None
+    raise ValueError(f"未知の CHECKPOINT_BACKEND です: {backend}")
@@ -2,9 +2,9 @@ import json
 import logging
 from pydantic import BaseModel, Field
 from typing import Any
-from langchain_aws import ChatBedrock
 from langchain_core.messages import SystemMessage, HumanMessage
-from app.config import settings
+from app.core.executor import run_blocking
+from app.core.llm import get_llm
 
 logger = logging.getLogger(__name__)
 
@@ -93,39 +93,49 @@ def parse_decomposition_result(llm_output: str) -> DecompositionResult:
     data = json.loads(json_str)
     return DecompositionResult(**data)
 
-def decompose(state: dict) -> dict[str, Any]:
-    try:
-        task = state["original_task"]
-        analysis = state.get("analysis")
-
-        # Nullガード: 前のノード(analyzer)が失敗していたらスキップ
-        if not analysis:
-            logger.warning("[decomposer] analysisがNullのためスキップ")
-            return {"subtasks": None, "error": "前段(analyzer)が失敗したためスキップ"}
-
-        llm = ChatBedrock(
-            model_id=settings.BEDROCK_MODEL_ID,
-            region_name=settings.AWS_REGION,
-            model_kwargs={
-                "max_tokens": 2000,
-                "temperature": 0.0,
-            },
-        )
+def _messages(task: str, analysis: dict) -> list:
+    return [
+        SystemMessage(content=SYSTEM_PROMPT),
+        HumanMessage(content=create_user_prompt(task, analysis))
+    ]
 
-        messages = [
-            SystemMessage(content=SYSTEM_PROMPT),
-            HumanMessage(content=create_user_prompt(task, analysis))
-        ]
+def _output(llm_output: str) -> dict[str, Any]:
+    result = parse_decomposition_result(llm_output)
+    return {
+        "subtasks": [st.model_dump() for st in result.subtasks]
+    }
 
-        response = llm.invoke(messages)
-        result = parse_decomposition_result(response.content)
-        return {
-            "subtasks": [st.model_dump() for st in result.subtasks]
-        }
+def _skipped() -> dict[str, Any]:
+    # Nullガード: 前のノード(analyzer)が失敗していたらスキップ
+    logger.warning("[decomposer] analysisがNullのためスキップ")
+    return {"subtasks": None, "error": "前段(analyzer)が失敗したためスキップ"}
 
-    except json.JSONDecodeError as e:
+def _error_output(e: Exception) -> dict[str, Any]:
+    if isinstance(e, json.JSONDecodeError):
         logger.error("[decomposer] JSONパースエラー: %s", e, exc_info=True)
         return {"subtasks": None, "error": f"JSONパースエラー: {e}"}
+    logger.error("[decomposer] 分解エラー: %s", e, exc_info=True)
+    return {"subtasks": None, "error": f"分解エラー: {e}"}
+
+def decompose(state: dict) -> dict[str, Any]:
+    analysis = state.get("analysis")
+    if not analysis:
+        return _skipped()
+    try:
+        response = get_llm().invoke(_messages(state["original_task"], analysis))
+        return _output(response.content)
+    except Exception as e:
+        return _error_output(e)
+
+async def adecompose(state: dict) -> dict[str, Any]:
+    """decompose の非同期版。LLM の応答待ちは AWS I/O 専用スレッドプールで行う。"""
+    analysis = state.get("analysis")
+    if not analysis:
+        return _skipped()
+    try:
+        response = await run_blocking(
+            get_llm().invoke, _messages(state["original_task"], analysis)
+        )
+        return _output(response.content)
     except Exception as e:
-        logger.error("[decomposer] 分解エラー: %s", e, exc_info=True)
-        return {"subtasks": None, "error": f"分解エラー: {e}"}
+        return _error_output(e)
@@ -1,9 +1,13 @@
+import asyncio
+import contextvars
 import json
 import logging
-from langchain_aws import ChatBedrock
+from concurrent.futures import ThreadPoolExecutor
 from langchain_core.messages import HumanMessage, SystemMessage
 from pydantic import BaseModel, Field
 from app.config import settings
+from app.core.executor import run_blocking
+from app.core.llm import get_llm
 from typing import Any
 
 logger = logging.getLogger(__name__)
@@ -87,39 +91,131 @@ def parse_estimator_result(llm_output: str) -> EstimatorResult:
     data = json.loads(json_str)
     return EstimatorResult(**data)
 
+def _messages(task: str, subtasks: list[dict]) -> list:
+    return [
+        SystemMessage(content=SYSTEM_PROMPT),
+        HumanMessage(content=create_user_prompt(task, subtasks))
+    ]
+
+
+def _log_retry(attempt: int, attempts: int, e: Exception) -> None:
+    logger.warning(
+        "[estimator] バッチの見積もりに失敗（%d/%d 回目、再試行します）: %s",
+        attempt, attempts, e,
+    )
+
+
+def _estimate_batch(llm, task: str, subtasks: list[dict]) -> EstimatorResult:
+    """サブタスクの一部を見積もる。JSON の崩れなどで失敗したらこのバッチだけやり直す。"""
+    messages = _messages(task, subtasks)
+    attempts = settings.estimator_batch_retries + 1
+    for attempt in range(1, attempts + 1):
+        try:
+            response = llm.invoke(messages)
+            return parse_estimator_result(response.content)
+        except Exception as e:
+            if attempt == attempts:
+                raise
+            _log_retry(attempt, attempts, e)
+
+
+async def _aestimate_batch(
+    llm, task: str, subtasks: list[dict], semaphore: asyncio.Semaphore
+) -> EstimatorResult:
+    """_estimate_batch の非同期版。同時に LLM を呼ぶバッチ数は semaphore で抑える。"""
+    messages = _messages(task, subtasks)
+    attempts = settings.estimator_batch_retries + 1
+    for attempt in range(1, attempts + 1):
+        try:
+            async with semaphore:
+                response = await run_blocking(llm.invoke, messages)
+            return parse_estimator_result(response.content)
+        except Exception as e:
+            if attempt == attempts:
+                raise
+            _log_retry(attempt, attempts, e)
+
+
+def _batches(sub_tasks: list[dict]) -> list[list[dict]]:
+    # サブタスクをバッチに分けて並列に見積もる（出力トークン上限で JSON が切れるのを防ぐ）
+    size = settings.estimator_batch_size
+    return [sub_tasks[i:i + size] for i in range(0, len(sub_tasks), size)]
+
+
+def _merge(
+    batches: list[list[dict]], outcomes: list[EstimatorResult | BaseException]
+) -> dict[str, Any]:
+    """バッチごとの結果（失敗したバッチは例外）をまとめ、合計時間を計算し直す。"""
+    estimates: list[TimeEstimate] = []
+    failed: list[str] = []
+    for batch, outcome in zip(batches, outcomes):
+        if isinstance(outcome, BaseException):
+            logger.error("[estimator] バッチの見積もりエラー: %s", outcome, exc_info=outcome)
+            failed.extend(st["id"] for st in batch)
+        else:
+            estimates.extend(outcome.estimates)
+
+    if not estimates:
+        return {"estimates": None, "error": "見積もりエラー: 全てのバッチが失敗しました"}
+
+    result = {
+        "estimates": [est.model_dump() for est in estimates],
+        "total_minutes": sum(est.estimated_minutes for est in estimates),
+    }
+    if failed:
+        result["error"] = f"一部のサブタスクの見積もりに失敗: {', '.join(failed)}"
+    return result
+
+
+def _skipped() -> dict[str, Any]:
+    # Nullガード: 前のノード(decomposer)が失敗していたらスキップ
+    logger.warning("[estimator] subtasksがNullのためスキップ")
+    return {"estimates": None, "error": "前段(decomposer)が失敗したためスキップ"}
+
+
+def _outcome(future) -> EstimatorResult | BaseException:
+    try:
+        return future.result()
+    except Exception as e:
+        return e
+
+
 def estimate(state: dict) -> dict[str, Any]:
+    sub_tasks = state.get("subtasks")
+    if not sub_tasks:
+        return _skipped()
     try:
         task = state["original_task"]
-        sub_tasks = state.get("subtasks")
-
-        # Nullガード: 前のノード(decomposer)が失敗していたらスキップ
-        if not sub_tasks:
-            logger.warning("[estimator] subtasksがNullのためスキップ")
-            return {"estimates": None, "error": "前段(decomposer)が失敗したためスキップ"}
-
-        llm = ChatBedrock(
-            model_id=settings.BEDROCK_MODEL_ID,
-            region_name=settings.AWS_REGION,
-            model_kwargs={
-                "max_tokens": 2000,
-                "temperature": 0.0,
-            },
-        )
+        llm = get_llm()
+        batches = _batches(sub_tasks)
+        with ThreadPoolExecutor(
+            max_workers=min(settings.estimator_concurrency, len(batches))
+        ) as pool:
+            futures = [
+                pool.submit(contextvars.copy_context().run, _estimate_batch, llm, task, batch)
+                for batch in batches
+            ]
+        return _merge(batches, [_outcome(future) for future in futures])
+    except Exception as e:
+        logger.error("[estimator] 見積もりエラー: %s", e, exc_info=True)
+        return {"estimates": None, "error": f"見積もりエラー: {e}"}
 
-        messages = [
-            SystemMessage(content=SYSTEM_PROMPT),
-            HumanMessage(content=create_user_prompt(task, sub_tasks))
-        ]
 
-        response = llm.invoke(messages)
-        result = parse_estimator_result(response.content)
-        return {
-            "estimates": [st.model_dump() for st in result.estimates],
-            "total_minutes": result.total_minutes
-        }
-    except json.JSONDecodeError as e:
-        logger.error("[estimator] JSONパースエラー: %s", e, exc_info=True)
-        return {"estimates": None, "error": f"JSONパースエラー: {e}"}
+async def aestimate(state: dict) -> dict[str, Any]:
+    """estimate の非同期版。バッチはイベントループ上で並行に待つ。"""
+    sub_tasks = state.get("subtasks")
+    if not sub_tasks:
+        return _skipped()
+    try:
+        task = state["original_task"]
+        llm = get_llm()
+        batches = _batches(sub_tasks)
+        semaphore = asyncio.Semaphore(settings.estimator_concurrency)
+        outcomes = await asyncio.gather(
+            *(_aestimate_batch(llm, task, batch, semaphore) for batch in batches),
+            return_exceptions=True,
+        )
+        return _merge(batches, outcomes)
     except Exception as e:
         logger.error("[estimator] 見積もりエラー: %s", e, exc_info=True)
         return {"estimates": None, "error": f"見積もりエラー: {e}"}
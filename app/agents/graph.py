@@ -1,11 +1,18 @@
 from langgraph.graph import StateGraph,START,END
 from typing import TypedDict,Optional,Any
 
-from .analyzer import analyze
-from .decomposer import decompose
-from .estimator import estimate
-from .prioritizer import prioritize
-from .scheduler import schedule
+from datetime import date
+
+from app.config import settings
+
+from . import analyzer, decomposer, estimator, prioritizer, scheduler
+from .analyzer import aanalyze, analyze
+from .checkpoint import create_checkpointer
+from .decomposer import adecompose, decompose
+from .estimator import aestimate, estimate
+from .memo import memoize_node
+from .prioritizer import aprioritize, prioritize
+from .scheduler import aschedule, schedule
 
 class  AgentState(TypedDict):
     original_task: str
@@ -19,13 +26,47 @@ class  AgentState(TypedDict):
     warnings:Optional[list[str]]
     error:Optional[str]
 
+# ノードの実行順と、各ノードが成功したときに state に書くキー
+PIPELINE = [
+    ("analyzer", "analysis"),
+    ("decomposer", "subtasks"),
+    ("estimator", "estimates"),
+    ("prioritizer", "priorities"),
+    ("scheduler", "schedule"),
+]
+
+def _scheduler_cache_extra():
+    if settings.SCHEDULER_MODE != "local":
+        return settings.SCHEDULER_MODE
+    return [
+        settings.SCHEDULER_MODE,
+        date.today().isoformat(),
+        settings.schedule_day_start, settings.schedule_day_end,
+        settings.schedule_lunch_start, settings.schedule_lunch_end,
+        settings.schedule_break_minutes, settings.schedule_min_segment_minutes,
+        settings.schedule_holidays,
+    ]
+
 def create_agent_graph():
     builder = StateGraph(AgentState)
-    builder.add_node("analyzer",analyze)
-    builder.add_node("decomposer",decompose)
-    builder.add_node("estimator",estimate)
-    builder.add_node("prioritizer",prioritize)
-    builder.add_node("scheduler",schedule)
+    # 同じ入力のノードは前回の出力を再利用する（各ノードが読む state のキーだけをキーに含める）
+    # 各ノードは同期版と非同期版を持ち、astream では非同期版がイベントループ上で直接動く
+    builder.add_node("analyzer",memoize_node(
+        "analyzer", analyze, aanalyze, ["original_task"], analyzer.SYSTEM_PROMPT))
+    builder.add_node("decomposer",memoize_node(
+        "decomposer", decompose, adecompose, ["original_task", "analysis"],
+        decomposer.SYSTEM_PROMPT))
+    builder.add_node("estimator",memoize_node(
+        "estimator", estimate, aestimate, ["original_task", "subtasks"],
+        estimator.SYSTEM_PROMPT))
+    builder.add_node("prioritizer",memoize_node(
+        "prioritizer", prioritize, aprioritize, ["original_task", "subtasks", "estimates"],
+        prioritizer.SYSTEM_PROMPT))
+    # ローカルのスケジューラは開始日（今日）と作業時間の設定で結果が変わる
+    builder.add_node("scheduler",memoize_node(
+        "scheduler", schedule, aschedule,
+        ["original_task", "subtasks", "estimates", "priorities"],
+        scheduler.SYSTEM_PROMPT, extra=_scheduler_cache_extra))
 
     builder.add_edge(START, "analyzer")
     builder.add_edge("analyzer", "decomposer")
@@ -34,6 +75,10 @@ def create_agent_graph():
     builder.add_edge("prioritizer", "scheduler")
     builder.add_edge("scheduler", END)
 
-    return builder.compile()
+    # task_id を thread_id にして各ノードの完了ごとに state を保存する
+    return builder.compile(checkpointer=create_checkpointer())
+
+def thread_config(task_id: str) -> dict[str, Any]:
+    return {"configurable": {"thread_id": task_id}}
 
 agent_graph = create_agent_graph()
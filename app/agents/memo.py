@@ -0,0 +1,115 @@
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional
+
+from langchain_core.runnables import Runnable, RunnableLambda
+
+from app.config import settings
+from app.core.cache import CacheBackend, DynamoDBCache, MemoryCache, SQLiteCache
+from app.core.executor import run_blocking
+
+logger = logging.getLogger(__name__)
+
+NodeFunc = Callable[[dict], dict[str, Any]]
+AsyncNodeFunc = Callable[[dict], Awaitable[dict[str, Any]]]
+
+
+def _create_node_cache() -> Optional[CacheBackend]:
+    backend = settings.NODE_CACHE_BACKEND
+    if backend == "memory":
+        return MemoryCache(
+            max_entries=settings.node_cache_max_entries,
+            ttl_seconds=settings.node_cache_ttl_seconds,
+        )
+    if backend == "dynamodb":
+        if not settings.DYNAMODB_CACHE_TABLE:
+            logger.warning("DYNAMODB_CACHE_TABLE 未設定 → ノードキャッシュを無効化します")
+            return None
+        return DynamoDBCache(
+            table_name=settings.DYNAMODB_CACHE_TABLE,
+            ttl_seconds=settings.node_cache_ttl_seconds,
+            namespace="node",
+        )
+    if backend == "sqlite":
+        return SQLiteCache(
+            Path(settings.LOCAL_NODE_CACHE_DB),
+            ttl_seconds=settings.node_cache_ttl_seconds,
+            namespace="node",
+        )
+    return None
+
+
+node_cache = _create_node_cache()
+
+
+def prompt_version(prompt: str) -> str:
+    """プロンプト本文から版を作る。プロンプトを書き換えると古いキャッシュは使われなくなる。"""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+
+
+def make_node_key(
+    node: str, version: str, inputs: dict[str, Any], extra: Any = None
+) -> str:
+    """ノード名・モデルID・プロンプトの版・ノードが読む state の一部からキーを作る。"""
+    raw = json.dumps(
+        [node, settings.BEDROCK_MODEL_ID, version, extra, inputs],
+        sort_keys=True, ensure_ascii=False, default=str,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def memoize_node(
+    node: str,
+    func: NodeFunc,
+    afunc: AsyncNodeFunc,
+    input_keys: list[str],
+    prompt: str,
+    extra: Optional[Callable[[], Any]] = None,
+) -> Runnable:
+    """エージェントのノードを、同じ入力なら前回の出力を返すようにラップする。
+
+    各エージェントは temperature 0 で動くので、入力が同じなら出力も同じとみなせる。
+    失敗した出力（error を含むもの）はキャッシュしない。キャッシュから返した出力も
+    通常のノードの戻り値なので、astream の updates としてそのまま配信される。
+    extra はモデル以外に出力を左右する値（設定や日付など）を返す関数。
+    invoke では func、astream / ainvoke では afunc が呼ばれる。
+    """
+    if node_cache is None:
+        return RunnableLambda(func, afunc=afunc, name=node)
+    version = prompt_version(prompt)
+
+    def key_for(state: dict) -> str:
+        return make_node_key(
+            node, version, {k: state.get(k) for k in input_keys}, extra() if extra else None
+        )
+
+    def wrapper(state: dict) -> dict[str, Any]:
+        key = key_for(state)
+        cached = node_cache.get(key)
+        if cached is not None:
+            logger.info("[%s] キャッシュから出力を返します", node)
+            return cached
+        result = func(state)
+        if not result.get("error"):
+            node_cache.set(key, result)
+        return result
+
+    async def awrapper(state: dict) -> dict[str, Any]:
+        # DynamoDB / SQLite のキャッシュはブロッキング I/O なので専用スレッドプールで読み書きする
+        key = key_for(state)
+        cached = await run_blocking(node_cache.get, key)
+        if cached is not None:
+            logger.info("[%s] キャッシュから出力を返します", node)
+            return cached
+        result = await afunc(state)
+        if not result.get("error"):
+            await run_blocking(node_cache.set, key, result)
+        return result
+
+    return RunnableLambda(wrapper, afunc=awrapper, name=node)
+
+
+def node_cache_stats() -> Optional[dict[str, Any]]:
+    return node_cache.stats() if node_cache is not None else None
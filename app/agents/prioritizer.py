@@ -1,9 +1,9 @@
 import json
 import logging
-from langchain_aws import ChatBedrock
 from langchain_core.messages import HumanMessage, SystemMessage
 from pydantic import BaseModel, Field
-from app.config import settings
+from app.core.executor import run_blocking
+from app.core.llm import get_llm
 from typing import Any
 
 logger = logging.getLogger(__name__)
@@ -117,50 +117,62 @@ QUADRANT_LABELS = {
     5: "保留",
 }
 
-def prioritize(state: dict) -> dict[str, Any]:
-    try:
-        task = state["original_task"]
-        sub_tasks = state.get("subtasks")
-        estimates = state.get("estimates")
-
-        # Nullガード: 前のノードが失敗していたらスキップ
-        if not sub_tasks or not estimates:
-            logger.warning("[prioritizer] subtasksまたはestimatesがNullのためスキップ")
-            return {"priorities": None, "error": "前段(decomposer/estimator)が失敗したためスキップ"}
-
-        llm = ChatBedrock(
-            model_id=settings.BEDROCK_MODEL_ID,
-            region_name=settings.AWS_REGION,
-            model_kwargs={
-                "max_tokens": 2000,
-                "temperature": 0.0,
-            },
-        )
+def _messages(task, sub_tasks, estimates) -> list:
+    return [
+        SystemMessage(content=SYSTEM_PROMPT),
+        HumanMessage(content=create_user_prompt(task, sub_tasks, estimates))
+    ]
 
-        messages = [
-            SystemMessage(content=SYSTEM_PROMPT),
-            HumanMessage(content=create_user_prompt(task, sub_tasks, estimates))
-        ]
-
-        response = llm.invoke(messages)
-        result = parse_prioritizer_result(response.content)
-        return {
-            "priorities": [
-                {
-                    **st.model_dump(),
-                    "title": next(
-                        (s["title"] for s in sub_tasks if s["id"] == st.subtask_id),
-                        st.subtask_id,
-                    ),
-                    "priority": PRIORITY_LABELS.get(st.priority, str(st.priority)),
-                    "quadrant": QUADRANT_LABELS.get(st.priority, ""),
-                }
-                for st in result.priorities
-            ],
-        }
-    except json.JSONDecodeError as e:
+def _output(llm_output: str, sub_tasks: list[dict]) -> dict[str, Any]:
+    result = parse_prioritizer_result(llm_output)
+    return {
+        "priorities": [
+            {
+                **st.model_dump(),
+                "title": next(
+                    (s["title"] for s in sub_tasks if s["id"] == st.subtask_id),
+                    st.subtask_id,
+                ),
+                "priority": PRIORITY_LABELS.get(st.priority, str(st.priority)),
+                "quadrant": QUADRANT_LABELS.get(st.priority, ""),
+            }
+            for st in result.priorities
+        ],
+    }
+
+def _skipped() -> dict[str, Any]:
+    # Nullガード: 前のノードが失敗していたらスキップ
+    logger.warning("[prioritizer] subtasksまたはestimatesがNullのためスキップ")
+    return {"priorities": None, "error": "前段(decomposer/estimator)が失敗したためスキップ"}
+
+def _error_output(e: Exception) -> dict[str, Any]:
+    if isinstance(e, json.JSONDecodeError):
         logger.error("[prioritizer] JSONパースエラー: %s", e, exc_info=True)
         return {"priorities": None, "error": f"JSONパースエラー: {e}"}
+    logger.error("[prioritizer] 優先度エラー: %s", e, exc_info=True)
+    return {"priorities": None, "error": f"優先度エラー: {e}"}
+
+def prioritize(state: dict) -> dict[str, Any]:
+    sub_tasks = state.get("subtasks")
+    estimates = state.get("estimates")
+    if not sub_tasks or not estimates:
+        return _skipped()
+    try:
+        response = get_llm().invoke(_messages(state["original_task"], sub_tasks, estimates))
+        return _output(response.content, sub_tasks)
+    except Exception as e:
+        return _error_output(e)
+
+async def aprioritize(state: dict) -> dict[str, Any]:
+    """prioritize の非同期版。LLM の応答待ちは AWS I/O 専用スレッドプールで行う。"""
+    sub_tasks = state.get("subtasks")
+    estimates = state.get("estimates")
+    if not sub_tasks or not estimates:
+        return _skipped()
+    try:
+        response = await run_blocking(
+            get_llm().invoke, _messages(state["original_task"], sub_tasks, estimates)
+        )
+        return _output(response.content, sub_tasks)
     except Exception as e:
-        logger.error("[prioritizer] 優先度エラー: %s", e, exc_info=True)
-        return {"priorities": None, "error": f"優先度エラー: {e}"}
+        return _error_output(e)
@@ -0,0 +1,214 @@
+import heapq
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Any, Optional
+
+from app.agents.prioritizer import PRIORITY_LABELS
+from app.config import settings
+
+DEFAULT_MINUTES = 60
+DEFAULT_PRIORITY = 3
+DEFERRED_PRIORITY = 5
+_PRIORITY_RANKS = {label: rank for rank, label in PRIORITY_LABELS.items()}
+
+
+def _priority_rank(value: Any) -> int:
+    """優先度を 1〜5 の数値にする。prioritizer は数値をラベル（最高・高…）に変換して state に置く。"""
+    if isinstance(value, int):
+        return value
+    if value in _PRIORITY_RANKS:
+        return _PRIORITY_RANKS[value]
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_PRIORITY
+
+
+def _to_minutes(hhmm: str) -> int:
+    hours, minutes = hhmm.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def _to_hhmm(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+@dataclass
+class WorkingHours:
+    """1日の作業時間帯（分単位）。昼休憩で午前・午後の2ブロックに分かれる。"""
+
+    day_start: int
+    day_end: int
+    lunch_start: int
+    lunch_end: int
+    break_minutes: int
+    min_segment_minutes: int
+    holidays: set[date] = field(default_factory=set)
+
+    def __post_init__(self) -> None:
+        # タスクを置けるブロックが1つもないと、pack_days が次のブロックへ進み続けて終わらない
+        min_length = self.min_segment
+        lunch_covers_day = self.lunch_start <= self.day_start and self.lunch_end >= self.day_end
+        if lunch_covers_day or not any(end - start >= min_length for start, end in self.blocks):
+            raise ValueError(
+                f"作業時間帯の設定が不正です: {_to_hhmm(self.day_start)}-{_to_hhmm(self.day_end)}"
+                f"（昼休憩 {_to_hhmm(self.lunch_start)}-{_to_hhmm(self.lunch_end)}）に"
+                f" {min_length} 分以上のブロックがありません"
+            )
+
+    @classmethod
+    def from_settings(cls) -> "WorkingHours":
+        return cls(
+            day_start=_to_minutes(settings.schedule_day_start),
+            day_end=_to_minutes(settings.schedule_day_end),
+            lunch_start=_to_minutes(settings.schedule_lunch_start),
+            lunch_end=_to_minutes(settings.schedule_lunch_end),
+            break_minutes=settings.schedule_break_minutes,
+            min_segment_minutes=settings.schedule_min_segment_minutes,
+            holidays={date.fromisoformat(d) for d in settings.schedule_holidays},
+        )
+
+    @property
+    def min_segment(self) -> int:
+        """分割したタスクを置く最短の長さ（0分の枠を作らないよう1分以上）。"""
+        return max(self.min_segment_minutes, 1)
+
+    @property
+    def blocks(self) -> list[tuple[int, int]]:
+        if self.day_start < self.lunch_start < self.lunch_end < self.day_end:
+            return [(self.day_start, self.lunch_start), (self.lunch_end, self.day_end)]
+        return [(self.day_start, self.day_end)]
+
+    def is_workday(self, day: date) -> bool:
+        return day.weekday() < 5 and day not in self.holidays
+
+    def next_workday(self, day: date) -> date:
+        day += timedelta(days=1)
+        while not self.is_workday(day):
+            day += timedelta(days=1)
+        return day
+
+
+def topological_order(
+    ids: list[str], dependencies: dict[str, list[str]], priorities: dict[str, int]
+) -> tuple[list[str], list[str]]:
+    """依存関係を守りつつ、実行可能なものから優先度順（同順位は元の順）に並べる。
+
+    戻り値は (並び順, 循環に含まれていたID)。循環がある場合、残りは依存を無視して優先度順に並べる。
+    """
+    position = {task_id: i for i, task_id in enumerate(ids)}
+    indegree = {task_id: 0 for task_id in ids}
+    dependents: dict[str, list[str]] = {task_id: [] for task_id in ids}
+    for task_id in ids:
+        for dep in dependencies.get(task_id, []):
+            indegree[task_id] += 1
+            dependents[dep].append(task_id)
+
+    def key(task_id: str) -> tuple[int, int, str]:
+        return (priorities[task_id], position[task_id], task_id)
+
+    ready = [key(task_id) for task_id in ids if indegree[task_id] == 0]
+    heapq.heapify(ready)
+    order: list[str] = []
+    while ready:
+        _, _, task_id = heapq.heappop(ready)
+        order.append(task_id)
+        for dependent in dependents[task_id]:
+            indegree[dependent] -= 1
+            if indegree[dependent] == 0:
+                heapq.heappush(ready, key(dependent))
+
+    cyclic = sorted((t for t in ids if indegree[t] > 0), key=key)
+    return order + cyclic, cyclic
+
+
+def pack_days(
+    order: list[str], durations: dict[str, int], hours: WorkingHours, start: date
+) -> list[dict[str, Any]]:
+    """並び順どおりに作業時間帯へ詰める。ブロックに収まらないタスクは分割して続きを次のブロックに置く。"""
+    blocks = hours.blocks
+    schedule: list[dict[str, Any]] = []
+    day, block, cursor = start, 0, blocks[0][0]
+
+    def advance() -> None:
+        nonlocal day, block, cursor
+        block += 1
+        if block == len(blocks):
+            day, block = hours.next_workday(day), 0
+        cursor = blocks[block][0]
+
+    for task_id in order:
+        remaining = durations[task_id]
+        while remaining > 0:
+            available = blocks[block][1] - cursor
+            # 細切れになるなら次のブロックから始める
+            if available < min(remaining, hours.min_segment):
+                advance()
+                continue
+            minutes = min(remaining, available)
+            schedule.append({
+                "subtask_id": task_id,
+                "scheduled_date": day.isoformat(),
+                "scheduled_time": _to_hhmm(cursor),
+                "duration_minutes": minutes,
+            })
+            remaining -= minutes
+            cursor += minutes
+            if remaining > 0:
+                advance()
+        cursor += hours.break_minutes
+    return schedule
+
+
+def build_schedule(
+    subtasks: list[dict[str, Any]],
+    estimates: list[dict[str, Any]],
+    priorities: list[dict[str, Any]],
+    start: Optional[date] = None,
+    hours: Optional[WorkingHours] = None,
+) -> dict[str, Any]:
+    """サブタスク・見積もり・優先度からスケジュールを組み立てる（SchedulerResult と同じ形）。"""
+    hours = hours or WorkingHours.from_settings()
+    warnings: list[str] = []
+    ids = list(dict.fromkeys(st["id"] for st in subtasks))
+    known = set(ids)
+
+    estimates_map = {e["subtask_id"]: e for e in estimates}
+    priorities_map = {p["subtask_id"]: p for p in priorities}
+    durations: dict[str, int] = {}
+    priority: dict[str, int] = {}
+    for task_id in ids:
+        est = estimates_map.get(task_id)
+        durations[task_id] = int(est["estimated_minutes"]) if est else DEFAULT_MINUTES
+        if not est:
+            warnings.append(f"{task_id} の見積もりがないため {DEFAULT_MINUTES} 分として配置しました")
+        pri = priorities_map.get(task_id)
+        priority[task_id] = _priority_rank(pri["priority"]) if pri else DEFAULT_PRIORITY
+
+    dependencies: dict[str, list[str]] = {}
+    for st in subtasks:
+        deps = []
+        for dep in st.get("dependencies") or []:
+            if dep in known and dep != st["id"]:
+                deps.append(dep)
+            else:
+                warnings.append(f"{st['id']} の依存先 {dep} が見つからないため無視しました")
+        dependencies[st["id"]] = list(dict.fromkeys(deps))
+
+    order, cyclic = topological_order(ids, dependencies, priority)
+    if cyclic:
+        warnings.append(f"依存関係が循環しています: {', '.join(cyclic)}（優先度順に配置しました）")
+    deferred = [task_id for task_id in ids if priority[task_id] >= DEFERRED_PRIORITY]
+    if deferred:
+        warnings.append(f"保留（優先度5）のタスクは後回しにしました: {', '.join(deferred)}")
+
+    if start is None:
+        start = hours.next_workday(datetime.now().date())
+    elif not hours.is_workday(start):
+        start = hours.next_workday(start)
+    schedule = pack_days(order, durations, hours, start)
+    return {
+        "schedule": schedule,
+        "total_days": len({entry["scheduled_date"] for entry in schedule}),
+        "warnings": warnings,
+    }
@@ -1,10 +1,12 @@
 import json
 import logging
-from langchain_aws import ChatBedrock
 from langchain_core.messages import HumanMessage, SystemMessage
 from pydantic import BaseModel, Field
+from app.agents.schedule_engine import build_schedule
 from app.config import settings
-from typing import Any
+from app.core.executor import run_blocking
+from app.core.llm import get_llm
+from typing import Any, Optional
 
 logger = logging.getLogger(__name__)
 
@@ -112,47 +114,87 @@ def parse_scheduler_result(llm_output: str) -> SchedulerResult:
     return SchedulerResult(**data)
 
 
-def schedule(state: dict) -> dict[str, Any]:
+def _output(result: SchedulerResult) -> dict[str, Any]:
+    return {
+        "schedule": [st.model_dump() for st in result.schedule],
+        "total_days": result.total_days,
+        "warnings": result.warnings
+    }
 
-    try:
-        logger.info("[scheduler] 開始")
-        task = state["original_task"]
-        subtasks = state.get("subtasks")
-        estimates = state.get("estimates")
-        priorities = state.get("priorities")
-
-        # Nullガード: 前のノードが失敗していたらスキップ
-        if not subtasks or not estimates or not priorities:
-            logger.warning("[scheduler] subtasks/estimates/prioritiesのいずれかがNullのためスキップ")
-            return {"schedule": None, "error": "前段のエージェントが失敗したためスキップ"}
-
-        llm = ChatBedrock(
-            model_id=settings.BEDROCK_MODEL_ID,
-            region_name=settings.AWS_REGION,
-            model_kwargs={
-                "max_tokens": 2000,
-                "temperature": 0.0,
-            },
-        )
 
-        messages = [
-            SystemMessage(content=SYSTEM_PROMPT),
-            HumanMessage(content=create_user_prompt(task, subtasks, estimates, priorities))
-        ]
+def _local_output(subtasks, estimates, priorities) -> dict[str, Any]:
+    result = SchedulerResult(**build_schedule(subtasks, estimates, priorities))
+    logger.info("[scheduler] ローカルエンジンで作成: %d 件", len(result.schedule))
+    return _output(result)
 
-        logger.info("[scheduler] LLM呼び出し開始")
-        response = llm.invoke(messages)
-        logger.info("[scheduler] LLM応答受信: %d文字", len(response.content))
-        result = parse_scheduler_result(response.content)
-        logger.info("[scheduler] パース完了")
-        return {
-            "schedule": [st.model_dump() for st in result.schedule],
-            "total_days": result.total_days,
-            "warnings": result.warnings
-        }
-    except json.JSONDecodeError as e:
+
+def _messages(task, subtasks, estimates, priorities) -> list:
+    return [
+        SystemMessage(content=SYSTEM_PROMPT),
+        HumanMessage(content=create_user_prompt(task, subtasks, estimates, priorities))
+    ]
+
+
+def _llm_output(llm_output: str) -> dict[str, Any]:
+    logger.info("[scheduler] LLM応答受信: %d文字", len(llm_output))
+    result = parse_scheduler_result(llm_output)
+    logger.info("[scheduler] パース完了")
+    return _output(result)
+
+
+def _inputs(state: dict) -> Optional[tuple]:
+    """(subtasks, estimates, priorities)。前のノードが失敗していたら None。"""
+    subtasks = state.get("subtasks")
+    estimates = state.get("estimates")
+    priorities = state.get("priorities")
+    if not subtasks or not estimates or not priorities:
+        logger.warning("[scheduler] subtasks/estimates/prioritiesのいずれかがNullのためスキップ")
+        return None
+    return subtasks, estimates, priorities
+
+
+def _skipped() -> dict[str, Any]:
+    return {"schedule": None, "error": "前段のエージェントが失敗したためスキップ"}
+
+
+def _error_output(e: Exception) -> dict[str, Any]:
+    if isinstance(e, json.JSONDecodeError):
         logger.error("[scheduler] JSONパースエラー: %s", e, exc_info=True)
         return {"schedule": None, "error": f"JSONパースエラー: {e}"}
+    logger.error("[scheduler] エラー: %s", e, exc_info=True)
+    return {"schedule": None, "error": f"スケジューリングエラー: {e}"}
+
+
+def schedule(state: dict) -> dict[str, Any]:
+    logger.info("[scheduler] 開始")
+    inputs = _inputs(state)
+    if inputs is None:
+        return _skipped()
+    try:
+        if settings.SCHEDULER_MODE == "local":
+            return _local_output(*inputs)
+
+        logger.info("[scheduler] LLM呼び出し開始")
+        response = get_llm().invoke(_messages(state["original_task"], *inputs))
+        return _llm_output(response.content)
+    except Exception as e:
+        return _error_output(e)
+
+
+async def aschedule(state: dict) -> dict[str, Any]:
+    """schedule の非同期版。ローカルエンジンは CPU だけで終わるのでイベントループ上で実行する。"""
+    logger.info("[scheduler] 開始")
+    inputs = _inputs(state)
+    if inputs is None:
+        return _skipped()
+    try:
+        if settings.SCHEDULER_MODE == "local":
+            return _local_output(*inputs)
+
+        logger.info("[scheduler] LLM呼び出し開始")
+        response = await run_blocking(
+            get_llm().invoke, _messages(state["original_task"], *inputs)
+        )
+        return _llm_output(response.content)
     except Exception as e:
-        logger.error("[scheduler] エラー: %s", e, exc_info=True)
-        return {"schedule": None, "error": f"スケジューリングエラー: {e}"}
+        return _error_output(e)
@@ -1,13 +1,54 @@
+import json
+from typing import Any, AsyncIterator
+
 from fastapi import APIRouter, HTTPException
-from app.models.chat import ChatRequest, ChatResponse
-from app.services.chat_service import process_chat
+from fastapi.responses import StreamingResponse
+from app.models.chat import ChatBatchRequest, ChatRequest, ChatResponse
+from app.services.chat_service import (
+    process_chat_async,
+    process_chat_batch,
+    process_chat_stream,
+)
 
 router = APIRouter(tags=["chat"])
 
 @router.post("/chat", response_model=ChatResponse)
-def send_chat(request: ChatRequest):
+async def send_chat(request: ChatRequest):
     try:
-        response = process_chat(request)
+        response = await process_chat_async(request)
         return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"チャット処理中にエラーが発生しました: {str(e)}")
+
+
+async def _to_sse(events: AsyncIterator[dict[str, Any]]) -> AsyncIterator[str]:
+    async for event in events:
+        data = json.dumps(event, ensure_ascii=False)
+        yield f"event: {event['type']}\ndata: {data}\n\n"
+
+
+@router.post("/chat/stream")
+async def stream_chat(request: ChatRequest):
+    """回答を Server-Sent Events で返す（sources → token... → done）。"""
+    return StreamingResponse(
+        _to_sse(process_chat_stream(request)),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+async def _to_ndjson(results: AsyncIterator[dict[str, Any]]) -> AsyncIterator[str]:
+    async for result in results:
+        yield json.dumps(result, ensure_ascii=False) + "\n"
+
+
+@router.post("/chat/batch")
+async def batch_chat(request: ChatBatchRequest):
+    """複数の質問を並列に処理し、完了順に NDJSON（1行1結果）で返す。"""
+    return StreamingResponse(
+        _to_ndjson(process_chat_batch(request.items)),
+        media_type="application/x-ndjson",
+    )
@@ -1,18 +1,41 @@
-from fastapi import APIRouter, File, UploadFile
+from typing import Optional
 
-from app.models.document import Document
+from fastapi import APIRouter, File, Query, UploadFile
+
+from app.config import settings
+
+from app.models.document import (
+    BatchDeleteRequest,
+    BatchDeleteResponse,
+    BulkUploadResponse,
+    Document,
+    DocumentStatus,
+    UploadCompleteRequest,
+    UploadInitRequest,
+    UploadInitResponse,
+)
+from app.models.page import Page
 from app.services.document_service import (
+    abort_upload,
+    complete_upload,
+    create_upload,
     delete_document,
-    get_all_documents,
+    delete_documents,
+    get_documents,
+    get_document_status,
+    process_bulk_upload,
     process_upload,
 )
 
 router = APIRouter(prefix="/documents", tags=["documents"])
 
 
-@router.get("", response_model=list[Document])
-def get_documents():
-    return get_all_documents()
+@router.get("", response_model=Page[Document])
+def list_documents(
+    limit: int = Query(settings.list_default_limit, ge=1, le=settings.list_max_limit),
+    cursor: Optional[str] = None,
+):
+    return get_documents(limit, cursor)
 
 
 @router.post("", response_model=Document)
@@ -20,6 +43,38 @@ def upload_document(file: UploadFile = File(...)):
     return process_upload(file)
 
 
+@router.post("/bulk", response_model=BulkUploadResponse)
+def upload_documents_bulk(files: list[UploadFile] = File(...)):
+    """複数の PDF、または PDF をまとめた ZIP を一括で登録する。"""
+    return process_bulk_upload(files)
+
+
+@router.post(":batchDelete", response_model=BatchDeleteResponse)
+def batch_delete_documents(request: BatchDeleteRequest):
+    return delete_documents(request.ids)
+
+
+@router.post("/uploads", response_model=UploadInitResponse)
+def start_direct_upload(request: UploadInitRequest):
+    """大きな PDF 用: S3 へ直接アップロードするための署名付きURLを発行する。"""
+    return create_upload(request)
+
+
+@router.post("/uploads/{doc_id}/complete", response_model=Document)
+def complete_direct_upload(doc_id: str, request: UploadCompleteRequest):
+    return complete_upload(doc_id, request)
+
+
+@router.delete("/uploads/{doc_id}", status_code=204)
+def abort_direct_upload(doc_id: str, uploadId: str, filename: str):
+    abort_upload(doc_id, uploadId, filename)
+
+
+@router.get("/{doc_id}/status", response_model=DocumentStatus)
+def document_status(doc_id: str):
+    return get_document_status(doc_id)
+
+
 @router.delete("/{doc_id}", response_model=Document)
 def remove_document(doc_id: str):
     return delete_document(doc_id)
@@ -0,0 +1,24 @@
+from fastapi import APIRouter
+
+from app.agents.memo import node_cache_stats
+from app.core.admission import admission_controller
+from app.core.answer_cache import answer_cache_stats
+from app.core.context_packer import context_packer
+from app.core.rag_pipeline import coalescing_stats
+from app.services.document_service import ingestion_scheduler, ingestion_tracker
+from app.services.task_service import task_queue
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+
+@router.get("")
+def get_metrics():
+    return {
+        "admission": admission_controller.stats(),
+        "answerCache": answer_cache_stats(),
+        "contextPacker": context_packer.stats(),
+        "coalescing": coalescing_stats(),
+        "nodeCache": node_cache_stats(),
+        "taskQueue": task_queue.status(),
+        "ingestion": {**ingestion_scheduler.status(), **ingestion_tracker.status()},
+    }
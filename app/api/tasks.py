@@ -1,19 +1,37 @@
-from fastapi import APIRouter, HTTPException
+from typing import Any, Optional
+
+from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from app.config import settings
+from app.models.page import Page
 from app.models.task import TaskRequest,TaskResponse
-from app.services.task_service import process_task
+from app.services.task_service import discard_checkpoints, process_task, resume_task, submit_task
 from app.services.firestore_service import firestore_service
 
 
 router = APIRouter(prefix="/tasks",tags=["tasks"])
 @router.post("",response_model=TaskResponse)
-def create_task(request:TaskRequest):
-    response = process_task(request)
-    return response
+async def create_task(
+    request:TaskRequest,
+    response:Response,
+    run_async:bool = Query(False, alias="async", description="true ならキューに入れて 202 を返す"),
+):
+    if run_async:
+        response.status_code = 202
+        return await submit_task(request)
+    return await run_in_threadpool(process_task, request)
+
+@router.post("/{task_id}/resume",response_model=TaskResponse)
+def resume(task_id:str):
+    return resume_task(task_id)
 
-@router.get("")
-def get_tasks():
-    tasks = firestore_service.get_all()
-    return tasks
+@router.get("", response_model=Page[dict[str, Any]])
+def get_tasks(
+    limit: int = Query(settings.list_default_limit, ge=1, le=settings.list_max_limit),
+    cursor: Optional[str] = None,
+):
+    items, next_cursor = firestore_service.list(limit, cursor)
+    return Page(items=items, nextCursor=next_cursor)
 
 @router.get("/{task_id}")
 def get_task(task_id :str):
@@ -27,4 +45,5 @@ def delete_task(task_id:str):
     task = firestore_service.get(task_id)
     if task is None:
         raise HTTPException(status_code=404,detail="Task not found")
+    discard_checkpoints(task_id)
     return firestore_service.delete(task_id)
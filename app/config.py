@@ -8,18 +8,152 @@ class Settings(BaseSettings):
     BEDROCK_DATA_SOURCE_ID: str = ""
     S3_DOCUMENTS_BUCKET: str = ""
     BEDROCK_MODEL_ID: str = "anthropic.claude-sonnet-4-20250514"
+    # Lambda 上で動いているか（ランタイムが設定する）。レスポンス後はバックグラウンド処理が凍結される
+    AWS_LAMBDA_FUNCTION_NAME: str = ""
 
     # DynamoDB設定
     DYNAMODB_DOCUMENTS_TABLE: str = ""   # ドキュメント管理テーブル
     DYNAMODB_TASKS_TABLE: str = ""       # タスク管理テーブル
     DYNAMODB_CONNECTIONS_TABLE: str = "" # WebSocket接続管理テーブル
+    DYNAMODB_CACHE_TABLE: str = ""       # 共有キャッシュ・KB世代テーブル
+    DYNAMODB_INGESTION_TABLE: str = ""   # KB同期スケジューラの状態テーブル
+    DYNAMODB_CONTENT_HASH_TABLE: str = "" # アップロード内容の SHA-256 索引テーブル
+    DYNAMODB_CHECKPOINT_TABLE: str = ""  # タスク分析パイプラインのチェックポイントテーブル
+
+    # ドキュメントのメタデータ保存先: dynamodb / sqlite（空なら DYNAMODB_DOCUMENTS_TABLE の有無で決める）
+    METADATA_BACKEND: str = ""
+    LOCAL_METADATA_DB: str = "uploads/metadata.db"
 
     debug: bool = False
 
+    # 一覧取得（GET /documents, GET /tasks）
+    # listKey + createdAt の GSI。空なら scan でページング（順序なし）
+    # 既存アイテムに scripts/backfill_list_keys.py を実行してから byCreatedAt に切り替えること
+    list_index_name: str = ""
+    list_default_limit: int = 20
+    list_max_limit: int = 100
+
     # RAGパラメータ
     search_k: int = 5
     rerank_initial_results: int = 100  # Re-ranking前の初期取得件数
 
+    # AWS クライアント共通設定（app/core/aws_clients.py）
+    aws_max_pool_connections: int = 50  # クライアントごとのHTTP接続プール上限
+    aws_tcp_keepalive: bool = True
+    aws_connect_timeout: int = 5        # 秒
+    aws_read_timeout: int = 120         # 秒（LLMの長い生成を考慮）
+    aws_max_attempts: int = 5           # adaptive リトライの最大試行回数
+
+    # コンテキスト整理（検索結果 → プロンプト）
+    context_token_budget: int = 6000         # プロンプトに入れるコンテキストの最大トークン数
+    context_dedup_threshold: float = 0.8     # MinHash 類似度がこれ以上なら重複として除外
+    context_shingle_size: int = 5            # シングル（文字 n-gram）の長さ
+    context_minhash_permutations: int = 64
+    context_mmr_enabled: bool = False
+    context_mmr_lambda: float = 0.7          # 1.0 に近いほど関連度重視
+
+    # 非同期パスで AWS 呼び出しを待たせる専用スレッド数（同時チャット数の上限）
+    aws_io_max_workers: int = 256
+
+    # Bedrock の流量制御（LLM・KB の retrieve・埋め込みで共有。プロセス単位）
+    # 対話（/chat）を interactive、タスク分析と /chat/batch を background レーンで流し、interactive を優先する
+    admission_enabled: bool = True
+    admission_requests_per_second: float = 5.0
+    admission_burst: int = 10                    # RPS バケツの容量
+    admission_tokens_per_minute: int = 200000    # 入力の概算 + max_tokens で確保し、実績で精算
+    admission_max_wait_seconds: float = 120      # これ以上待たされたら諦める
+    admission_throttle_retries: int = 3          # ThrottlingException の再試行回数
+    admission_backoff_base_seconds: float = 1.0
+    admission_backoff_max_seconds: float = 20.0
+
+    # /chat/batch の同時実行数
+    chat_batch_concurrency: int = 8
+    chat_batch_max_items: int = 1000
+
+    # S3 への直接アップロード（署名付きURL・マルチパート）
+    upload_min_part_size_mb: int = 8        # S3 の下限は 5MB
+    upload_max_file_size_mb: int = 5000
+    upload_url_expires_seconds: int = 3600
+
+    # PDF の前処理（ページ単位のチャンク + .metadata.json を S3 に置き、KB に取り込ませる）
+    # 有効にする場合、KB のデータソースは documents/ プレフィックスだけを対象にすること
+    PDF_PREPROCESSING: bool = False
+    preprocess_chunk_size: int = 1500
+    preprocess_chunk_overlap: int = 200
+    preprocess_workers: int = 4              # テキスト抽出のプロセス数（1以下なら逐次）
+    preprocess_pages_per_task: int = 25
+    preprocess_upload_concurrency: int = 16  # チャンクの S3 PUT の並列数
+
+    # タスク分析エージェント: ノード出力のキャッシュ（memory / dynamodb / sqlite / none）
+    NODE_CACHE_BACKEND: str = "memory"
+    LOCAL_NODE_CACHE_DB: str = "uploads/node_cache.db"
+    node_cache_max_entries: int = 1000     # memory のみ（LRU）
+    node_cache_ttl_seconds: int = 86400
+
+    # タスク分析エージェント: チェックポイント（dynamodb / sqlite / none。空なら DYNAMODB_CHECKPOINT_TABLE の有無で決める）
+    # 失敗したタスクを POST /tasks/{id}/resume で失敗したノードから再開するために使う
+    CHECKPOINT_BACKEND: str = ""
+    LOCAL_CHECKPOINT_DB: str = "uploads/checkpoints.db"
+    checkpoint_ttl_days: int = 7   # dynamodb のみ
+
+    # タスク分析の非同期実行（POST /tasks?async=true）
+    # TASK_QUEUE_URL（SQS）を設定するとワーカー Lambda が実行する。未設定ならプロセス内のワーカー（Lambda では 503）
+    TASK_QUEUE_URL: str = ""
+    task_queue_concurrency: int = 4   # 同時に実行するパイプライン数（プロセス内のみ）
+    task_queue_max_size: int = 100    # 待ち行列の上限（超えたら 503。プロセス内のみ）
+    task_stale_seconds: int = 3600    # queued / running のまま更新がなければ投入し直す（1タスクの最長実行時間より長く）
+
+    # タスク分析エージェント: 見積もりの分割実行
+    estimator_batch_size: int = 8       # 1回の LLM 呼び出しで見積もるサブタスク数
+    estimator_concurrency: int = 4
+    estimator_batch_retries: int = 2    # バッチごとの再試行回数
+
+    # タスク分析エージェント: スケジューラ（local: 決定的なローカルエンジン / llm: LLM に依頼）
+    SCHEDULER_MODE: str = "local"
+    schedule_day_start: str = "09:00"
+    schedule_day_end: str = "17:00"
+    schedule_lunch_start: str = "12:00"
+    schedule_lunch_end: str = "13:00"
+    schedule_break_minutes: int = 10        # タスク間の休憩
+    schedule_min_segment_minutes: int = 30  # これより短い隙間にはタスクを分割して置かない
+    schedule_holidays: list[str] = []       # 祝日など（YYYY-MM-DD）
+
+    # 一括アップロード
+    bulk_upload_max_files: int = 500
+    bulk_upload_concurrency: int = 8        # 同時に転送するファイル数
+    bulk_transfer_concurrency: int = 4      # 1ファイルあたりのマルチパート並列数
+    bulk_multipart_threshold_mb: int = 16
+    bulk_multipart_chunksize_mb: int = 8
+
+    # 一括削除
+    batch_delete_max_ids: int = 1000
+
+    # KB同期（Ingestion Job）スケジューラ
+    ingestion_debounce_seconds: int = 30      # 最後の変更からこの秒数だけ待ってまとめて同期
+    ingestion_poll_interval_seconds: int = 30 # 実行中ジョブの完了確認間隔
+    ingestion_lease_seconds: int = 60         # 判定中のワーカーが保持するリースの長さ
+
+    # Ingestion Job の追跡（ドキュメントの indexing / ready / failed）
+    ingestion_status_poll_seconds: int = 5        # 最初の確認までの秒数
+    ingestion_status_backoff: float = 1.5         # 確認のたびに間隔を何倍に広げるか
+    ingestion_status_max_poll_seconds: int = 60
+
+    # 検索バックエンド
+    RETRIEVER_BACKEND: str = "bedrock"   # bedrock / local
+    LOCAL_INDEX_DIR: str = "uploads/local_index"
+    LOCAL_EMBEDDER: str = "hashing"      # hashing（決定的・テスト用） / bedrock
+    LOCAL_EMBEDDING_MODEL_ID: str = "amazon.titan-embed-text-v2:0"
+    local_embedding_dim: int = 512
+    local_chunk_size: int = 1000         # 文字数
+    local_chunk_overlap: int = 200
+    local_candidate_k: int = 50          # 密/BM25 それぞれの候補数（RRF 前）
+    local_rrf_k: int = 60
+
+    # 回答キャッシュ
+    ANSWER_CACHE_BACKEND: str = "memory"  # memory / dynamodb / none
+    answer_cache_max_entries: int = 1000  # memory のみ（LRU）
+    answer_cache_ttl_seconds: int = 3600
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
@@ -0,0 +1,248 @@
+import contextvars
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional, TypeVar
+
+from botocore.exceptions import ClientError
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# 優先度の高い順。上位のレーンに待ちがある間、下位のレーンは送信できない
+LANES = ("interactive", "background")
+_THROTTLING_CODES = {"ThrottlingException", "TooManyRequestsException"}
+
+_lane: contextvars.ContextVar[str] = contextvars.ContextVar("bedrock_lane", default="interactive")
+
+
+@contextmanager
+def admission_lane(lane: str) -> Iterator[None]:
+    """この中（スレッドプールに渡した処理も含む）の Bedrock 呼び出しを指定のレーンで流す。"""
+    if lane not in LANES:
+        raise ValueError(f"未知のレーンです: {lane}")
+    token = _lane.set(lane)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+class AdmissionTimeout(RuntimeError):
+    pass
+
+
+class TokenBucket:
+    """rate / 秒で補充され、capacity まで貯まるバケツ。ロックは呼び出し側が持つ。"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, cost: float, now: float) -> float:
+        """cost を取り出せるまでの秒数（0 なら今すぐ取り出せる）。"""
+        self._refill(now)
+        cost = min(cost, self.capacity)
+        return 0.0 if self._tokens >= cost else (cost - self._tokens) / self.rate
+
+    def take(self, cost: float) -> None:
+        self._tokens -= min(cost, self.capacity)
+
+    def give_back(self, amount: float) -> None:
+        """見積もりと実際の差分を戻す（負なら追加で消費する）。"""
+        self._tokens = min(self.capacity, self._tokens + amount)
+
+    @property
+    def available(self) -> float:
+        return self._tokens
+
+
+def _is_throttling(e: BaseException) -> bool:
+    while e is not None:
+        if isinstance(e, ClientError) and e.response.get("Error", {}).get("Code") in _THROTTLING_CODES:
+            return True
+        e = e.__cause__ or e.__context__
+    return False
+
+
+class AdmissionController:
+    """Bedrock への呼び出し（LLM・KB の retrieve・埋め込み）をプロセス内で流量制御する。
+
+    リクエスト数（RPS）とトークン数（TPM）の2つのバケツから取り出せたものだけを送信する。
+    待っている呼び出しは優先度の高いレーンから順に通す。ThrottlingException が返ったら
+    ジッター付きの指数バックオフで再試行し、その間は他の呼び出しも止めてスロットリングを長引かせない。
+    """
+
+    def __init__(
+        self,
+        requests_per_second: float,
+        burst: int,
+        tokens_per_minute: int,
+        max_wait_seconds: float,
+        throttle_retries: int,
+        backoff_base_seconds: float,
+        backoff_max_seconds: float,
+    ):
+        self._requests = TokenBucket(requests_per_second, burst)
+        self._tokens = TokenBucket(tokens_per_minute / 60, tokens_per_minute)
+        self._max_wait_seconds = max_wait_seconds
+        self._throttle_retries = throttle_retries
+        self._backoff_base = backoff_base_seconds
+        self._backoff_max = backoff_max_seconds
+        self._cond = threading.Condition()
+        self._paused_until = 0.0
+        self._waiting = {lane: 0 for lane in LANES}
+        self._admitted = {lane: 0 for lane in LANES}
+        self._wait_seconds = {lane: 0.0 for lane in LANES}
+        self._throttled = 0
+        self._timeouts = 0
+
+    def _blocked_by_higher_lane(self, lane: str) -> bool:
+        return any(self._waiting[other] for other in LANES[:LANES.index(lane)])
+
+    def acquire(self, tokens: int) -> None:
+        """リクエスト1回分と tokens 分を確保できるまで待つ。"""
+        lane = _lane.get()
+        started = time.monotonic()
+        deadline = started + self._max_wait_seconds
+        with self._cond:
+            self._waiting[lane] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    if self._blocked_by_higher_lane(lane):
+                        wait = None
+                    else:
+                        wait = max(
+                            self._paused_until - now,
+                            self._requests.wait_time(1, now),
+                            self._tokens.wait_time(tokens, now),
+                        )
+                        if wait <= 0:
+                            self._requests.take(1)
+                            self._tokens.take(tokens)
+                            break
+                    if now >= deadline:
+                        self._timeouts += 1
+                        raise AdmissionTimeout(
+                            f"Bedrock の送信枠を {self._max_wait_seconds:.0f} 秒待っても確保できませんでした"
+                        )
+                    self._cond.wait(deadline - now if wait is None else min(wait, deadline - now))
+            finally:
+                self._waiting[lane] -= 1
+                # 待ちが減ると下位のレーンが進めるようになる
+                self._cond.notify_all()
+            self._admitted[lane] += 1
+            self._wait_seconds[lane] += time.monotonic() - started
+
+    def settle(self, estimated: int, actual: Optional[int]) -> None:
+        """実際に使ったトークン数が分かったら、見積もりとの差をバケツに反映する。"""
+        if actual is None:
+            return
+        with self._cond:
+            self._tokens.give_back(estimated - actual)
+            self._cond.notify_all()
+
+    def _backoff(self, attempt: int) -> float:
+        # フルジッター: [0, min(上限, 基準 * 2^attempt)] から一様に選ぶ
+        delay = random.uniform(0, min(self._backoff_max, self._backoff_base * 2 ** attempt))
+        with self._cond:
+            self._throttled += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        return delay
+
+    def call(self, func: Callable[[], T], tokens: int = 0) -> T:
+        """送信枠を確保してから func を呼ぶ。スロットリングされたらバックオフして再試行する。"""
+        for attempt in range(self._throttle_retries + 1):
+            self.acquire(tokens)
+            try:
+                return func()
+            except Exception as e:
+                if attempt == self._throttle_retries or not _is_throttling(e):
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(
+                    "Bedrock がスロットリングしました（%d/%d 回目）。%.1f 秒後に再試行します",
+                    attempt + 1, self._throttle_retries, delay,
+                )
+                time.sleep(delay)
+
+    def stream(self, open_stream: Callable[[], Iterator[T]], tokens: int = 0) -> Iterator[T]:
+        """call のストリーミング版。最初のチャンクを受け取る前のスロットリングだけ再試行する。"""
+        for attempt in range(self._throttle_retries + 1):
+            self.acquire(tokens)
+            started = False
+            try:
+                for chunk in open_stream():
+                    started = True
+                    yield chunk
+                return
+            except Exception as e:
+                if started or attempt == self._throttle_retries or not _is_throttling(e):
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(
+                    "Bedrock がスロットリングしました（%d/%d 回目）。%.1f 秒後に再試行します",
+                    attempt + 1, self._throttle_retries, delay,
+                )
+                time.sleep(delay)
+
+    def stats(self) -> dict[str, Any]:
+        with self._cond:
+            return {
+                "queueDepth": dict(self._waiting),
+                "admitted": dict(self._admitted),
+                "avgWaitMs": {
+                    lane: int(self._wait_seconds[lane] / self._admitted[lane] * 1000)
+                    if self._admitted[lane] else 0
+                    for lane in LANES
+                },
+                "throttled": self._throttled,
+                "timeouts": self._timeouts,
+                "availableRequests": round(self._requests.available, 2),
+                "availableTokens": int(self._tokens.available),
+            }
+
+
+class _Unlimited:
+    """流量制御を無効にした場合の代わり（そのまま呼ぶ）。"""
+
+    def call(self, func: Callable[[], T], tokens: int = 0) -> T:
+        return func()
+
+    def stream(self, open_stream: Callable[[], Iterator[T]], tokens: int = 0) -> Iterator[T]:
+        yield from open_stream()
+
+    def settle(self, estimated: int, actual: Optional[int]) -> None:
+        pass
+
+    def stats(self) -> Optional[dict[str, Any]]:
+        return None
+
+
+def _create_controller():
+    if not settings.admission_enabled:
+        return _Unlimited()
+    return AdmissionController(
+        requests_per_second=settings.admission_requests_per_second,
+        burst=settings.admission_burst,
+        tokens_per_minute=settings.admission_tokens_per_minute,
+        max_wait_seconds=settings.admission_max_wait_seconds,
+        throttle_retries=settings.admission_throttle_retries,
+        backoff_base_seconds=settings.admission_backoff_base_seconds,
+        backoff_max_seconds=settings.admission_backoff_max_seconds,
+    )
+
+
+admission_controller = _create_controller()
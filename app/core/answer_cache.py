@@ -0,0 +1,123 @@
+import hashlib
+import json
+import logging
+import threading
+import unicodedata
+from typing import Any, Optional
+
+from app.config import settings
+from app.core.aws_clients import get_dynamodb_table
+from app.core.cache import CacheBackend, DynamoDBCache, MemoryCache
+
+logger = logging.getLogger(__name__)
+
+KB_GENERATION_KEY = "kb_generation"
+
+
+def normalize_query(query: str) -> str:
+    """キャッシュキー用に質問文を正規化する（全角/半角・大小文字・空白の揺れを吸収）。"""
+    normalized = unicodedata.normalize("NFKC", query).lower()
+    return " ".join(normalized.split())
+
+
+class KnowledgeBaseGeneration:
+    """Knowledge Base の「世代」カウンタ。
+
+    アップロード・削除で KB の内容が変わるたびに世代を進め、
+    キャッシュキーに含めることで古い回答が返らないようにする。
+    DYNAMODB_CACHE_TABLE が設定されていれば DynamoDB で全ワーカーと共有し、
+    未設定ならプロセス内のカウンタを使う。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = 0
+        self._table_name = settings.DYNAMODB_CACHE_TABLE
+
+    @property
+    def _table(self):
+        return get_dynamodb_table(self._table_name) if self._table_name else None
+
+    def current(self) -> int:
+        if self._table:
+            response = self._table.get_item(
+                Key={"cacheKey": KB_GENERATION_KEY},
+                ConsistentRead=True,
+            )
+            return int(response.get("Item", {}).get("generation", 0))
+        with self._lock:
+            return self._local
+
+    def bump(self) -> int:
+        if self._table:
+            response = self._table.update_item(
+                Key={"cacheKey": KB_GENERATION_KEY},
+                UpdateExpression="ADD generation :one",
+                ExpressionAttributeValues={":one": 1},
+                ReturnValues="UPDATED_NEW",
+            )
+            generation = int(response["Attributes"]["generation"])
+        else:
+            with self._lock:
+                self._local += 1
+                generation = self._local
+        logger.info("KB世代を更新: %d", generation)
+        return generation
+
+
+def make_answer_key(query: str, k: int, generation: int) -> str:
+    """正規化済みクエリ・k・KB世代から回答キャッシュのキーを作る。"""
+    raw = json.dumps([normalize_query(query), k, generation], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _create_answer_cache() -> Optional[CacheBackend]:
+    backend = settings.ANSWER_CACHE_BACKEND
+    if backend == "memory":
+        return MemoryCache(
+            max_entries=settings.answer_cache_max_entries,
+            ttl_seconds=settings.answer_cache_ttl_seconds,
+        )
+    if backend == "dynamodb":
+        if not settings.DYNAMODB_CACHE_TABLE:
+            logger.warning("DYNAMODB_CACHE_TABLE 未設定 → 回答キャッシュを無効化します")
+            return None
+        return DynamoDBCache(
+            table_name=settings.DYNAMODB_CACHE_TABLE,
+            ttl_seconds=settings.answer_cache_ttl_seconds,
+            namespace="answer",
+        )
+    return None
+
+
+kb_generation = KnowledgeBaseGeneration()
+answer_cache = _create_answer_cache()
+
+
+def get_cached_answer(query: str, k: int) -> tuple[Optional[str], Optional[dict[str, Any]]]:
+    """キャッシュキーと（あれば）キャッシュ済みの回答を返す。キャッシュ無効時は (None, None)。"""
+    if answer_cache is None:
+        return None, None
+    try:
+        key = make_answer_key(query, k, kb_generation.current())
+    except Exception as e:
+        logger.warning("KB世代の取得に失敗したためキャッシュを使いません: %s", e)
+        return None, None
+    return key, answer_cache.get(key)
+
+
+def store_answer(key: Optional[str], result: dict[str, Any]) -> None:
+    if answer_cache is not None and key is not None:
+        answer_cache.set(key, result)
+
+
+def bump_kb_generation() -> None:
+    """KB の内容が変わったことを記録する。失敗しても呼び出し元の処理は止めない。"""
+    try:
+        kb_generation.bump()
+    except Exception as e:
+        logger.error("KB世代の更新に失敗: %s", e)
+
+
+def answer_cache_stats() -> Optional[dict[str, Any]]:
+    return answer_cache.stats() if answer_cache is not None else None
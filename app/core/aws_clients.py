@@ -0,0 +1,76 @@
+import logging
+import threading
+from typing import Any
+
+import boto3
+from botocore.config import Config
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# boto3 のクライアントはスレッドセーフなのでプロセスで1つを共有する。
+# リソース（boto3.resource）はスレッドセーフではないため、スレッドごとに1つ作って使い回す。
+_lock = threading.Lock()
+_session: boto3.session.Session | None = None
+_clients: dict[str, Any] = {}
+_local = threading.local()
+
+
+def _client_config() -> Config:
+    return Config(
+        region_name=settings.AWS_REGION,
+        max_pool_connections=settings.aws_max_pool_connections,
+        tcp_keepalive=settings.aws_tcp_keepalive,
+        connect_timeout=settings.aws_connect_timeout,
+        read_timeout=settings.aws_read_timeout,
+        retries={
+            "mode": "adaptive",
+            "max_attempts": settings.aws_max_attempts,
+        },
+    )
+
+
+def _get_session() -> boto3.session.Session:
+    global _session
+    if _session is None:
+        _session = boto3.session.Session()
+    return _session
+
+
+def get_client(service_name: str) -> Any:
+    """サービスごとに1つだけ作成した boto3 クライアントを返す。"""
+    client = _clients.get(service_name)
+    if client is None:
+        with _lock:
+            client = _clients.get(service_name)
+            if client is None:
+                client = _get_session().client(service_name, config=_client_config())
+                _clients[service_name] = client
+                logger.info("AWSクライアントを作成: %s", service_name)
+    return client
+
+
+def get_resource(service_name: str) -> Any:
+    """現在のスレッド用の boto3 リソースを返す（スレッドごとに1回だけ作成）。"""
+    resources = getattr(_local, "resources", None)
+    if resources is None:
+        resources = _local.resources = {}
+    resource = resources.get(service_name)
+    if resource is None:
+        with _lock:
+            resource = _get_session().resource(service_name, config=_client_config())
+        resources[service_name] = resource
+    return resource
+
+
+def get_dynamodb_table(table_name: str) -> Any:
+    """現在のスレッド用の DynamoDB Table オブジェクトを返す。"""
+    tables = getattr(_local, "tables", None)
+    if tables is None:
+        tables = _local.tables = {}
+    table = tables.get(table_name)
+    if table is None:
+        table = get_resource("dynamodb").Table(table_name)
+        tables[table_name] = table
+    return table
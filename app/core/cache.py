@@ -0,0 +1,204 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional
+
+from app.core.aws_clients import get_dynamodb_table
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend:
+    """キャッシュバックエンドの共通インターフェース。
+
+    値は JSON シリアライズ可能なものに限る。
+    ヒット/ミス数はバックエンドに関係なくここで集計する。
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self._stats_lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._sets = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self._get(key)
+        with self._stats_lock:
+            if value is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self._set(key, value)
+        with self._stats_lock:
+            self._sets += 1
+
+    def stats(self) -> dict[str, Any]:
+        with self._stats_lock:
+            total = self._hits + self._misses
+            return {
+                "backend": self.name,
+                "hits": self._hits,
+                "misses": self._misses,
+                "sets": self._sets,
+                "hitRatio": self._hits / total if total else 0.0,
+            }
+
+    def _get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def _set(self, key: str, value: Any) -> None:
+        raise NotImplementedError
+
+
+class MemoryCache(CacheBackend):
+    """プロセス内の LRU + TTL キャッシュ。"""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        super().__init__()
+        self._max_entries = max_entries
+        self._ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._evictions = 0
+
+    def _get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self._evictions += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self._ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def stats(self) -> dict[str, Any]:
+        stats = super().stats()
+        with self._lock:
+            stats["size"] = len(self._entries)
+            stats["evictions"] = self._evictions
+        return stats
+
+
+class DynamoDBCache(CacheBackend):
+    """DynamoDB を使った共有キャッシュ（複数ワーカー・Lambda 間で共有）。
+
+    テーブルはパーティションキー `cacheKey` (S) を持ち、
+    `expiresAt` (N) を TTL 属性として設定しておくこと。
+    TTL による削除は遅延があるため、読み込み時にも期限を確認する。
+    """
+
+    name = "dynamodb"
+
+    def __init__(self, table_name: str, ttl_seconds: int, namespace: str):
+        super().__init__()
+        self._table_name = table_name
+        self._ttl_seconds = ttl_seconds
+        self._namespace = namespace
+
+    def _key(self, key: str) -> dict[str, str]:
+        return {"cacheKey": f"{self._namespace}:{key}"}
+
+    def _get(self, key: str) -> Optional[Any]:
+        try:
+            response = get_dynamodb_table(self._table_name).get_item(Key=self._key(key))
+        except Exception as e:
+            logger.warning("キャッシュ読み込みに失敗: %s", e)
+            return None
+        item = response.get("Item")
+        if not item or int(item.get("expiresAt", 0)) < time.time():
+            return None
+        return json.loads(item["value"])
+
+    def _set(self, key: str, value: Any) -> None:
+        try:
+            get_dynamodb_table(self._table_name).put_item(Item={
+                **self._key(key),
+                "value": json.dumps(value, ensure_ascii=False),
+                "expiresAt": int(time.time()) + self._ttl_seconds,
+            })
+        except Exception as e:
+            logger.warning("キャッシュ書き込みに失敗: %s", e)
+
+
+class SQLiteCache(CacheBackend):
+    """SQLite（WAL モード）を使ったディスクキャッシュ（ローカル開発用）。
+
+    期限切れのエントリは読み込み時に無視し、書き込み時にまとめて削除する。
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: Path, ttl_seconds: int, namespace: str):
+        super().__init__()
+        self._path = path
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._ttl_seconds = ttl_seconds
+        self._namespace = namespace
+        self._local = threading.local()
+        self._connect().execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache (
+                cache_key  TEXT PRIMARY KEY,
+                value      TEXT NOT NULL,
+                expires_at INTEGER NOT NULL
+            )
+            """
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _get(self, key: str) -> Optional[Any]:
+        try:
+            row = self._connect().execute(
+                "SELECT value FROM cache WHERE cache_key = ? AND expires_at >= ?",
+                (f"{self._namespace}:{key}", int(time.time())),
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("キャッシュ読み込みに失敗: %s", e)
+            return None
+        return json.loads(row[0]) if row else None
+
+    def _set(self, key: str, value: Any) -> None:
+        now = int(time.time())
+        try:
+            conn = self._connect()
+            conn.execute("DELETE FROM cache WHERE expires_at < ?", (now,))
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (cache_key, value, expires_at) VALUES (?, ?, ?)",
+                (
+                    f"{self._namespace}:{key}",
+                    json.dumps(value, ensure_ascii=False),
+                    now + self._ttl_seconds,
+                ),
+            )
+        except sqlite3.Error as e:
+            logger.warning("キャッシュ書き込みに失敗: %s", e)
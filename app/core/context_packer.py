@@ -0,0 +1,234 @@
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def estimate_tokens(text: str) -> int:
+    """トークン数の概算。日本語などの非ASCII文字は1文字≒1トークン、ASCIIは4文字≒1トークン。"""
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    ascii_chars = len(text) - non_ascii
+    return non_ascii + (ascii_chars + 3) // 4
+
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    """estimate_tokens で budget トークン以内に収まる先頭部分を返す。"""
+    non_ascii = ascii_chars = 0
+    for end, ch in enumerate(text):
+        if ord(ch) > 127:
+            non_ascii += 1
+        else:
+            ascii_chars += 1
+        if non_ascii + (ascii_chars + 3) // 4 > budget:
+            return text[:end]
+    return text
+
+
+def _shingles(text: str, size: int) -> set[str]:
+    """文字 n-gram の集合。空白で区切らない日本語でも使えるように文字単位で切る。"""
+    normalized = " ".join(text.split())
+    if len(normalized) <= size:
+        return {normalized} if normalized else set()
+    return {normalized[i:i + size] for i in range(len(normalized) - size + 1)}
+
+
+class MinHasher:
+    """シングル集合から MinHash シグネチャを作る（Jaccard 類似度の推定用）。"""
+
+    def __init__(self, num_perm: int, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        # a * h が 2^61 を超えないように 32bit ハッシュ × 29bit 係数に抑える
+        self._a = rng.integers(1, 1 << 29, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 29, size=num_perm, dtype=np.uint64)
+        self._num_perm = num_perm
+
+    def signature(self, shingles: set[str]) -> np.ndarray:
+        if not shingles:
+            return np.full(self._num_perm, _MAX_HASH, dtype=np.uint64)
+        hashes = np.fromiter(
+            (
+                int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little")
+                for s in shingles
+            ),
+            dtype=np.uint64,
+            count=len(shingles),
+        )
+        permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME
+        return (permuted & _MAX_HASH).min(axis=0)
+
+    @staticmethod
+    def similarity(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+        return float(np.mean(sig_a == sig_b))
+
+
+@dataclass
+class PackStats:
+    candidates: int = 0
+    selected: int = 0
+    duplicates_dropped: int = 0
+    over_budget_dropped: int = 0
+    input_tokens: int = 0
+    packed_tokens: int = 0
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.input_tokens - self.packed_tokens
+
+    def as_dict(self) -> dict[str, int]:
+        return {
+            "candidates": self.candidates,
+            "selected": self.selected,
+            "duplicatesDropped": self.duplicates_dropped,
+            "overBudgetDropped": self.over_budget_dropped,
+            "inputTokens": self.input_tokens,
+            "packedTokens": self.packed_tokens,
+            "savedTokens": self.saved_tokens,
+        }
+
+
+@dataclass
+class PackResult:
+    documents: list[Document]
+    stats: PackStats = field(default_factory=PackStats)
+
+
+class ContextPacker:
+    """検索結果をプロンプトに入れる前に整理するステージ。
+
+    1. MinHash で推定した類似度が閾値以上のチャンクを重複として除外
+    2. （任意）MMR で関連度と多様性のバランスを取って並べ替え
+    3. トークン予算に収まるまでスコア順に詰める（最上位のチャンクは切り詰めてでも残す）
+    """
+
+    def __init__(
+        self,
+        token_budget: int,
+        dedup_threshold: float,
+        shingle_size: int,
+        num_perm: int,
+        mmr_enabled: bool,
+        mmr_lambda: float,
+    ):
+        self._token_budget = token_budget
+        self._dedup_threshold = dedup_threshold
+        self._shingle_size = shingle_size
+        self._hasher = MinHasher(num_perm)
+        self._mmr_enabled = mmr_enabled
+        self._mmr_lambda = mmr_lambda
+        self._lock = threading.Lock()
+        self._totals = PackStats()
+        self._requests = 0
+
+    def pack(self, docs: list[Document]) -> PackResult:
+        stats = PackStats(candidates=len(docs))
+        ranked = sorted(docs, key=lambda d: d.metadata.get("score", 0.0), reverse=True)
+        tokens = [estimate_tokens(d.page_content) for d in ranked]
+        stats.input_tokens = sum(tokens)
+        signatures = [
+            self._hasher.signature(_shingles(d.page_content, self._shingle_size))
+            for d in ranked
+        ]
+
+        # 1. 近似重複の除外（スコアの高い方を残す）
+        kept: list[int] = []
+        for i in range(len(ranked)):
+            if any(
+                MinHasher.similarity(signatures[i], signatures[j]) >= self._dedup_threshold
+                for j in kept
+            ):
+                stats.duplicates_dropped += 1
+                continue
+            kept.append(i)
+
+        # 2. MMR による並べ替え
+        if self._mmr_enabled:
+            kept = self._mmr_order(kept, ranked, signatures)
+
+        # 3. トークン予算内に詰める。最もスコアの高いチャンクは予算を超えても切り詰めて必ず入れる
+        #    （検索でヒットしたのにコンテキストが空のまま LLM を呼ばないように）
+        selected: list[Document] = []
+        if kept:
+            top = min(kept)
+            kept.remove(top)
+            doc = ranked[top]
+            if tokens[top] > self._token_budget:
+                doc = Document(
+                    page_content=truncate_to_tokens(doc.page_content, self._token_budget),
+                    metadata={**doc.metadata, "truncated": True},
+                )
+            if doc.page_content:
+                selected.append(doc)
+                stats.packed_tokens += estimate_tokens(doc.page_content)
+            else:
+                stats.over_budget_dropped += 1
+        for i in kept:
+            if stats.packed_tokens + tokens[i] > self._token_budget:
+                stats.over_budget_dropped += 1
+                continue
+            selected.append(ranked[i])
+            stats.packed_tokens += tokens[i]
+        stats.selected = len(selected)
+
+        self._record(stats)
+        logger.info(
+            "コンテキスト整理: %d → %d 件, %d トークン削減",
+            stats.candidates, stats.selected, stats.saved_tokens,
+        )
+        return PackResult(documents=selected, stats=stats)
+
+    def _mmr_order(
+        self, indices: list[int], ranked: list[Document], signatures: list[np.ndarray]
+    ) -> list[int]:
+        scores = [ranked[i].metadata.get("score", 0.0) for i in indices]
+        top = max(scores, default=0.0) or 1.0
+        relevance = {i: s / top for i, s in zip(indices, scores)}
+
+        remaining = list(indices)
+        ordered: list[int] = []
+        while remaining:
+            def mmr_score(i: int) -> float:
+                redundancy = max(
+                    (MinHasher.similarity(signatures[i], signatures[j]) for j in ordered),
+                    default=0.0,
+                )
+                return self._mmr_lambda * relevance[i] - (1 - self._mmr_lambda) * redundancy
+
+            best = max(remaining, key=mmr_score)
+            ordered.append(best)
+            remaining.remove(best)
+        return ordered
+
+    def _record(self, stats: PackStats) -> None:
+        with self._lock:
+            self._requests += 1
+            self._totals.candidates += stats.candidates
+            self._totals.selected += stats.selected
+            self._totals.duplicates_dropped += stats.duplicates_dropped
+            self._totals.over_budget_dropped += stats.over_budget_dropped
+            self._totals.input_tokens += stats.input_tokens
+            self._totals.packed_tokens += stats.packed_tokens
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {"requests": self._requests, **self._totals.as_dict()}
+
+
+context_packer = ContextPacker(
+    token_budget=settings.context_token_budget,
+    dedup_threshold=settings.context_dedup_threshold,
+    shingle_size=settings.context_shingle_size,
+    num_perm=settings.context_minhash_permutations,
+    mmr_enabled=settings.context_mmr_enabled,
+    mmr_lambda=settings.context_mmr_lambda,
+)
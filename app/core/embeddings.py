@@ -0,0 +1,95 @@
+import hashlib
+import json
+import re
+
+import numpy as np
+
+from app.config import settings
+from app.core.admission import admission_controller
+from app.core.aws_clients import get_client
+from app.core.context_packer import estimate_tokens
+
+_ASCII_WORD = re.compile(r"[0-9a-z]+")
+
+
+def tokenize(text: str) -> list[str]:
+    """検索用の簡易トークナイザ。
+
+    ASCII は英数字の単語、それ以外（日本語など）は文字 bigram に分割する。
+    形態素解析器に依存せず、BM25 とハッシュ埋め込みの両方で使う。
+    """
+    text = text.lower()
+    tokens = _ASCII_WORD.findall(text)
+    for segment in re.split(r"[\x00-\x7f]+", text):
+        if len(segment) == 1:
+            tokens.append(segment)
+        tokens.extend(segment[i:i + 2] for i in range(len(segment) - 1))
+    return tokens
+
+
+class Embedder:
+    """テキストを L2 正規化済みのベクトルに変換するインターフェース。"""
+
+    name = "base"
+    dim: int
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        raise NotImplementedError
+
+
+class HashingEmbedder(Embedder):
+    """トークンをハッシュで次元に割り当てる決定的な埋め込み（テスト・オフライン用）。"""
+
+    name = "hashing"
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in tokenize(text):
+                digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+                value = int.from_bytes(digest, "little")
+                sign = 1.0 if value & 1 else -1.0
+                vectors[row, (value >> 1) % self.dim] += sign
+        return _normalize(vectors)
+
+
+class BedrockEmbedder(Embedder):
+    """Bedrock の Titan Text Embeddings で埋め込みを作る。"""
+
+    name = "bedrock"
+
+    def __init__(self, model_id: str, dim: int):
+        self.model_id = model_id
+        self.dim = dim
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        client = get_client("bedrock-runtime")
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            response = admission_controller.call(
+                lambda: client.invoke_model(
+                    modelId=self.model_id,
+                    body=json.dumps({"inputText": text, "dimensions": self.dim, "normalize": True}),
+                ),
+                estimate_tokens(text),
+            )
+            vectors[row] = json.loads(response["body"].read())["embedding"]
+        return _normalize(vectors)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def get_embedder() -> Embedder:
+    """settings.LOCAL_EMBEDDER に応じた埋め込み関数を返す。"""
+    if settings.LOCAL_EMBEDDER == "bedrock":
+        return BedrockEmbedder(settings.LOCAL_EMBEDDING_MODEL_ID, settings.local_embedding_dim)
+    if settings.LOCAL_EMBEDDER == "hashing":
+        return HashingEmbedder(settings.local_embedding_dim)
+    raise ValueError(f"未知の LOCAL_EMBEDDER です: {settings.LOCAL_EMBEDDER}")
@@ -0,0 +1,27 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from app.config import settings
+
+T = TypeVar("T")
+
+# boto3 / ChatBedrock はブロッキング I/O なので、イベントループから呼ぶ場合は
+# Starlette のスレッドプール（約40）とは別の、この専用プールで待たせる。
+_executor = ThreadPoolExecutor(
+    max_workers=settings.aws_io_max_workers,
+    thread_name_prefix="aws-io",
+)
+
+
+async def run_blocking(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """ブロッキング関数を AWS I/O 専用スレッドプールで実行して await する。
+
+    contextvars は呼び出し元のものを引き継ぐ。
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, func, *args, **kwargs)
+    return await loop.run_in_executor(_executor, call)
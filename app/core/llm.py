@@ -0,0 +1,97 @@
+import logging
+import threading
+from typing import Any, Iterator, List, Optional
+
+from langchain_aws import ChatBedrock
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+
+from app.config import settings
+from app.core.admission import admission_controller
+from app.core.aws_clients import get_client
+from app.core.context_packer import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_models: dict[tuple[str, int, float], ChatBedrock] = {}
+
+
+class AdmittedChatBedrock(ChatBedrock):
+    """Bedrock への送信を admission_controller で流量制御する ChatBedrock。
+
+    invoke / stream / astream のいずれも最終的に _generate / _stream を通るので、
+    ここで送信枠（リクエスト1回 + 入力の概算トークン + max_tokens）を確保する。
+    """
+
+    def _estimate_tokens(self, messages: List[BaseMessage]) -> int:
+        prompt = sum(estimate_tokens(str(m.content)) for m in messages)
+        return prompt + int((self.model_kwargs or {}).get("max_tokens", 0))
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        generate = super()._generate
+        tokens = self._estimate_tokens(messages)
+        result = admission_controller.call(
+            lambda: generate(messages, stop=stop, run_manager=run_manager, **kwargs), tokens
+        )
+        usage = result.generations[0].message.usage_metadata if result.generations else None
+        admission_controller.settle(tokens, usage["total_tokens"] if usage else None)
+        return result
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        stream = super()._stream
+        tokens = self._estimate_tokens(messages)
+        used = 0
+        for chunk in admission_controller.stream(
+            lambda: stream(messages, stop=stop, run_manager=run_manager, **kwargs), tokens
+        ):
+            usage = getattr(chunk.message, "usage_metadata", None)
+            if usage:
+                used += usage.get("total_tokens", 0)
+            yield chunk
+        admission_controller.settle(tokens, used or None)
+
+
+def get_llm(
+    max_tokens: int = 2000,
+    temperature: float = 0.0,
+    model_id: Optional[str] = None,
+) -> ChatBedrock:
+    """設定済みの ChatBedrock を返す。
+
+    (model_id, max_tokens, temperature) ごとに1インスタンスをキャッシュし、
+    bedrock-runtime クライアントは全インスタンスで共有する。
+    呼び出し側で引数を変えても、新しいクライアントは作られない。
+    """
+    model_id = model_id or settings.BEDROCK_MODEL_ID
+    key = (model_id, max_tokens, temperature)
+    llm = _models.get(key)
+    if llm is None:
+        with _lock:
+            llm = _models.get(key)
+            if llm is None:
+                llm = AdmittedChatBedrock(
+                    model_id=model_id,
+                    region_name=settings.AWS_REGION,
+                    client=get_client("bedrock-runtime"),
+                    bedrock_client=get_client("bedrock"),
+                    model_kwargs={
+                        "max_tokens": max_tokens,
+                        "temperature": temperature,
+                    },
+                )
+                _models[key] = llm
+                logger.info("LLMインスタンスを作成: %s", key)
+    return llm
@@ -0,0 +1,271 @@
+import json
+import logging
+import math
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Any, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.config import settings
+from app.core.embeddings import Embedder, get_embedder, tokenize
+from app.core.vector_store import Retriever
+
+logger = logging.getLogger(__name__)
+
+
+def split_text(text: str, chunk_size: int, overlap: int) -> list[str]:
+    """文字数ベースで重なりを持たせてテキストを分割する。"""
+    text = text.strip()
+    if not text:
+        return []
+    step = max(chunk_size - overlap, 1)
+    return [text[i:i + chunk_size] for i in range(0, max(len(text) - overlap, 1), step)]
+
+
+class BM25Index:
+    """メモリ上の転置インデックスによる BM25 検索。"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self._k1 = k1
+        self._b = b
+        self._postings: dict[str, list[tuple[int, int]]] = {}
+        self._lengths: dict[int, int] = {}
+        self._total_length = 0
+
+    def add(self, row: int, text: str) -> None:
+        counts = Counter(tokenize(text))
+        for term, tf in counts.items():
+            self._postings.setdefault(term, []).append((row, tf))
+        length = sum(counts.values())
+        self._lengths[row] = length
+        self._total_length += length
+
+    def remove(self, rows: set[int]) -> None:
+        for term in list(self._postings):
+            postings = [p for p in self._postings[term] if p[0] not in rows]
+            if postings:
+                self._postings[term] = postings
+            else:
+                del self._postings[term]
+        for row in rows:
+            self._total_length -= self._lengths.pop(row, 0)
+
+    def search(self, query: str, limit: int) -> list[tuple[int, float]]:
+        n = len(self._lengths)
+        if n == 0:
+            return []
+        avg_length = self._total_length / n
+        scores: dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for row, tf in postings:
+                norm = self._k1 * (1 - self._b + self._b * self._lengths[row] / avg_length)
+                scores[row] = scores.get(row, 0.0) + idf * tf * (self._k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+
+class DenseIndex:
+    """ディスク上の float32 行列をメモリマップして内積（コサイン類似度）で検索する。
+
+    行の追加はファイル末尾への追記のみ。削除された行はマスクで除外する。
+    """
+
+    def __init__(self, path: Path, dim: int):
+        self._path = path
+        self._dim = dim
+        self._matrix: Optional[np.memmap] = None
+        self._reload()
+
+    def _reload(self) -> None:
+        rows = self._path.stat().st_size // (4 * self._dim) if self._path.exists() else 0
+        self._matrix = (
+            np.memmap(self._path, dtype=np.float32, mode="r", shape=(rows, self._dim))
+            if rows else None
+        )
+
+    @property
+    def rows(self) -> int:
+        return 0 if self._matrix is None else self._matrix.shape[0]
+
+    def append(self, vectors: np.ndarray) -> None:
+        with open(self._path, "ab") as f:
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        self._reload()
+
+    def truncate(self, rows: int) -> None:
+        if self.rows > rows:
+            self._matrix = None
+            with open(self._path, "r+b") as f:
+                f.truncate(rows * 4 * self._dim)
+            self._reload()
+
+    @property
+    def matrix(self) -> Optional[np.memmap]:
+        return self._matrix
+
+    @staticmethod
+    def search(
+        matrix: Optional[np.memmap], vector: np.ndarray, alive: np.ndarray, limit: int
+    ) -> list[tuple[int, float]]:
+        if matrix is None:
+            return []
+        scores = np.asarray(matrix @ vector)
+        scores[~alive[: len(scores)]] = -np.inf
+        limit = min(limit, int(alive.sum()))
+        if limit <= 0:
+            return []
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        return [(int(row), float(scores[row])) for row in top]
+
+
+class LocalHybridRetriever(Retriever):
+    """密ベクトル検索と BM25 を Reciprocal Rank Fusion で統合するローカル検索エンジン。
+
+    インデックスは settings.LOCAL_INDEX_DIR に保存する。
+    - vectors.f32   : 埋め込み行列（メモリマップ）
+    - chunks.jsonl  : チャンク本文・メタデータと削除記録の追記ログ
+    - meta.json     : 埋め込みの種類と次元（不一致なら読み込みを拒否）
+    """
+
+    name = "local"
+
+    def __init__(self, index_dir: Path, embedder: Embedder):
+        self._dir = index_dir
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self._embedder = embedder
+        self._lock = threading.Lock()
+        self._check_meta()
+        self._dense = DenseIndex(self._dir / "vectors.f32", embedder.dim)
+        self._bm25 = BM25Index()
+        self._chunks: list[dict[str, Any]] = []
+        self._rows_by_doc: dict[str, list[int]] = {}
+        self._alive = np.zeros(0, dtype=bool)
+        self._load_log()
+
+    def _check_meta(self) -> None:
+        meta_path = self._dir / "meta.json"
+        meta = {"embedder": self._embedder.name, "dim": self._embedder.dim}
+        if meta_path.exists():
+            saved = json.loads(meta_path.read_text(encoding="utf-8"))
+            if saved != meta:
+                raise ValueError(
+                    f"ローカルインデックスの埋め込み設定が一致しません: {saved} != {meta}"
+                )
+        else:
+            meta_path.write_text(json.dumps(meta), encoding="utf-8")
+
+    def _load_log(self) -> None:
+        log_path = self._dir / "chunks.jsonl"
+        if log_path.exists():
+            pending: list[dict[str, Any]] = []
+            with open(log_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    record = json.loads(line)
+                    if "deleted" in record:
+                        self._register_chunks(pending)
+                        pending = []
+                        self._mark_deleted(record["deleted"])
+                    else:
+                        pending.append(record)
+            self._register_chunks(pending)
+        # 追記途中で落ちた場合などに本文とベクトルの行数がずれていたら揃える
+        self._dense.truncate(len(self._chunks))
+        if self._dense.rows < len(self._chunks):
+            missing = len(self._chunks) - self._dense.rows
+            self._alive[self._dense.rows:] = False
+            self._dense.append(np.zeros((missing, self._embedder.dim), dtype=np.float32))
+        logger.info("ローカルインデックス読み込み完了: %d チャンク", int(self._alive.sum()))
+
+    def _register_chunks(self, records: list[dict[str, Any]]) -> None:
+        start = len(self._chunks)
+        self._chunks.extend(records)
+        self._alive = np.concatenate([self._alive, np.ones(len(records), dtype=bool)])
+        for row, record in enumerate(records, start=start):
+            self._rows_by_doc.setdefault(record["docId"], []).append(row)
+            self._bm25.add(row, record["text"])
+
+    def _mark_deleted(self, doc_id: str) -> set[int]:
+        rows = set(self._rows_by_doc.pop(doc_id, []))
+        if rows:
+            self._alive[list(rows)] = False
+            self._bm25.remove(rows)
+        return rows
+
+    def _append_log(self, records: list[dict[str, Any]]) -> None:
+        with open(self._dir / "chunks.jsonl", "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def add_document(self, doc_id: str, source: str, pages: list[str]) -> int:
+        """ページごとのテキストをチャンク化してインデックスに追加する。追加したチャンク数を返す。"""
+        records = [
+            {"docId": doc_id, "text": chunk, "metadata": {"source": source, "page": page_number}}
+            for page_number, page_text in enumerate(pages, start=1)
+            for chunk in split_text(
+                page_text, settings.local_chunk_size, settings.local_chunk_overlap
+            )
+        ]
+        if not records:
+            return 0
+        vectors = self._embedder.embed([r["text"] for r in records])
+        with self._lock:
+            self._dense.append(vectors)
+            self._append_log(records)
+            self._register_chunks(records)
+        logger.info("ローカルインデックスに追加: %s (%d チャンク)", source, len(records))
+        return len(records)
+
+    def remove_document(self, doc_id: str) -> int:
+        with self._lock:
+            rows = self._mark_deleted(doc_id)
+            if rows:
+                self._append_log([{"deleted": doc_id}])
+        return len(rows)
+
+    def search(self, query: str, k: int = settings.search_k) -> list[Document]:
+        candidate_k = max(settings.local_candidate_k, k)
+        query_vector = self._embedder.embed([query])[0]
+        with self._lock:
+            matrix = self._dense.matrix
+            alive = self._alive.copy()
+            sparse_hits = self._bm25.search(query, candidate_k)
+            chunks = self._chunks
+        # 行列積はロックの外で行う（numpy は GIL を解放するので並行検索できる）
+        dense_hits = DenseIndex.search(matrix, query_vector, alive, candidate_k)
+
+        # Reciprocal Rank Fusion: score = Σ 1 / (rrf_k + rank)
+        fused: dict[int, float] = {}
+        for hits in (dense_hits, sparse_hits):
+            for rank, (row, _) in enumerate(hits, start=1):
+                fused[row] = fused.get(row, 0.0) + 1.0 / (settings.local_rrf_k + rank)
+
+        top = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:k]
+        documents = [
+            Document(
+                page_content=chunks[row]["text"],
+                metadata={**chunks[row]["metadata"], "score": score},
+            )
+            for row, score in top
+        ]
+        logger.info("ローカル検索完了: %d 件の結果", len(documents))
+        return documents
+
+
+_retriever: Optional[LocalHybridRetriever] = None
+_retriever_lock = threading.Lock()
+
+
+def get_local_retriever() -> LocalHybridRetriever:
+    global _retriever
+    if _retriever is None:
+        with _retriever_lock:
+            if _retriever is None:
+                _retriever = LocalHybridRetriever(Path(settings.LOCAL_INDEX_DIR), get_embedder())
+    return _retriever
@@ -0,0 +1,99 @@
+import base64
+import binascii
+import json
+from decimal import Decimal
+from typing import Any, Optional
+
+from fastapi import HTTPException
+
+# 新しい順の一覧用 GSI のパーティションキー（全アイテムで同じ値）
+LIST_KEY = "all"
+
+
+def encode_cursor(position: dict[str, Any]) -> str:
+    """ページ位置（DynamoDB の LastEvaluatedKey など）を URL に載せられる不透明な文字列にする。"""
+    raw = json.dumps(position, default=_to_json, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[dict[str, Any]]:
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        position = json.loads(raw, parse_float=Decimal)
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="cursor が不正です")
+    if not isinstance(position, dict):
+        raise HTTPException(status_code=400, detail="cursor が不正です")
+    return position
+
+
+def _to_json(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"cursor に変換できない値です: {value!r}")
+
+
+def query_page(
+    table,
+    limit: int,
+    cursor: Optional[str],
+    index_name: str,
+    projection: list[str],
+) -> tuple[list[dict[str, Any]], Optional[str]]:
+    """DynamoDB から新しい順に1ページ分のアイテムを取得する。
+
+    index_name が空なら（GSI を作っていない環境向けに）順序なしの scan でページングする。
+    """
+    names = {f"#p{i}": name for i, name in enumerate(projection)}
+    params: dict[str, Any] = {
+        "Limit": limit,
+        "ProjectionExpression": ", ".join(names),
+        "ExpressionAttributeNames": names,
+    }
+    start = decode_cursor(cursor)
+    if start:
+        params["ExclusiveStartKey"] = start
+    if index_name:
+        names["#listKey"] = "listKey"
+        response = table.query(
+            IndexName=index_name,
+            KeyConditionExpression="#listKey = :listKey",
+            ExpressionAttributeValues={":listKey": LIST_KEY},
+            ScanIndexForward=False,
+            **params,
+        )
+    else:
+        response = table.scan(**params)
+    last_key = response.get("LastEvaluatedKey")
+    return response.get("Items", []), encode_cursor(last_key) if last_key else None
+
+
+def paginate_items(
+    items: list[dict[str, Any]],
+    limit: int,
+    cursor: Optional[str],
+    id_field: str,
+) -> tuple[list[dict[str, Any]], Optional[str]]:
+    """メモリ上のアイテムを query_page と同じ意味（新しい順・続きは cursor）でページングする。"""
+    ordered = sorted(
+        items, key=lambda item: (str(item.get("createdAt", "")), item[id_field]), reverse=True
+    )
+    start = decode_cursor(cursor)
+    if start:
+        position = (str(start.get("createdAt", "")), start.get(id_field, ""))
+        ordered = [
+            item for item in ordered
+            if (str(item.get("createdAt", "")), item[id_field]) < position
+        ]
+    page = ordered[:limit]
+    if len(ordered) <= limit:
+        return page, None
+    last = page[-1]
+    return page, encode_cursor({"createdAt": last.get("createdAt", ""), id_field: last[id_field]})
+
+
+def project(item: dict[str, Any], fields: list[str]) -> dict[str, Any]:
+    """ProjectionExpression と同じく、指定した属性だけを残す。"""
+    return {name: item[name] for name in fields if name in item}
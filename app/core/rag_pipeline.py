@@ -1,8 +1,17 @@
+import time
+from typing import Any, AsyncIterator
+
 from langchain_aws import ChatBedrock
-from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_core.documents import Document
+from langchain_core.messages import BaseMessage, SystemMessage, HumanMessage
 
 from app.config import settings
-from app.core.vector_store import search
+from app.core.answer_cache import get_cached_answer, normalize_query, store_answer
+from app.core.context_packer import context_packer
+from app.core.executor import run_blocking
+from app.core.llm import get_llm
+from app.core.single_flight import AsyncSingleFlight, SingleFlight
+from app.core.vector_store import asearch, search
 
 SYSTEM_PROMPT = """あなたはナレッジアシスタントです。
 提供されたコンテキスト情報のみを使って、ユーザーの質問に正確に回答してください。
@@ -13,33 +22,160 @@ SYSTEM_PROMPT = """あなたはナレッジアシスタントです。
 - コンテキストに答えが含まれていない場合は、「提供された情報では回答できません」と伝えてください
 - 回答の最後に、参考にしたドキュメント名とページ番号を記載してください"""
 
+# 同じ質問が同時に来たときに検索・生成を1回にまとめる
+_answer_flight = SingleFlight()
+_async_answer_flight = AsyncSingleFlight()
+
+
+def _flight_key(query: str, k: int) -> tuple[str, int]:
+    return normalize_query(query), k
+
+
+def coalescing_stats() -> dict:
+    return {
+        "sync": _answer_flight.stats(),
+        "async": _async_answer_flight.stats(),
+    }
+
 
 def generate_answer(query: str, k: int = settings.search_k) -> dict:
-    """質問を受け取り、Bedrock KB検索→Bedrock Claudeで回答を生成する。"""
-    # 1. Bedrock Knowledge Base で関連ドキュメントを取得
-    docs = search(query, k=k)
-    context = "\n\n".join(doc.page_content for doc in docs)
+    """質問を受け取り、Bedrock KB検索→Bedrock Claudeで回答を生成する。
+
+    同じ質問（正規化後）・同じ k・同じKB世代の回答はキャッシュから返す。
+    キャッシュにない質問が同時に来た場合は、実行中の1回の結果を共有する。
+    """
+    cache_key, cached = get_cached_answer(query, k)
+    if cached is not None:
+        return cached
+
+    def compute() -> dict:
+        result = _generate_answer(query, k)
+        store_answer(cache_key, result)
+        return result
+
+    return _answer_flight.do(_flight_key(query, k), compute)
+
+
+def _create_llm() -> ChatBedrock:
+    return get_llm(max_tokens=2000, temperature=0.0)
 
-    # 2. Bedrock Claude で回答生成
-    llm = ChatBedrock(
-        model_id=settings.BEDROCK_MODEL_ID,
-        region_name=settings.AWS_REGION,
-        model_kwargs={
-            "max_tokens": 2000,
-            "temperature": 0.0,
-        },
-    )
 
-    messages = [
+def _build_messages(query: str, docs: list[Document]) -> list[BaseMessage]:
+    context = "\n\n".join(doc.page_content for doc in docs)
+    return [
         SystemMessage(content=SYSTEM_PROMPT),
         HumanMessage(
             content=f"## コンテキスト\n{context}\n\n## 質問\n{query}"
         ),
     ]
 
-    response = llm.invoke(messages)
+
+def _generate_answer(query: str, k: int) -> dict:
+    # 1. Bedrock Knowledge Base で関連ドキュメントを取得し、重複除去・トークン予算で整理
+    docs = context_packer.pack(search(query, k=k)).documents
+
+    # 2. Bedrock Claude で回答生成
+    llm = _create_llm()
+    response = llm.invoke(_build_messages(query, docs))
 
     return {
         "answer": response.content,
         "sources": [doc.metadata for doc in docs],
     }
+
+
+async def agenerate_answer(query: str, k: int = settings.search_k) -> dict:
+    """generate_answer の非同期版。待ち時間中にイベントループのスレッドを占有しない。"""
+    cache_key, cached = await run_blocking(get_cached_answer, query, k)
+    if cached is not None:
+        return cached
+
+    return await _async_answer_flight.do(
+        _flight_key(query, k), lambda: _agenerate_answer(query, k, cache_key)
+    )
+
+
+async def _agenerate_answer(query: str, k: int, cache_key: str | None) -> dict:
+    # 1. Bedrock Knowledge Base で関連ドキュメントを取得し、重複除去・トークン予算で整理
+    docs = context_packer.pack(await asearch(query, k=k)).documents
+
+    # 2. Bedrock Claude で回答生成
+    # ChatBedrock はネイティブの非同期実装を持たないため、ainvoke ではなく
+    # 専用スレッドプール上で invoke を実行する（既定 executor の枯渇を避ける）
+    llm = _create_llm()
+    response = await run_blocking(llm.invoke, _build_messages(query, docs))
+
+    result = {
+        "answer": response.content,
+        "sources": [doc.metadata for doc in docs],
+    }
+    await run_blocking(store_answer, cache_key, result)
+    return result
+
+
+async def generate_answer_stream(
+    query: str, k: int = settings.search_k
+) -> AsyncIterator[dict[str, Any]]:
+    """generate_answer のストリーミング版。以下のイベントを順に yield する。
+
+    - {"type": "sources", "sources": [...]}    検索結果のメタデータ
+    - {"type": "token", "text": "..."}         回答トークン（複数回）
+    - {"type": "done", "usage": ..., "timing": ..., "cached": bool}
+    """
+    started = time.perf_counter()
+
+    def elapsed_ms() -> int:
+        return int((time.perf_counter() - started) * 1000)
+
+    cache_key, cached = await run_blocking(get_cached_answer, query, k)
+    if cached is not None:
+        yield {"type": "sources", "sources": cached["sources"]}
+        yield {"type": "token", "text": cached["answer"]}
+        yield {
+            "type": "done",
+            "usage": None,
+            "timing": {"retrievalMs": 0, "firstTokenMs": elapsed_ms(), "totalMs": elapsed_ms()},
+            "cached": True,
+        }
+        return
+
+    # 1. Bedrock Knowledge Base で関連ドキュメントを取得し、重複除去・トークン予算で整理
+    packed = context_packer.pack(await asearch(query, k=k))
+    docs = packed.documents
+    retrieval_ms = elapsed_ms()
+    sources = [doc.metadata for doc in docs]
+    yield {"type": "sources", "sources": sources}
+
+    # 2. Bedrock Claude の出力をトークン単位で中継
+    llm = _create_llm()
+    answer_parts: list[str] = []
+    usage = None
+    first_token_ms = None
+    async for chunk in llm.astream(_build_messages(query, docs)):
+        if chunk.usage_metadata:
+            usage = chunk.usage_metadata if usage is None else {
+                key: usage.get(key, 0) + chunk.usage_metadata.get(key, 0)
+                for key in ("input_tokens", "output_tokens", "total_tokens")
+            }
+        text = chunk.content if isinstance(chunk.content, str) else ""
+        if not text:
+            continue
+        if first_token_ms is None:
+            first_token_ms = elapsed_ms()
+        answer_parts.append(text)
+        yield {"type": "token", "text": text}
+
+    await run_blocking(
+        store_answer, cache_key, {"answer": "".join(answer_parts), "sources": sources}
+    )
+    yield {
+        "type": "done",
+        "usage": dict(usage) if usage else None,
+        "timing": {
+            "retrievalMs": retrieval_ms,
+            "firstTokenMs": first_token_ms,
+            "totalMs": elapsed_ms(),
+        },
+        "context": packed.stats.as_dict(),
+        "cached": False,
+    }
@@ -0,0 +1,112 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Generic, Hashable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class _FlightStats:
+    """まとめられた呼び出しの集計。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.executions = 0
+
+    def record(self, leader: bool) -> None:
+        with self._lock:
+            self.calls += 1
+            if leader:
+                self.executions += 1
+
+    def as_dict(self, in_flight: int) -> dict[str, Any]:
+        with self._lock:
+            coalesced = self.calls - self.executions
+            return {
+                "calls": self.calls,
+                "executions": self.executions,
+                "coalesced": coalesced,
+                "coalescingRatio": coalesced / self.calls if self.calls else 0.0,
+                "inFlight": in_flight,
+            }
+
+
+class _Call(Generic[T]):
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[T] = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """同じキーの処理が実行中なら、新たに実行せずその結果を待って共有する（スレッド用）。
+
+    キャッシュと違い、完了済みの結果は保持しない。失敗した場合は待っていた全員に同じ例外を送る。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, _Call] = {}
+        self._stats = _FlightStats()
+
+    def do(self, key: Hashable, func: Callable[[], T]) -> T:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        self._stats.record(leader)
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            in_flight = len(self._calls)
+        return self._stats.as_dict(in_flight)
+
+
+class AsyncSingleFlight:
+    """SingleFlight の asyncio 版。
+
+    実際の処理は独立したタスクで実行するため、最初の呼び出し元がキャンセルされても
+    他の待機者には結果が届く。
+    """
+
+    def __init__(self):
+        self._tasks: dict[Hashable, asyncio.Task] = {}
+        self._stats = _FlightStats()
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        task = self._tasks.get(key)
+        leader = task is None
+        if leader:
+            task = asyncio.ensure_future(func())
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        self._stats.record(leader)
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        # 待機者が全員キャンセルされていても「例外が取得されなかった」警告を出さない
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict[str, Any]:
+        return self._stats.as_dict(len(self._tasks))
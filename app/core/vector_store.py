@@ -1,66 +1,119 @@
 import logging
 
-import boto3
 from langchain_core.documents import Document
 
 from app.config import settings
+from app.core.admission import admission_controller
+from app.core.aws_clients import get_client
+from app.core.executor import run_blocking
 
 logger = logging.getLogger(__name__)
 
 
 def _get_client():
     """Bedrock Agent Runtime クライアントを取得する。"""
-    return boto3.client(
-        "bedrock-agent-runtime",
-        region_name=settings.AWS_REGION,
-    )
+    return get_client("bedrock-agent-runtime")
 
 
-def search(query: str, k: int = settings.search_k) -> list[Document]:
-    """Bedrock Knowledge Base からクエリに関連するドキュメントを検索する。"""
-    client = _get_client()
-
-    response = client.retrieve(
-        knowledgeBaseId=settings.BEDROCK_KB_ID,
-        retrievalQuery={"text": query},
-        retrievalConfiguration={
-            "vectorSearchConfiguration": {
-                "numberOfResults": settings.rerank_initial_results,
-                "overrideSearchType": "HYBRID",
-            },
-            "rerankingConfiguration": {
-                "type": "BEDROCK_RERANKER",
-                "bedrockRerankingConfiguration": {
-                    "modelConfiguration": {
-                        "modelArn": (
-                            f"arn:aws:bedrock:{settings.AWS_REGION}"
-                            "::foundation-model/cohere.rerank-v3-5:0"
-                        ),
+class Retriever:
+    """検索バックエンドの共通インターフェース。
+
+    どのバックエンドも metadata に "source"（ファイル名）と "score" を持つ
+    Document のリストを返す。
+    """
+
+    name = "base"
+
+    def search(self, query: str, k: int = settings.search_k) -> list[Document]:
+        raise NotImplementedError
+
+
+class BedrockKBRetriever(Retriever):
+    """Bedrock Knowledge Base（ハイブリッド検索 + Cohere Rerank）で検索する。"""
+
+    name = "bedrock"
+
+    def search(self, query: str, k: int = settings.search_k) -> list[Document]:
+        client = _get_client()
+
+        # KB の検索も Bedrock の送信枠を使う（トークンは消費しない）
+        response = admission_controller.call(lambda: client.retrieve(
+            knowledgeBaseId=settings.BEDROCK_KB_ID,
+            retrievalQuery={"text": query},
+            retrievalConfiguration={
+                "vectorSearchConfiguration": {
+                    "numberOfResults": settings.rerank_initial_results,
+                    "overrideSearchType": "HYBRID",
+                },
+                "rerankingConfiguration": {
+                    "type": "BEDROCK_RERANKER",
+                    "bedrockRerankingConfiguration": {
+                        "modelConfiguration": {
+                            "modelArn": (
+                                f"arn:aws:bedrock:{settings.AWS_REGION}"
+                                "::foundation-model/cohere.rerank-v3-5:0"
+                            ),
+                        },
+                        "numberOfRerankedResults": k,
                     },
-                    "numberOfRerankedResults": k,
                 },
             },
-        },
-    )
-
-    documents = []
-    for result in response.get("retrievalResults", []):
-        content = result.get("content", {}).get("text", "")
-        metadata = {}
-
-        # S3のロケーション情報からソース名を取得
-        location = result.get("location", {})
-        if location.get("type") == "S3":
-            s3_uri = location.get("s3Location", {}).get("uri", "")
-            # s3://bucket/key からファイル名を抽出
-            metadata["source"] = s3_uri.split("/")[-1] if s3_uri else "不明"
-
-        # スコア情報
-        metadata["score"] = result.get("score", 0.0)
-
-        documents.append(
-            Document(page_content=content, metadata=metadata)
-        )
-
-    logger.info("Bedrock KB検索完了: %d 件の結果", len(documents))
-    return documents
+        ))
+
+        documents = []
+        for result in response.get("retrievalResults", []):
+            content = result.get("content", {}).get("text", "")
+            metadata = {}
+
+            # S3のロケーション情報からソース名を取得
+            location = result.get("location", {})
+            if location.get("type") == "S3":
+                s3_uri = location.get("s3Location", {}).get("uri", "")
+                # s3://bucket/key からファイル名を抽出
+                metadata["source"] = s3_uri.split("/")[-1] if s3_uri else "不明"
+
+            # 前処理したチャンクは .metadata.json の source / page を持つ
+            attributes = result.get("metadata", {})
+            if "source" in attributes:
+                metadata["source"] = attributes["source"]
+            if "page" in attributes:
+                metadata["page"] = int(attributes["page"])
+
+            # スコア情報
+            metadata["score"] = result.get("score", 0.0)
+
+            documents.append(
+                Document(page_content=content, metadata=metadata)
+            )
+
+        logger.info("Bedrock KB検索完了: %d 件の結果", len(documents))
+        return documents
+
+
+_retriever: Retriever | None = None
+
+
+def get_retriever() -> Retriever:
+    """settings.RETRIEVER_BACKEND で選択された検索バックエンドを返す。"""
+    global _retriever
+    if _retriever is None:
+        backend = settings.RETRIEVER_BACKEND
+        if backend == "bedrock":
+            _retriever = BedrockKBRetriever()
+        elif backend == "local":
+            from app.core.local_retriever import get_local_retriever
+
+            _retriever = get_local_retriever()
+        else:
+            raise ValueError(f"未知の RETRIEVER_BACKEND です: {backend}")
+    return _retriever
+
+
+def search(query: str, k: int = settings.search_k) -> list[Document]:
+    """設定された検索バックエンドからクエリに関連するドキュメントを検索する。"""
+    return get_retriever().search(query, k)
+
+
+async def asearch(query: str, k: int = settings.search_k) -> list[Document]:
+    """search の非同期版。検索はAWS I/O 専用スレッドプールで待つ。"""
+    return await run_blocking(search, query, k)
@@ -1,11 +1,22 @@
+import asyncio
+import json
+import logging
 import os
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from app.config import settings
 from app.api import tasks
 from app.api import websocket
 from app.api import documents
 from app.api import chat
+from app.api import metrics
+from app.api.websocket import manager
+from app.services.document_service import ingestion_tracker
+from app.services.pdf_preprocessor import shutdown_pool
+from app.services.task_service import recover_unfinished_tasks, task_queue
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title="RAG Knowledge Assistant API",
@@ -17,6 +28,7 @@ app.include_router(tasks.router)
 app.include_router(websocket.router)
 app.include_router(documents.router)
 app.include_router(chat.router)
+app.include_router(metrics.router)
 
 allow_origins = [
     os.environ.get("CORS_ALLOWED_ORIGIN", "http://localhost:3000"),
@@ -30,6 +42,38 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def push_document_status():
+    """ドキュメントの状態変化を WebSocket（/ws/documents）に配信する。"""
+    loop = asyncio.get_running_loop()
+
+    def on_change(event: dict):
+        message = json.dumps({"type": "document_status", "data": event})
+        asyncio.run_coroutine_threadsafe(manager.broadcast("documents", message), loop)
+
+    ingestion_tracker.add_listener(on_change)
+
+@app.on_event("startup")
+async def recover_task_queue():
+    """queued / running のまま更新が止まったタスクを投入し直す（プロセス内のキューのみ）。
+
+    同じテーブルを使う他のコンテナ（ローリング再起動中など）が実行中のタスクは対象にしない。
+    """
+    if settings.TASK_QUEUE_URL:
+        return
+    try:
+        await recover_unfinished_tasks(settings.task_stale_seconds)
+    except Exception as e:
+        logger.warning("未完了タスクの投入し直しに失敗: %s", e)
+
+@app.on_event("shutdown")
+async def stop_task_queue():
+    await task_queue.stop()
+
+@app.on_event("shutdown")
+def stop_pdf_workers():
+    shutdown_pool()
+
 @app.get("/")
 def root():
     return {"message": "Hello", "status": "ok"}   
\ No newline at end of file
@@ -1,5 +1,7 @@
 from pydantic import BaseModel, Field
 
+from app.config import settings
+
 class ChatRequest(BaseModel):
     message: str = Field(
         description="ユーザーのメッセージ",
@@ -8,6 +10,13 @@ class ChatRequest(BaseModel):
         examples=["RAGって何ですか？"]
     )
 
+class ChatBatchRequest(BaseModel):
+    items: list[ChatRequest] = Field(
+        description="まとめて処理するチャットリクエスト",
+        min_length=1,
+        max_length=settings.chat_batch_max_items,
+    )
+
 class Source(BaseModel):
     documentName: str = Field(description="参照元ドキュメント名")
     page: int = Field(description="参照ページ番号")
@@ -1,6 +1,75 @@
+from typing import Optional
+
 from pydantic import BaseModel, Field
 
+from app.config import settings
+
 class Document(BaseModel):
     id: str = Field(description="ドキュメントの一意なID")
     name: str = Field(description="ドキュメント名")
     uploadedAt: str = Field(description="アップロード日時")
+    status: str = Field(
+        default="ready", description="検索可能状態（indexing / ready / failed）"
+    )
+
+
+class DocumentStatus(BaseModel):
+    id: str = Field(description="ドキュメントID")
+    status: str = Field(description="検索可能状態（indexing / ready / failed）")
+    ingestionJobId: Optional[str] = Field(default=None, description="反映中・反映済みの Ingestion Job ID")
+
+
+class BulkUploadResult(BaseModel):
+    filename: str = Field(description="ファイル名（ZIP の場合はメンバー名）")
+    document: Optional[Document] = Field(default=None, description="登録されたドキュメント")
+    error: Optional[str] = Field(default=None, description="失敗した場合のエラー内容")
+
+class BulkUploadResponse(BaseModel):
+    results: list[BulkUploadResult] = Field(description="ファイルごとの結果")
+    succeeded: int = Field(description="成功件数")
+    failed: int = Field(description="失敗件数")
+
+
+class BatchDeleteRequest(BaseModel):
+    ids: list[str] = Field(
+        description="削除するドキュメントIDの一覧",
+        min_length=1,
+        max_length=settings.batch_delete_max_ids,
+    )
+
+class BatchDeleteResult(BaseModel):
+    id: str = Field(description="ドキュメントID")
+    status: str = Field(description="結果（deleted / not_found）")
+    document: Optional[Document] = Field(default=None, description="削除したドキュメント")
+
+class BatchDeleteResponse(BaseModel):
+    results: list[BatchDeleteResult] = Field(description="IDごとの結果（リクエスト順）")
+    deleted: int = Field(description="削除件数")
+    notFound: int = Field(description="見つからなかった件数")
+
+
+class UploadInitRequest(BaseModel):
+    filename: str = Field(description="アップロードするファイル名（.pdf）")
+    size: int = Field(description="ファイルサイズ（バイト）", gt=0)
+
+class UploadPartUrl(BaseModel):
+    partNumber: int = Field(description="パート番号（1始まり）")
+    url: str = Field(description="このパートを PUT する署名付きURL")
+
+class UploadInitResponse(BaseModel):
+    docId: str = Field(description="登録予定のドキュメントID")
+    uploadId: str = Field(description="S3 マルチパートアップロードID")
+    key: str = Field(description="S3 オブジェクトキー")
+    partSize: int = Field(description="パートサイズ（バイト）。最終パート以外はこのサイズで分割する")
+    parts: list[UploadPartUrl] = Field(description="パートごとの署名付きURL")
+    expiresIn: int = Field(description="署名付きURLの有効期間（秒）")
+
+class CompletedPart(BaseModel):
+    partNumber: int = Field(description="パート番号")
+    etag: str = Field(description="PUT レスポンスの ETag ヘッダー")
+
+class UploadCompleteRequest(BaseModel):
+    uploadId: str = Field(description="S3 マルチパートアップロードID")
+    filename: str = Field(description="開始時に指定したファイル名")
+    size: int = Field(description="ファイルサイズ（バイト）", gt=0)
+    parts: list[CompletedPart] = Field(description="アップロード済みパートの一覧", min_length=1)
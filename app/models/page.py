@@ -0,0 +1,12 @@
+from typing import Generic, Optional, TypeVar
+
+from pydantic import BaseModel, Field
+
+T = TypeVar("T")
+
+
+class Page(BaseModel, Generic[T]):
+    items: list[T] = Field(description="このページのアイテム（新しい順）")
+    nextCursor: Optional[str] = Field(
+        default=None, description="次のページの cursor。最後のページなら null"
+    )
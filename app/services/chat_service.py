@@ -1,10 +1,27 @@
+import asyncio
 import logging
+from typing import Any, AsyncIterator
 
+from app.config import settings
+from app.core.admission import admission_lane
+from app.core.answer_cache import normalize_query
 from app.models.chat import ChatRequest, ChatResponse, Source
-from app.core.rag_pipeline import generate_answer
+from app.core.rag_pipeline import agenerate_answer, generate_answer, generate_answer_stream
 
 logger = logging.getLogger(__name__)
 
+ERROR_MESSAGE = "エラーが発生しました。ドキュメントをアップロードしてから質問してください。"
+
+
+def _to_sources(metadata_list: list[dict[str, Any]]) -> list[Source]:
+    return [
+        Source(
+            documentName=s.get("source", "不明"),
+            page=s.get("page", 0),
+        )
+        for s in metadata_list
+    ]
+
 
 def process_chat(request: ChatRequest) -> ChatResponse:
     try:
@@ -12,19 +29,83 @@ def process_chat(request: ChatRequest) -> ChatResponse:
     except Exception as e:
         logger.error("RAGパイプラインでエラーが発生: %s", e)
         return ChatResponse(
-            message="エラーが発生しました。ドキュメントをアップロードしてから質問してください。",
+            message=ERROR_MESSAGE,
             sources=[],
         )
 
-    sources = [
-        Source(
-            documentName=s.get("source", "不明"),
-            page=s.get("page", 0),
+    return ChatResponse(
+        message=result["answer"],
+        sources=_to_sources(result.get("sources", [])),
+    )
+
+
+async def process_chat_async(request: ChatRequest) -> ChatResponse:
+    """process_chat の非同期版。"""
+    try:
+        result = await agenerate_answer(request.message)
+    except Exception as e:
+        logger.error("RAGパイプラインでエラーが発生: %s", e)
+        return ChatResponse(
+            message=ERROR_MESSAGE,
+            sources=[],
         )
-        for s in result.get("sources", [])
-    ]
 
     return ChatResponse(
         message=result["answer"],
-        sources=sources,
+        sources=_to_sources(result.get("sources", [])),
     )
+
+
+async def process_chat_stream(request: ChatRequest) -> AsyncIterator[dict[str, Any]]:
+    """process_chat のストリーミング版。
+
+    sources → token（複数）→ done の順にイベントを返す。
+    途中で失敗した場合は error イベントを返して終了する。
+    """
+    try:
+        async for event in generate_answer_stream(request.message):
+            if event["type"] == "sources":
+                yield {
+                    "type": "sources",
+                    "sources": [s.model_dump() for s in _to_sources(event["sources"])],
+                }
+            else:
+                yield event
+    except Exception as e:
+        logger.error("RAGパイプライン（ストリーミング）でエラーが発生: %s", e)
+        yield {"type": "error", "message": ERROR_MESSAGE}
+
+
+async def process_chat_batch(requests: list[ChatRequest]) -> AsyncIterator[dict[str, Any]]:
+    """複数の質問を同時実行数を制限しながら処理し、完了した順に結果を返す。
+
+    正規化後に同一の質問は1回だけ処理し、結果を該当する全インデックスに返す。
+    1件の失敗が他の項目に影響しないよう、項目ごとにエラーを閉じ込める。
+    """
+    groups: dict[str, list[int]] = {}
+    for index, request in enumerate(requests):
+        groups.setdefault(normalize_query(request.message), []).append(index)
+
+    semaphore = asyncio.Semaphore(settings.chat_batch_concurrency)
+
+    async def run(indices: list[int]) -> tuple[list[int], dict[str, Any]]:
+        async with semaphore:
+            try:
+                # 一括処理は対話の /chat より後回しにする
+                with admission_lane("background"):
+                    response = await process_chat_async(requests[indices[0]])
+                return indices, {"response": response.model_dump()}
+            except Exception as e:
+                logger.error("バッチ項目の処理でエラーが発生: %s", e)
+                return indices, {"error": str(e)}
+
+    tasks = [asyncio.create_task(run(indices)) for indices in groups.values()]
+    try:
+        for completed in asyncio.as_completed(tasks):
+            indices, result = await completed
+            for index in indices:
+                yield {"index": index, "message": requests[index].message, **result}
+    finally:
+        # クライアント切断などで途中終了した場合は残りを止める
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,123 @@
+import hashlib
+import logging
+from pathlib import Path
+from typing import Any, BinaryIO, Optional
+
+from app.config import settings
+from app.core.aws_clients import get_dynamodb_table
+from app.services.metadata_store import SQLiteContentHashStore
+
+logger = logging.getLogger(__name__)
+
+# 以前のローカル用ハッシュ索引。あれば初回起動時に SQLite に取り込む
+LEGACY_HASH_INDEX_FILE = Path("uploads") / "content_hashes.json"
+_READ_CHUNK = 1024 * 1024
+
+
+def sha256_of(fileobj: BinaryIO) -> str:
+    """ファイルを先頭からチャンク単位で読み、SHA-256 の16進文字列を返す（読み終えたら先頭に戻す）。"""
+    fileobj.seek(0)
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: fileobj.read(_READ_CHUNK), b""):
+        digest.update(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+class _DynamoDBHashIndex:
+    """DynamoDB のハッシュ索引。パーティションキー `contentHash` (S)。
+
+    参照カウントは ADD による原子的な増減で管理し、0 になったアイテムは
+    新しいアップロードの create() で上書きできる。
+    """
+
+    def __init__(self, table_name: str):
+        self._table_name = table_name
+
+    @property
+    def _table(self):
+        return get_dynamodb_table(self._table_name)
+
+    def add_ref(self, content_hash: str) -> Optional[dict[str, Any]]:
+        try:
+            response = self._table.update_item(
+                Key={"contentHash": content_hash},
+                UpdateExpression="ADD refCount :one",
+                ConditionExpression="attribute_exists(contentHash) AND refCount > :zero",
+                ExpressionAttributeValues={":one": 1, ":zero": 0},
+                ReturnValues="ALL_NEW",
+            )
+        except self._table.meta.client.exceptions.ConditionalCheckFailedException:
+            return None
+        return _from_item(response["Attributes"])
+
+    def create(self, content_hash: str, s3_key: Optional[str], doc_id: str) -> bool:
+        try:
+            self._table.put_item(
+                Item={"contentHash": content_hash, "s3Key": s3_key, "docId": doc_id, "refCount": 1},
+                ConditionExpression="attribute_not_exists(contentHash) OR refCount <= :zero",
+                ExpressionAttributeValues={":zero": 0},
+            )
+            return True
+        except self._table.meta.client.exceptions.ConditionalCheckFailedException:
+            return False
+
+    def release(self, content_hash: str) -> Optional[dict[str, Any]]:
+        try:
+            response = self._table.update_item(
+                Key={"contentHash": content_hash},
+                UpdateExpression="ADD refCount :minus",
+                ConditionExpression="attribute_exists(contentHash)",
+                ExpressionAttributeValues={":minus": -1},
+                ReturnValues="ALL_NEW",
+            )
+        except self._table.meta.client.exceptions.ConditionalCheckFailedException:
+            return None
+        entry = _from_item(response["Attributes"])
+        if entry["refCount"] <= 0:
+            try:
+                # 0 になった後に同じ内容が新しく登録されていたら消さない
+                self._table.delete_item(
+                    Key={"contentHash": content_hash},
+                    ConditionExpression="refCount <= :zero AND s3Key = :key",
+                    ExpressionAttributeValues={":zero": 0, ":key": entry["s3Key"]},
+                )
+            except self._table.meta.client.exceptions.ConditionalCheckFailedException:
+                pass
+        return entry
+
+
+def _from_item(item: dict[str, Any]) -> dict[str, Any]:
+    return {"s3Key": item.get("s3Key"), "docId": item["docId"], "refCount": int(item["refCount"])}
+
+
+class ContentIndex:
+    """アップロードされたファイル内容の SHA-256 → 保存済みオブジェクトの索引。
+
+    同じ内容のファイルは1つの S3 オブジェクト（とその埋め込み）を共有し、
+    参照しているドキュメント数を refCount で数える。
+    """
+
+    def __init__(self):
+        self._index = (
+            _DynamoDBHashIndex(settings.DYNAMODB_CONTENT_HASH_TABLE)
+            if settings.DYNAMODB_CONTENT_HASH_TABLE
+            else SQLiteContentHashStore(
+                Path(settings.LOCAL_METADATA_DB), legacy_json=LEGACY_HASH_INDEX_FILE
+            )
+        )
+
+    def link(self, content_hash: str) -> Optional[dict[str, Any]]:
+        """既知の内容なら参照を1つ増やしてエントリ（s3Key, docId, refCount）を返す。未知なら None。"""
+        return self._index.add_ref(content_hash)
+
+    def register(self, content_hash: str, s3_key: Optional[str], doc_id: str) -> bool:
+        """新しい内容を登録する。同時に同じ内容が登録されていた場合は False。"""
+        return self._index.create(content_hash, s3_key, doc_id)
+
+    def release(self, content_hash: str) -> Optional[dict[str, Any]]:
+        """参照を1つ減らしたエントリを返す。refCount が 0 なら実体を削除してよい。"""
+        return self._index.release(content_hash)
+
+
+content_index = ContentIndex()
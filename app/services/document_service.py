@@ -1,57 +1,73 @@
-import json
+import io
 import logging
+import math
+import tempfile
+import threading
 import uuid
-from datetime import datetime
-from pathlib import Path
-
-import boto3
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from pathlib import PurePosixPath
+from typing import Any, BinaryIO, Callable, ContextManager, Optional
+
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
 from fastapi import HTTPException, UploadFile
+from pypdf import PdfReader
 
 from app.config import settings
-from app.models.document import Document
+from app.core.answer_cache import bump_kb_generation
+from app.core.aws_clients import get_client
+from app.core.local_retriever import get_local_retriever
+from app.models.document import (
+    BatchDeleteResponse,
+    BatchDeleteResult,
+    BulkUploadResponse,
+    BulkUploadResult,
+    Document,
+    DocumentStatus,
+    UploadCompleteRequest,
+    UploadInitRequest,
+    UploadInitResponse,
+    UploadPartUrl,
+)
+from app.models.page import Page
+from app.services.content_index import content_index, sha256_of
+from app.services.ingestion_scheduler import IngestionScheduler
+from app.services.metadata_store import create_document_store
+from app.services.pdf_preprocessor import chunk_prefix, original_key, preprocess_pdf
+from app.services.ingestion_tracker import (
+    STATUS_INDEXING,
+    STATUS_READY,
+    IngestionTracker,
+)
 
 logger = logging.getLogger(__name__)
 
-METADATA_DIR = Path("uploads")
-METADATA_FILE = METADATA_DIR / "metadata.json"
+MIB = 1024 * 1024
+S3_DELETE_BATCH = 1000  # delete_objects の1回あたりの上限
+S3_MAX_PARTS = 10000
+REGISTER_ATTEMPTS = 3   # ハッシュ索引への登録が競合したときの試行回数
 
 
 def _get_s3_client():
     """S3クライアントを取得する。"""
-    return boto3.client("s3", region_name=settings.AWS_REGION)
-
-
-def _get_dynamodb_table():
-    """DynamoDB テーブルオブジェクトを返す。未設定なら None"""
-    table_name = settings.DYNAMODB_DOCUMENTS_TABLE
-    if not table_name:
-        return None
-    dynamodb = boto3.resource("dynamodb", region_name=settings.AWS_REGION)
-    return dynamodb.Table(table_name)
+    return get_client("s3")
 
 
 def _get_bedrock_agent_client():
     """Bedrock Agentクライアントを取得する。"""
-    return boto3.client("bedrock-agent", region_name=settings.AWS_REGION)
+    return get_client("bedrock-agent")
 
 
-def _load_metadata() -> dict:
-    """metadata.json を読み込む。なければ空辞書を返す。"""
-    if METADATA_FILE.exists():
-        with open(METADATA_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return {}
+def _sync_knowledge_base() -> str:
+    """Bedrock Knowledge Base の同期（Ingestion Job）を開始し、ジョブIDを返す。
 
-
-def _save_metadata(metadata: dict) -> None:
-    """metadata.json を保存する。"""
-    METADATA_DIR.mkdir(exist_ok=True)
-    with open(METADATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(metadata, f, ensure_ascii=False, indent=2)
-
-
-def _sync_knowledge_base() -> None:
-    """Bedrock Knowledge Base の同期（Ingestion Job）をトリガーする。"""
+    直接呼ばず、ingestion_scheduler.request_sync() 経由でまとめて実行する。
+    """
+    # S3 の内容は既に変わっているので、同期の成否にかかわらず回答キャッシュを無効化する
+    bump_kb_generation()
     try:
         client = _get_bedrock_agent_client()
         response = client.start_ingestion_job(
@@ -60,161 +76,639 @@ def _sync_knowledge_base() -> None:
         )
         job_id = response["ingestionJob"]["ingestionJobId"]
         logger.info("KB同期ジョブ開始: %s", job_id)
+        return job_id
     except Exception as e:
         logger.error("KB同期トリガーに失敗: %s", e)
+        raise
+
+
+def _uses_local_retriever() -> bool:
+    return settings.RETRIEVER_BACKEND == "local"
+
+
+def _uses_s3() -> bool:
+    """S3 + Bedrock KB を使うか。ローカル検索でバケット未設定ならオフライン動作とする。"""
+    return bool(settings.S3_DOCUMENTS_BUCKET) or not _uses_local_retriever()
+
+
+def _index_locally(doc_id: str, filename: str, fileobj) -> None:
+    """PDF のテキストをページごとに抽出してローカル検索インデックスに登録する。"""
+    try:
+        fileobj.seek(0)
+        pages = [page.extract_text() or "" for page in PdfReader(fileobj).pages]
+        get_local_retriever().add_document(doc_id, filename, pages)
+    except Exception as e:
+        logger.error("ローカルインデックス登録エラー: %s", e)
         raise HTTPException(
-            status_code=500,
-            detail=f"Knowledge Base の同期に失敗しました: {e}",
+            status_code=500, detail=f"ローカルインデックスへの登録に失敗しました: {e}"
         )
+    bump_kb_generation()
 
 
-def process_upload(file: UploadFile) -> Document:
-    """PDFをS3にアップロードし、Bedrock KBの同期をトリガーする。"""
+def _unindex_locally(doc_id: str) -> None:
+    try:
+        get_local_retriever().remove_document(doc_id)
+        bump_kb_generation()
+    except Exception as e:
+        logger.warning("ローカルインデックスからの削除に失敗: %s", e)
 
-    # 1. PDFかどうかチェック
-    if not file.filename or not file.filename.endswith(".pdf"):
+
+def _document_s3_keys(s3_key: str, indexed_doc_id: str) -> list[str]:
+    """ドキュメントの実体として削除すべき S3 キー（前処理した場合はチャンクとメタデータも）。"""
+    keys = [s3_key]
+    if s3_key.startswith("originals/"):
+        paginator = _get_s3_client().get_paginator("list_objects_v2")
+        for page in paginator.paginate(
+            Bucket=settings.S3_DOCUMENTS_BUCKET, Prefix=chunk_prefix(indexed_doc_id)
+        ):
+            keys.extend(obj["Key"] for obj in page.get("Contents", []))
+    return keys
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def _metadata_store():
+    """メタデータの保存先（DynamoDB / SQLite）を返す。初回呼び出し時に作成する。"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_document_store()
+    return _store
+
+
+def _update_documents(doc_ids: list[str], fields: dict[str, Any]) -> None:
+    _metadata_store().update(doc_ids, fields)
+
+
+ingestion_tracker = IngestionTracker(update_documents=_update_documents)
+ingestion_scheduler = IngestionScheduler(
+    start_job=_sync_knowledge_base, on_job_started=ingestion_tracker.track
+)
+
+
+def _to_document(doc_id: str, info: dict[str, Any]) -> Document:
+    # status 導入前のドキュメントは検索可能とみなす
+    return Document(
+        id=doc_id,
+        name=info["name"],
+        uploadedAt=info["uploadedAt"],
+        status=info.get("status", STATUS_READY),
+    )
+
+
+def _document_info(
+    name: str,
+    s3_key: Optional[str],
+    content_hash: Optional[str] = None,
+    status: str = STATUS_READY,
+) -> dict[str, Any]:
+    info = {
+        "name": name,
+        "uploadedAt": datetime.now().strftime("%Y-%m-%d"),
+        "createdAt": datetime.now(timezone.utc).isoformat(),
+        "s3Key": s3_key,
+        "status": status,
+    }
+    if content_hash:
+        info["contentHash"] = content_hash
+    return info
+
+
+def _register_document(
+    doc_id: str,
+    name: str,
+    s3_key: Optional[str],
+    content_hash: Optional[str] = None,
+    status: str = STATUS_READY,
+) -> Document:
+    """メタデータを保存して Document を返す。"""
+    info = _document_info(name, s3_key, content_hash, status)
+    _metadata_store().put(doc_id, info)
+    logger.info("ドキュメント登録完了: %s (id=%s)", name, doc_id)
+    return _to_document(doc_id, info)
+
+
+def _linked_status(existing: dict[str, Any]) -> str:
+    """共有する内容の元ドキュメントの状態（元が削除済みなら ready）。"""
+    owner = _metadata_store().get(existing["docId"])
+    return owner.get("status", STATUS_READY) if owner else STATUS_READY
+
+
+def _validate_pdf_filename(filename: Optional[str]) -> None:
+    if not filename or not filename.endswith(".pdf"):
         raise HTTPException(
             status_code=400, detail="PDFファイルのみアップロード可能です"
         )
 
+
+def process_upload(file: UploadFile) -> Document:
+    """PDFをS3にアップロードし、Bedrock KBの同期を予約する（同期の完了は待たない）。"""
+
+    # 1. PDFかどうかチェック
+    _validate_pdf_filename(file.filename)
+
     # 2. UUID生成
     doc_id = str(uuid.uuid4())
 
-    # 3. S3にアップロード
-    s3_key = f"documents/{doc_id}/{file.filename}"
+    # 3. 同じ内容が登録済みなら、その S3 オブジェクトと埋め込みを共有する（KB 同期も不要）
+    content_hash = sha256_of(file.file)
+    existing = content_index.link(content_hash)
+    if existing:
+        logger.info(
+            "同一内容のドキュメントを共有: %s -> %s (参照 %d)",
+            file.filename, existing["docId"], existing["refCount"],
+        )
+        return _register_linked(doc_id, file.filename, existing, content_hash)
+
+    # 4. S3にアップロード（前処理する場合、元の PDF は KB の対象外の場所に置く）
+    preprocess = settings.PDF_PREPROCESSING and _uses_s3()
+    if preprocess:
+        s3_key = original_key(doc_id, file.filename)
+    else:
+        s3_key = _upload_key(doc_id, file.filename) if _uses_s3() else None
+    if s3_key:
+        try:
+            s3 = _get_s3_client()
+            s3.upload_fileobj(
+                file.file,
+                settings.S3_DOCUMENTS_BUCKET,
+                s3_key,
+                ExtraArgs={"ContentType": "application/pdf"},
+            )
+            logger.info("S3アップロード完了: s3://%s/%s", settings.S3_DOCUMENTS_BUCKET, s3_key)
+        except Exception as e:
+            logger.error("S3アップロードエラー: %s", e)
+            raise HTTPException(
+                status_code=500, detail=f"S3へのアップロードに失敗しました: {e}"
+            )
+    if preprocess:
+        try:
+            preprocess_pdf(doc_id, file.filename, file.file)
+        except Exception as e:
+            logger.error("PDF前処理エラー: %s", e)
+            _delete_s3_objects(_document_s3_keys(s3_key, doc_id))
+            raise HTTPException(
+                status_code=500, detail=f"PDFの前処理に失敗しました: {e}"
+            )
+
+    # 5. ローカル検索インデックスへの反映とメタデータの保存
+    #    ハッシュ索引にはその後で登録し、保存に失敗した内容を他のアップロードが共有しないようにする
     try:
-        s3 = _get_s3_client()
-        s3.upload_fileobj(
-            file.file,
-            settings.S3_DOCUMENTS_BUCKET,
-            s3_key,
-            ExtraArgs={"ContentType": "application/pdf"},
+        if _uses_local_retriever():
+            _index_locally(doc_id, file.filename, file.file)
+        document = _register_document(
+            doc_id, file.filename, s3_key, content_hash,
+            STATUS_INDEXING if s3_key else STATUS_READY,
         )
-        logger.info("S3アップロード完了: s3://%s/%s", settings.S3_DOCUMENTS_BUCKET, s3_key)
-    except Exception as e:
-        logger.error("S3アップロードエラー: %s", e)
-        raise HTTPException(
-            status_code=500, detail=f"S3へのアップロードに失敗しました: {e}"
-        )
-
-    # 4. Bedrock KB 同期トリガー
-    _sync_knowledge_base()
-
-    # 5. メタデータを保存
-    uploaded_at = datetime.now().strftime("%Y-%m-%d")
-    table = _get_dynamodb_table()
-    if table:
-        # DynamoDB に保存
-        table.put_item(Item={
-            "docId": doc_id,
-            "name": file.filename,
-            "uploadedAt": uploaded_at,
-            "s3Key": s3_key,
-        })
+    except Exception:
+        _discard_content(doc_id, s3_key)
+        raise
+
+    # 6. 内容をハッシュ索引に登録する。同じ内容が並行してアップロードされていたら、
+    #    先に登録された方を共有し、こちらの実体は消す
+    for _ in range(REGISTER_ATTEMPTS):
+        if content_index.register(content_hash, s3_key, doc_id):
+            break
+        existing = content_index.link(content_hash)
+        if existing:
+            _discard_content(doc_id, s3_key)
+            return _register_linked(doc_id, file.filename, existing, content_hash)
+        # 先に登録された方が直後に削除された。もう一度登録を試みる
     else:
-        # フォールバック: ファイルに保存（ローカル開発用）
-        metadata = _load_metadata()
-        metadata[doc_id] = {
-            "name": file.filename,
-            "uploadedAt": uploaded_at,
-            "s3Key": s3_key,
-        }
-        _save_metadata(metadata)
+        _discard_content(doc_id, s3_key)
+        _metadata_store().delete(doc_id)
+        raise HTTPException(
+            status_code=500,
+            detail="同じ内容のアップロードと競合したため登録できませんでした。再度お試しください",
+        )
 
-    logger.info("ドキュメント登録完了: %s (id=%s)", file.filename, doc_id)
+    # 7. Bedrock KB の同期を予約する
+    if s3_key:
+        ingestion_scheduler.request_sync([doc_id])
+    return document
 
-    return Document(
-        id=doc_id,
-        name=file.filename,
-        uploadedAt=uploaded_at,
+
+def _register_linked(
+    doc_id: str, name: str, existing: dict[str, Any], content_hash: str
+) -> Document:
+    """登録済みの内容を共有するドキュメントを登録する。保存に失敗したら増やした参照を戻す。"""
+    try:
+        return _register_document(
+            doc_id, name, existing["s3Key"], content_hash, _linked_status(existing)
+        )
+    except Exception:
+        content_index.release(content_hash)
+        raise
+
+
+def _discard_content(doc_id: str, s3_key: Optional[str]) -> None:
+    """登録しなかったアップロードの実体（S3 オブジェクト・ローカルインデックス）を消す。"""
+    if s3_key:
+        for key, message in _delete_s3_objects(_document_s3_keys(s3_key, doc_id)).items():
+            logger.warning("S3ファイル削除に失敗: %s: %s", key, message)
+    if _uses_local_retriever():
+        _unindex_locally(doc_id)
+
+
+def _bulk_transfer_config() -> TransferConfig:
+    return TransferConfig(
+        multipart_threshold=settings.bulk_multipart_threshold_mb * MIB,
+        multipart_chunksize=settings.bulk_multipart_chunksize_mb * MIB,
+        max_concurrency=settings.bulk_transfer_concurrency,
+        use_threads=True,
     )
 
 
-def get_all_documents() -> list[Document]:
-    """登録済み全ドキュメントを返す。"""
-    table = _get_dynamodb_table()
-    if table:
-        # DynamoDB からすべて取得
-        response = table.scan()
-        items = response.get("Items", [])
-        return [
-            Document(id=item["docId"], name=item["name"], uploadedAt=item["uploadedAt"])
-            for item in items
-        ]
-    else:
-        # フォールバック: ファイルから読み込み
-        metadata = _load_metadata()
-        return [
-            Document(id=doc_id, name=info["name"], uploadedAt=info["uploadedAt"])
-            for doc_id, info in metadata.items()
-        ]
+def _rewound(fileobj: BinaryIO) -> ContextManager[BinaryIO]:
+    """UploadFile の本体を先頭に戻して返す（with を抜けても閉じない）。"""
+    fileobj.seek(0)
+    return nullcontext(fileobj)
 
 
-def delete_document(doc_id: str) -> Document:
-    """ドキュメントを削除する（metadata + S3）。"""
-    table = _get_dynamodb_table()
-    if table:
-        # DynamoDB から取得して削除
-        response = table.get_item(Key={"docId": doc_id})
-        item = response.get("Item")
-        if not item:
-            raise HTTPException(status_code=404, detail="ドキュメントが見つかりません")
-
-        # 1. S3 からファイル削除
-        s3_key = item.get("s3Key")
-        if s3_key:
+def _expand_bulk_files(files: list[UploadFile]) -> list[tuple[str, Callable[[], ContextManager[BinaryIO]]]]:
+    """アップロードされたファイル群を (ファイル名, ファイルを開く関数) の一覧に展開する。
+
+    ZIP アーカイブは展開せず、メンバーごとにストリームで読み出す。
+    """
+    entries: list[tuple[str, Callable[[], ContextManager[BinaryIO]]]] = []
+    for file in files:
+        if file.filename and file.filename.lower().endswith(".zip"):
             try:
-                s3 = _get_s3_client()
-                s3.delete_object(
-                    Bucket=settings.S3_DOCUMENTS_BUCKET,
-                    Key=s3_key,
+                archive = zipfile.ZipFile(file.file)
+            except zipfile.BadZipFile:
+                raise HTTPException(
+                    status_code=400, detail=f"ZIPファイルを読み込めません: {file.filename}"
                 )
-                logger.info("S3ファイル削除完了: %s", s3_key)
+            for member in archive.infolist():
+                if member.is_dir() or member.filename.startswith("__MACOSX/"):
+                    continue
+                entries.append((
+                    PurePosixPath(member.filename).name,
+                    lambda archive=archive, member=member: archive.open(member),
+                ))
+        else:
+            entries.append((file.filename or "", lambda file=file: _rewound(file.file)))
+    return entries
+
+
+def _upload_one(
+    doc_id: str, filename: str, open_file: Callable[[], ContextManager[BinaryIO]], config: TransferConfig
+) -> Optional[str]:
+    """1ファイル分のアップロードとローカル索引登録。S3 キーを返す。"""
+    _validate_pdf_filename(filename)
+    s3_key = _upload_key(doc_id, filename) if _uses_s3() else None
+    if s3_key:
+        with open_file() as fileobj:
+            _get_s3_client().upload_fileobj(
+                fileobj,
+                settings.S3_DOCUMENTS_BUCKET,
+                s3_key,
+                ExtraArgs={"ContentType": "application/pdf"},
+                Config=config,
+            )
+    if _uses_local_retriever():
+        with open_file() as fileobj:
+            # ZIP のメンバーはシークが遅いので、PDF の解析前にメモリに読み込む
+            _index_locally(doc_id, filename, io.BytesIO(fileobj.read()))
+    return s3_key
+
+
+def process_bulk_upload(files: list[UploadFile]) -> BulkUploadResponse:
+    """複数の PDF（または PDF を含む ZIP）をまとめて登録する。
+
+    S3 への転送はスレッドプールで並列に行い、メタデータは1回のバッチ書き込み、
+    KB 同期は最後に1回だけ予約する。失敗したファイルは結果に含めて他は続行する。
+    """
+    entries = _expand_bulk_files(files)
+    if len(entries) > settings.bulk_upload_max_files:
+        raise HTTPException(
+            status_code=413,
+            detail=f"一度にアップロードできるのは {settings.bulk_upload_max_files} ファイルまでです",
+        )
+
+    config = _bulk_transfer_config()
+    results: list[BulkUploadResult] = []
+    items: dict[str, dict[str, Any]] = {}
+    synced_doc_ids: list[str] = []
+    with ThreadPoolExecutor(
+        max_workers=settings.bulk_upload_concurrency, thread_name_prefix="bulk-upload"
+    ) as pool:
+        futures = []
+        for filename, open_file in entries:
+            doc_id = str(uuid.uuid4())
+            futures.append(
+                (filename, doc_id, pool.submit(_upload_one, doc_id, filename, open_file, config))
+            )
+        for filename, doc_id, future in futures:
+            try:
+                s3_key = future.result()
+            except HTTPException as e:
+                results.append(BulkUploadResult(filename=filename, error=str(e.detail)))
+                continue
             except Exception as e:
-                logger.warning("S3ファイル削除に失敗: %s", e)
+                logger.error("一括アップロードでエラー: %s: %s", filename, e)
+                results.append(BulkUploadResult(filename=filename, error=str(e)))
+                continue
+            items[doc_id] = _document_info(
+                filename, s3_key, status=STATUS_INDEXING if s3_key else STATUS_READY
+            )
+            if s3_key:
+                synced_doc_ids.append(doc_id)
+            results.append(BulkUploadResult(
+                filename=filename,
+                document=_to_document(doc_id, items[doc_id]),
+            ))
+
+    _metadata_store().put_many(items)
+    if synced_doc_ids:
+        ingestion_scheduler.request_sync(synced_doc_ids)
+
+    succeeded = len(items)
+    logger.info("一括アップロード完了: 成功 %d 件, 失敗 %d 件", succeeded, len(results) - succeeded)
+    return BulkUploadResponse(
+        results=results, succeeded=succeeded, failed=len(results) - succeeded
+    )
 
-        # 2. KB 再同期（削除を反映）
-        try:
-            _sync_knowledge_base()
-        except Exception as e:
-            logger.warning("削除後のKB同期に失敗: %s", e)
 
-        # 3. DynamoDB から削除
-        table.delete_item(Key={"docId": doc_id})
-        logger.info("ドキュメント削除完了: %s (id=%s)", item["name"], doc_id)
-        return Document(id=doc_id, name=item["name"], uploadedAt=item["uploadedAt"])
-    else:
-        # フォールバック: ファイルから削除
-        metadata = _load_metadata()
+def _choose_part_size(file_size: int) -> int:
+    """ファイルサイズに応じたマルチパートのパートサイズ（MiB 単位に切り上げ）を返す。
 
-        if doc_id not in metadata:
-            raise HTTPException(status_code=404, detail="ドキュメントが見つかりません")
+    S3 の制約（最終パート以外は 5MiB 以上、最大 10,000 パート）を満たしつつ、
+    小さいファイルでは最小サイズ、大きいファイルではパート数が上限に収まるサイズにする。
+    """
+    min_size = max(settings.upload_min_part_size_mb, 5) * MIB
+    size = max(min_size, math.ceil(file_size / S3_MAX_PARTS))
+    return math.ceil(size / MIB) * MIB
 
-        doc_info = metadata[doc_id]
 
-        # 1. S3 からファイル削除
-        s3_key = doc_info.get("s3Key")
-        if s3_key:
-            try:
-                s3 = _get_s3_client()
-                s3.delete_object(
-                    Bucket=settings.S3_DOCUMENTS_BUCKET,
-                    Key=s3_key,
-                )
-                logger.info("S3ファイル削除完了: %s", s3_key)
-            except Exception as e:
-                logger.warning("S3ファイル削除に失敗: %s", e)
+def _upload_key(doc_id: str, filename: str) -> str:
+    return f"documents/{doc_id}/{filename}"
+
+
+def create_upload(request: UploadInitRequest) -> UploadInitResponse:
+    """S3 への直接アップロード（マルチパート）を開始し、パートごとの署名付きURLを返す。"""
+    _validate_pdf_filename(request.filename)
+    if not settings.S3_DOCUMENTS_BUCKET:
+        raise HTTPException(status_code=400, detail="S3バケットが設定されていません")
+    if request.size > settings.upload_max_file_size_mb * MIB:
+        raise HTTPException(
+            status_code=413,
+            detail=f"ファイルサイズの上限（{settings.upload_max_file_size_mb}MB）を超えています",
+        )
 
-        # 2. KB 再同期（削除を反映）
+    doc_id = str(uuid.uuid4())
+    s3_key = _upload_key(doc_id, request.filename)
+    part_size = _choose_part_size(request.size)
+    part_count = max(math.ceil(request.size / part_size), 1)
+
+    try:
+        s3 = _get_s3_client()
+        upload_id = s3.create_multipart_upload(
+            Bucket=settings.S3_DOCUMENTS_BUCKET,
+            Key=s3_key,
+            ContentType="application/pdf",
+        )["UploadId"]
+        parts = [
+            UploadPartUrl(
+                partNumber=part_number,
+                url=s3.generate_presigned_url(
+                    "upload_part",
+                    Params={
+                        "Bucket": settings.S3_DOCUMENTS_BUCKET,
+                        "Key": s3_key,
+                        "UploadId": upload_id,
+                        "PartNumber": part_number,
+                    },
+                    ExpiresIn=settings.upload_url_expires_seconds,
+                ),
+            )
+            for part_number in range(1, part_count + 1)
+        ]
+    except Exception as e:
+        logger.error("マルチパートアップロードの開始に失敗: %s", e)
+        raise HTTPException(
+            status_code=500, detail=f"アップロードの開始に失敗しました: {e}"
+        )
+
+    logger.info(
+        "直接アップロード開始: %s (id=%s, %d パート x %d bytes)",
+        request.filename, doc_id, part_count, part_size,
+    )
+    return UploadInitResponse(
+        docId=doc_id,
+        uploadId=upload_id,
+        key=s3_key,
+        partSize=part_size,
+        parts=parts,
+        expiresIn=settings.upload_url_expires_seconds,
+    )
+
+
+def complete_upload(doc_id: str, request: UploadCompleteRequest) -> Document:
+    """直接アップロードを完了し、オブジェクトを検証してからメタデータ登録・KB同期予約を行う。"""
+    _validate_pdf_filename(request.filename)
+    if _metadata_store().get(doc_id):
+        # 完了済みのアップロードを再度完了しても、登録と KB 同期を繰り返さない
+        raise HTTPException(status_code=409, detail="このアップロードは完了済みです")
+    s3_key = _upload_key(doc_id, request.filename)
+    bucket = settings.S3_DOCUMENTS_BUCKET
+    s3 = _get_s3_client()
+
+    try:
+        s3.complete_multipart_upload(
+            Bucket=bucket,
+            Key=s3_key,
+            UploadId=request.uploadId,
+            MultipartUpload={"Parts": [
+                {"PartNumber": part.partNumber, "ETag": part.etag}
+                for part in sorted(request.parts, key=lambda p: p.partNumber)
+            ]},
+        )
+    except Exception as e:
+        logger.error("マルチパートアップロードの完了に失敗: %s", e)
+        raise HTTPException(
+            status_code=400, detail=f"アップロードの完了に失敗しました: {e}"
+        )
+
+    # 申告サイズと PDF ヘッダーを検証し、不正なら削除する
+    try:
+        head = s3.head_object(Bucket=bucket, Key=s3_key)
+        header = s3.get_object(Bucket=bucket, Key=s3_key, Range="bytes=0-4")["Body"].read()
+    except ClientError as e:
+        # doc_id / filename の誤りや、検証に失敗して削除済みのオブジェクト
+        logger.error("アップロードされたオブジェクトの取得に失敗: %s: %s", s3_key, e)
+        if e.response.get("Error", {}).get("Code") in {"404", "NoSuchKey", "NotFound"}:
+            raise HTTPException(status_code=404, detail="アップロードされたファイルが見つかりません")
+        raise HTTPException(
+            status_code=400, detail=f"アップロードされたファイルを検証できませんでした: {e}"
+        )
+    if head["ContentLength"] != request.size or header != b"%PDF-":
+        s3.delete_object(Bucket=bucket, Key=s3_key)
+        logger.warning("アップロードされたオブジェクトの検証に失敗: %s", s3_key)
+        raise HTTPException(
+            status_code=400, detail="アップロードされたファイルが不正です（サイズまたは形式）"
+        )
+
+    if _uses_local_retriever():
+        with tempfile.TemporaryFile() as f:
+            s3.download_fileobj(bucket, s3_key, f)
+            f.seek(0)
+            _index_locally(doc_id, request.filename, f)
+    document = _register_document(doc_id, request.filename, s3_key, status=STATUS_INDEXING)
+    ingestion_scheduler.request_sync([doc_id])
+    return document
+
+
+def abort_upload(doc_id: str, upload_id: str, filename: str) -> None:
+    """完了しなかった直接アップロードを中止し、アップロード済みのパートを破棄する。"""
+    try:
+        _get_s3_client().abort_multipart_upload(
+            Bucket=settings.S3_DOCUMENTS_BUCKET,
+            Key=_upload_key(doc_id, filename),
+            UploadId=upload_id,
+        )
+    except Exception as e:
+        logger.error("マルチパートアップロードの中止に失敗: %s", e)
+        raise HTTPException(
+            status_code=400, detail=f"アップロードの中止に失敗しました: {e}"
+        )
+
+
+def get_documents(limit: int, cursor: Optional[str] = None) -> Page[Document]:
+    """登録済みドキュメントを新しい順に1ページ分返す。"""
+    items, next_cursor = _metadata_store().list_page(limit, cursor)
+    return Page(
+        items=[_to_document(item["docId"], item) for item in items],
+        nextCursor=next_cursor,
+    )
+
+
+def _release_content(doc_id: str, item: dict[str, Any]) -> Optional[str]:
+    """ドキュメントが参照する内容の参照を外す。
+
+    実体（S3 オブジェクト・検索インデックス）も削除すべきなら、インデックス上の
+    ドキュメントID を返す。同じ内容を他のドキュメントがまだ共有していれば None。
+    """
+    content_hash = item.get("contentHash")
+    if not content_hash:
+        return doc_id
+    entry = content_index.release(content_hash)
+    if entry is None:
+        return doc_id
+    if entry["refCount"] > 0:
+        logger.info("共有中の内容は保持（残り参照 %d）: %s", entry["refCount"], doc_id)
+        return None
+    return entry["docId"]
+
+
+def delete_document(doc_id: str) -> Document:
+    """ドキュメントを削除する（metadata + S3）。"""
+    item = _metadata_store().get(doc_id)
+    if not item:
+        raise HTTPException(status_code=404, detail="ドキュメントが見つかりません")
+
+    # 1. 内容を共有している場合は参照を外し、最後の参照でなければ実体は残す
+    indexed_doc_id = _release_content(doc_id, item)
+    s3_key = item.get("s3Key") if indexed_doc_id else None
+
+    # 2. S3 からファイル削除（前処理したチャンクも含む）
+    if s3_key:
+        for key, message in _delete_s3_objects(_document_s3_keys(s3_key, indexed_doc_id)).items():
+            logger.warning("S3ファイル削除に失敗: %s: %s", key, message)
+
+    # 3. 検索インデックスから削除（ローカル検索 / KB 再同期）
+    if indexed_doc_id and _uses_local_retriever():
+        _unindex_locally(indexed_doc_id)
+    if s3_key:
+        ingestion_scheduler.request_sync([doc_id])
+
+    # 4. メタデータから削除
+    _metadata_store().delete(doc_id)
+    logger.info("ドキュメント削除完了: %s (id=%s)", item["name"], doc_id)
+    return _to_document(doc_id, item)
+
+
+def _delete_s3_objects(s3_keys: list[str]) -> dict[str, str]:
+    """S3 オブジェクトを delete_objects で 1000 件ずつ削除する。失敗したキーとエラー内容を返す。"""
+    errors: dict[str, str] = {}
+    s3 = _get_s3_client()
+    for start in range(0, len(s3_keys), S3_DELETE_BATCH):
+        chunk = s3_keys[start:start + S3_DELETE_BATCH]
         try:
-            _sync_knowledge_base()
+            response = s3.delete_objects(
+                Bucket=settings.S3_DOCUMENTS_BUCKET,
+                Delete={"Objects": [{"Key": key} for key in chunk], "Quiet": True},
+            )
         except Exception as e:
-            logger.warning("削除後のKB同期に失敗: %s", e)
-
-        # 3. metadata.json から削除
-        deleted = metadata.pop(doc_id)
-        _save_metadata(metadata)
+            logger.warning("S3ファイルの一括削除に失敗: %s", e)
+            errors.update((key, str(e)) for key in chunk)
+            continue
+        for error in response.get("Errors", []):
+            errors[error["Key"]] = error.get("Message", error.get("Code", ""))
+    return errors
+
+
+def delete_documents(doc_ids: list[str]) -> BatchDeleteResponse:
+    """複数のドキュメントをまとめて削除する。
+
+    メタデータの取得・削除と S3 の削除はそれぞれ一括 API で行い、KB 同期は1回だけ予約する。
+    """
+    doc_ids = list(dict.fromkeys(doc_ids))
+    store = _metadata_store()
+    items = store.get_many(doc_ids)
+
+    # 1. 共有中の内容の参照を外し、実体を消すものを集める
+    s3_keys: dict[str, list[str]] = {}
+    unindex_ids: list[str] = []
+    for doc_id, item in items.items():
+        indexed_doc_id = _release_content(doc_id, item)
+        if indexed_doc_id is None:
+            continue
+        unindex_ids.append(indexed_doc_id)
+        if item.get("s3Key"):
+            s3_keys[doc_id] = _document_s3_keys(item["s3Key"], indexed_doc_id)
+
+    # 2. S3 からファイル削除（失敗してもメタデータは消す。単体削除と同じ扱い）
+    if s3_keys:
+        all_keys = [key for keys in s3_keys.values() for key in keys]
+        for key, message in _delete_s3_objects(all_keys).items():
+            logger.warning("S3ファイル削除に失敗: %s: %s", key, message)
+
+    # 3. 検索インデックスから削除（ローカル検索 / KB 再同期は1回だけ）
+    if _uses_local_retriever():
+        for indexed_doc_id in unindex_ids:
+            _unindex_locally(indexed_doc_id)
+    if s3_keys:
+        ingestion_scheduler.request_sync(list(s3_keys))
+
+    # 4. メタデータから削除
+    store.delete_many(list(items))
+    logger.info("ドキュメント一括削除完了: %d 件（見つからない ID %d 件）",
+                len(items), len(doc_ids) - len(items))
+    return BatchDeleteResponse(
+        results=[
+            BatchDeleteResult(id=doc_id, status="deleted", document=_to_document(doc_id, items[doc_id]))
+            if doc_id in items else BatchDeleteResult(id=doc_id, status="not_found")
+            for doc_id in doc_ids
+        ],
+        deleted=len(items),
+        notFound=len(doc_ids) - len(items),
+    )
 
-        logger.info("ドキュメント削除完了: %s (id=%s)", deleted["name"], doc_id)
 
-        return Document(id=doc_id, name=deleted["name"], uploadedAt=deleted["uploadedAt"])
+def get_document_status(doc_id: str) -> DocumentStatus:
+    """ドキュメントの検索可能状態を返す。同期中なら Ingestion Job の状態をその場で確認する。"""
+    item = _metadata_store().get(doc_id)
+    if not item:
+        raise HTTPException(status_code=404, detail="ドキュメントが見つかりません")
+    status = item.get("status", STATUS_READY)
+    job_id = item.get("ingestionJobId")
+    if status == STATUS_INDEXING and job_id:
+        try:
+            status = ingestion_tracker.refresh(job_id, [doc_id])
+        except Exception as e:
+            logger.warning("KB同期ジョブの状態取得に失敗: %s", e)
+    return DocumentStatus(id=doc_id, status=status, ingestionJobId=job_id)
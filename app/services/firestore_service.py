@@ -1,13 +1,19 @@
 import json
 import logging
+import threading
+from datetime import datetime, timezone
 from decimal import Decimal
 from typing import Optional, Any
 
-import boto3
 from app.config import settings
+from app.core.aws_clients import get_dynamodb_table
+from app.core.pagination import LIST_KEY, paginate_items, project, query_page
 
 logger = logging.getLogger(__name__)
 
+# 一覧で返す概要フィールド
+SUMMARY_FIELDS = ["taskId", "task", "status", "createdAt", "total_minutes", "total_days"]
+
 
 class FirestoreService:
     """タスクデータの保存サービス。
@@ -18,23 +24,74 @@ class FirestoreService:
 
     def __init__(self):
         self._dict: dict[str, dict[str, Any]] = {}  # フォールバック用
-        self._table = None
-        table_name = settings.DYNAMODB_TASKS_TABLE
-        if table_name:
-            dynamodb = boto3.resource("dynamodb", region_name=settings.AWS_REGION)
-            self._table = dynamodb.Table(table_name)
-            logger.info(f"DynamoDB テーブル '{table_name}' に接続しました")
+        self._dict_lock = threading.Lock()
+        self._table_name = settings.DYNAMODB_TASKS_TABLE
+        if self._table_name:
+            logger.info(f"DynamoDB テーブル '{self._table_name}' に接続しました")
         else:
             logger.info("DYNAMODB_TASKS_TABLE 未設定 → メモリ辞書を使用します")
 
+    @property
+    def _table(self):
+        return get_dynamodb_table(self._table_name) if self._table_name else None
+
     def save(self, task_id: str, data: dict[str, Any]) -> None:
+        created_at = data.get("created_at") or datetime.now(timezone.utc)
+        item = {
+            "taskId": task_id,
+            **data,
+            "listKey": LIST_KEY,
+            "createdAt": created_at.isoformat() if isinstance(created_at, datetime) else str(created_at),
+            "updatedAt": datetime.now(timezone.utc).isoformat(),
+        }
         if self._table:
-            item = {"taskId": task_id, **data}
-            # DynamoDB は float 非対応なので Decimal に変換
-            item = json.loads(json.dumps(item), parse_float=Decimal)
+            # DynamoDB は float / datetime 非対応なので Decimal / 文字列に変換
+            item = json.loads(json.dumps(item, default=str), parse_float=Decimal)
             self._table.put_item(Item=item)
         else:
-            self._dict[task_id] = data
+            with self._dict_lock:
+                self._dict[task_id] = item
+
+    def transition(
+        self,
+        task_id: str,
+        from_status: str,
+        to_status: str,
+        expected_updated_at: Optional[str] = None,
+    ) -> bool:
+        """ステータスが from_status のままなら to_status に変える（条件付き更新）。変えられなければ False。
+
+        expected_updated_at を渡すと、読み取ってから誰も更新していないことも確認する
+        （空文字なら updatedAt のないアイテムであること）。
+        """
+        now = datetime.now(timezone.utc).isoformat()
+        if not self._table:
+            with self._dict_lock:
+                item = self._dict.get(task_id)
+                if item is None or item.get("status") != from_status:
+                    return False
+                if expected_updated_at is not None and item.get("updatedAt", "") != expected_updated_at:
+                    return False
+                item.update(status=to_status, updatedAt=now)
+                return True
+        condition = "#status = :from"
+        values = {":from": from_status, ":to": to_status, ":now": now}
+        if expected_updated_at == "":
+            condition += " AND attribute_not_exists(updatedAt)"
+        elif expected_updated_at is not None:
+            condition += " AND updatedAt = :expected"
+            values[":expected"] = expected_updated_at
+        try:
+            self._table.update_item(
+                Key={"taskId": task_id},
+                UpdateExpression="SET #status = :to, updatedAt = :now",
+                ConditionExpression=condition,
+                ExpressionAttributeNames={"#status": "status"},
+                ExpressionAttributeValues=values,
+            )
+            return True
+        except self._table.meta.client.exceptions.ConditionalCheckFailedException:
+            return False
 
     def get(self, task_id: str) -> Optional[dict[str, Any]]:
         if self._table:
@@ -42,11 +99,41 @@ class FirestoreService:
             return response.get("Item")
         return self._dict.get(task_id)
 
-    def get_all(self) -> list[dict[str, Any]]:
+    def list_by_status(self, statuses: list[str]) -> list[dict[str, Any]]:
+        """指定したステータスのタスク（taskId, task, status, created_at, updatedAt）を返す。"""
+        fields = ["taskId", "task", "status", "created_at", "updatedAt"]
+        if not self._table:
+            return [
+                project(item, fields) for item in self._dict.values()
+                if item.get("status") in statuses
+            ]
+        names = {f"#p{i}": name for i, name in enumerate(fields)}
+        values = {f":s{i}": status for i, status in enumerate(statuses)}
+        params: dict[str, Any] = {
+            "ProjectionExpression": ", ".join(names),
+            "FilterExpression": f"#status IN ({', '.join(values)})",
+            "ExpressionAttributeNames": {**names, "#status": "status"},
+            "ExpressionAttributeValues": values,
+        }
+        items: list[dict[str, Any]] = []
+        while True:
+            response = self._table.scan(**params)
+            items.extend(response.get("Items", []))
+            last_key = response.get("LastEvaluatedKey")
+            if not last_key:
+                return items
+            params["ExclusiveStartKey"] = last_key
+
+    def list(
+        self, limit: int, cursor: Optional[str] = None
+    ) -> tuple[list[dict[str, Any]], Optional[str]]:
+        """タスクの概要を新しい順に1ページ分返す。(items, 次ページの cursor)"""
         if self._table:
-            response = self._table.scan()
-            return response.get("Items", [])
-        return list(self._dict.values())
+            return query_page(
+                self._table, limit, cursor, settings.list_index_name, SUMMARY_FIELDS
+            )
+        items, next_cursor = paginate_items(list(self._dict.values()), limit, cursor, "taskId")
+        return [project(item, SUMMARY_FIELDS) for item in items], next_cursor
 
     def delete(self, task_id: str) -> Optional[dict[str, Any]]:
         if self._table:
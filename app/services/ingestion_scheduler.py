@@ -0,0 +1,284 @@
+import logging
+import threading
+import time
+import uuid
+from typing import Any, Callable, Optional
+
+from app.config import settings
+from app.core.aws_clients import get_client, get_dynamodb_table
+
+logger = logging.getLogger(__name__)
+
+STATE_KEY = "kb-ingestion"
+RUNNING_STATUSES = {"STARTING", "IN_PROGRESS", "STOPPING"}
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+class _MemoryState:
+    """1プロセス内だけで共有するスケジューラの状態（ローカル開発用）。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state: dict[str, Any] = {
+            "dirty": False,
+            "lastChangeAt": 0,
+            "jobId": None,
+            "pendingDocIds": [],
+        }
+        self._lease_owner: Optional[str] = None
+        self._lease_until = 0
+
+    def mark_dirty(self, doc_ids: list[str], now: int) -> None:
+        with self._lock:
+            self._state["dirty"] = True
+            self._state["lastChangeAt"] = now
+            self._state["pendingDocIds"] = self._state["pendingDocIds"] + doc_ids
+
+    def acquire(self, owner: str, now: int, lease_ms: int) -> bool:
+        with self._lock:
+            if self._lease_until >= now and self._lease_owner != owner:
+                return False
+            self._lease_owner = owner
+            self._lease_until = now + lease_ms
+            return True
+
+    def release(self, owner: str) -> None:
+        with self._lock:
+            if self._lease_owner == owner:
+                self._lease_until = 0
+
+    def read(self) -> dict[str, Any]:
+        with self._lock:
+            return dict(self._state)
+
+    def claim(self, seen_change_at: int, job_id: str) -> bool:
+        with self._lock:
+            if self._state["lastChangeAt"] != seen_change_at:
+                return False
+            self._state.update(dirty=False, jobId=job_id, pendingDocIds=[])
+            return True
+
+    def set_job(self, job_id: Optional[str]) -> None:
+        with self._lock:
+            self._state["jobId"] = job_id
+
+
+class _DynamoDBState:
+    """DynamoDB の1アイテムにスケジューラの状態を保存し、全ワーカー・Lambda で共有する。
+
+    テーブルはパーティションキー `stateKey` (S) を持つこと。
+    ジョブの開始判定はリース（条件付き書き込み）を取ったワーカーだけが行う。
+    """
+
+    def __init__(self, table_name: str):
+        self._table_name = table_name
+
+    @property
+    def _table(self):
+        return get_dynamodb_table(self._table_name)
+
+    def mark_dirty(self, doc_ids: list[str], now: int) -> None:
+        self._table.update_item(
+            Key={"stateKey": STATE_KEY},
+            UpdateExpression=(
+                "SET dirty = :true, lastChangeAt = :now, "
+                "pendingDocIds = list_append(if_not_exists(pendingDocIds, :empty), :ids)"
+            ),
+            ExpressionAttributeValues={
+                ":true": True, ":now": now, ":empty": [], ":ids": doc_ids,
+            },
+        )
+
+    def acquire(self, owner: str, now: int, lease_ms: int) -> bool:
+        try:
+            self._table.update_item(
+                Key={"stateKey": STATE_KEY},
+                UpdateExpression="SET leaseOwner = :owner, leaseUntil = :until",
+                ConditionExpression=(
+                    "attribute_not_exists(leaseUntil) OR leaseUntil < :now OR leaseOwner = :owner"
+                ),
+                ExpressionAttributeValues={
+                    ":owner": owner, ":until": now + lease_ms, ":now": now,
+                },
+            )
+            return True
+        except self._table.meta.client.exceptions.ConditionalCheckFailedException:
+            return False
+
+    def release(self, owner: str) -> None:
+        try:
+            self._table.update_item(
+                Key={"stateKey": STATE_KEY},
+                UpdateExpression="SET leaseUntil = :zero",
+                ConditionExpression="leaseOwner = :owner",
+                ExpressionAttributeValues={":zero": 0, ":owner": owner},
+            )
+        except self._table.meta.client.exceptions.ConditionalCheckFailedException:
+            pass
+
+    def read(self) -> dict[str, Any]:
+        response = self._table.get_item(Key={"stateKey": STATE_KEY}, ConsistentRead=True)
+        item = response.get("Item", {})
+        return {
+            "dirty": bool(item.get("dirty", False)),
+            "lastChangeAt": int(item.get("lastChangeAt", 0)),
+            "jobId": item.get("jobId"),
+            "pendingDocIds": list(item.get("pendingDocIds", [])),
+        }
+
+    def claim(self, seen_change_at: int, job_id: str) -> bool:
+        try:
+            self._table.update_item(
+                Key={"stateKey": STATE_KEY},
+                UpdateExpression="SET dirty = :false, jobId = :job, pendingDocIds = :empty",
+                ConditionExpression="lastChangeAt = :seen",
+                ExpressionAttributeValues={
+                    ":false": False, ":job": job_id, ":empty": [], ":seen": seen_change_at,
+                },
+            )
+            return True
+        except self._table.meta.client.exceptions.ConditionalCheckFailedException:
+            return False
+
+    def set_job(self, job_id: Optional[str]) -> None:
+        self._table.update_item(
+            Key={"stateKey": STATE_KEY},
+            UpdateExpression="SET jobId = :job",
+            ExpressionAttributeValues={":job": job_id},
+        )
+
+
+class IngestionScheduler:
+    """Knowledge Base の同期（Ingestion Job）をまとめて実行するスケジューラ。
+
+    - request_sync() は「変更あり」を記録してすぐ戻る（HTTP リクエストを待たせない）
+    - 最後の変更から debounce 秒間、新たな変更がなければジョブを1回だけ開始する
+    - ジョブ実行中の変更は1回分の後続ジョブとしてまとめ、完了後に開始する
+    - 状態とリースは DynamoDB に保存し、複数ワーカー・Lambda からの二重起動を防ぐ
+
+    Lambda ではレスポンス後にタイマーが凍結されるため、タイマーは使わない。
+    代わりに request_sync() の中で debounce 済みの変更を同期的に確認し、
+    残りは EventBridge の定期実行から呼ぶ run_pending() で開始する。
+    """
+
+    def __init__(
+        self,
+        start_job: Callable[[], str],
+        on_job_started: Optional[Callable[[str, list[str]], None]] = None,
+    ):
+        self._start_job = start_job
+        self._on_job_started = on_job_started
+        self._owner = str(uuid.uuid4())
+        self._state = (
+            _DynamoDBState(settings.DYNAMODB_INGESTION_TABLE)
+            if settings.DYNAMODB_INGESTION_TABLE else _MemoryState()
+        )
+        self._timer_lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+
+    def request_sync(self, doc_ids: Optional[list[str]] = None) -> None:
+        """KB の同期が必要になったことを記録し、debounce 後の確認を予約する。"""
+        on_lambda = bool(settings.AWS_LAMBDA_FUNCTION_NAME)
+        if on_lambda:
+            # 記録すると debounce の起点が今に戻るので、その前にこれまでの変更分を確認する
+            self.run_pending()
+        try:
+            self._state.mark_dirty(list(doc_ids or []), _now_ms())
+        except Exception as e:
+            logger.error("KB同期リクエストの記録に失敗: %s", e)
+            return
+        if not on_lambda:
+            self._schedule(settings.ingestion_debounce_seconds)
+
+    def run_pending(self) -> Optional[float]:
+        """保留中の同期を1回だけ確認する。次に確認すべき秒数（不要なら None）を返す。
+
+        タイマーに頼れない Lambda（EventBridge の定期実行・リクエスト処理中）から呼ぶ。
+        """
+        try:
+            return self._check()
+        except Exception as e:
+            logger.error("KB同期スケジューラでエラー: %s", e, exc_info=True)
+            return settings.ingestion_poll_interval_seconds
+
+    def _schedule(self, delay: float) -> None:
+        with self._timer_lock:
+            if self._timer is not None:
+                return
+            self._timer = threading.Timer(delay, self._run)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _run(self) -> None:
+        with self._timer_lock:
+            self._timer = None
+        next_delay = self.run_pending()
+        if next_delay is not None:
+            self._schedule(next_delay)
+
+    def _check(self) -> Optional[float]:
+        """ジョブを開始すべきか判定する。次に確認するまでの秒数（不要なら None）を返す。"""
+        now = _now_ms()
+        if not self._state.acquire(self._owner, now, settings.ingestion_lease_seconds * 1000):
+            # 他のワーカーが処理中。リースが切れたときに備えて後でもう一度確認する
+            return settings.ingestion_poll_interval_seconds
+        try:
+            state = self._state.read()
+            if not state["dirty"]:
+                return None
+
+            quiet_ms = now - state["lastChangeAt"]
+            debounce_ms = settings.ingestion_debounce_seconds * 1000
+            if quiet_ms < debounce_ms:
+                return (debounce_ms - quiet_ms) / 1000
+
+            if state["jobId"] and self._is_running(state["jobId"]):
+                # 実行中のジョブの完了後に後続ジョブを1回だけ開始する
+                return settings.ingestion_poll_interval_seconds
+
+            return self._start(state)
+        finally:
+            self._state.release(self._owner)
+
+    def _start(self, state: dict[str, Any]) -> Optional[float]:
+        try:
+            job_id = self._start_job()
+        except Exception as e:
+            # 外部で開始されたジョブとの競合なども含め、後でもう一度試す
+            logger.warning("KB同期ジョブの開始に失敗（再試行します）: %s", e)
+            return settings.ingestion_poll_interval_seconds
+
+        claimed = self._state.claim(state["lastChangeAt"], job_id)
+        if not claimed:
+            # 判定後に新しい変更が入った。ジョブは記録し、その変更分は後続ジョブで反映する
+            self._state.set_job(job_id)
+        else:
+            logger.info(
+                "KB同期ジョブを開始: %s (対象ドキュメント %d 件)", job_id, len(state["pendingDocIds"])
+            )
+        if self._on_job_started:
+            try:
+                self._on_job_started(job_id, state["pendingDocIds"])
+            except Exception as e:
+                logger.warning("KB同期ジョブ開始の通知に失敗: %s", e)
+        return None if claimed else settings.ingestion_poll_interval_seconds
+
+    def _is_running(self, job_id: str) -> bool:
+        client = get_client("bedrock-agent")
+        response = client.get_ingestion_job(
+            knowledgeBaseId=settings.BEDROCK_KB_ID,
+            dataSourceId=settings.BEDROCK_DATA_SOURCE_ID,
+            ingestionJobId=job_id,
+        )
+        return response["ingestionJob"]["status"] in RUNNING_STATUSES
+
+    def status(self) -> dict[str, Any]:
+        state = self._state.read()
+        return {
+            "dirty": state["dirty"],
+            "jobId": state["jobId"],
+            "pendingDocuments": len(state["pendingDocIds"]),
+        }
@@ -0,0 +1,138 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from app.config import settings
+from app.core.answer_cache import bump_kb_generation
+from app.core.aws_clients import get_client
+
+logger = logging.getLogger(__name__)
+
+STATUS_INDEXING = "indexing"
+STATUS_READY = "ready"
+STATUS_FAILED = "failed"
+
+_JOB_STATUS_MAP = {
+    "COMPLETE": STATUS_READY,
+    "FAILED": STATUS_FAILED,
+    "STOPPED": STATUS_FAILED,
+}
+
+
+class _TrackedJob:
+    def __init__(self, job_id: str, doc_ids: list[str]):
+        self.job_id = job_id
+        self.doc_ids = list(doc_ids)
+        self.interval = float(settings.ingestion_status_poll_seconds)
+        self.next_poll_at = time.monotonic() + self.interval
+
+
+class IngestionTracker:
+    """開始した Ingestion Job を追跡し、対象ドキュメントの状態（indexing / ready / failed）を更新する。
+
+    - ジョブごとに get_ingestion_job をバックオフしながらポーリングする
+    - 状態が変わったら update_documents で保存し、登録済みのリスナーに通知する
+    - 完了したら回答キャッシュの KB 世代を進める（同期中にキャッシュされた回答を捨てる）
+
+    追跡中のジョブはプロセス内にしか持たないため、別のワーカーや Lambda が開始したジョブは
+    refresh() で都度確認する。
+    """
+
+    def __init__(self, update_documents: Callable[[list[str], dict[str, Any]], None]):
+        self._update_documents = update_documents
+        self._lock = threading.Lock()
+        self._jobs: dict[str, _TrackedJob] = {}
+        self._listeners: list[Callable[[dict[str, Any]], None]] = []
+        self._timer: Optional[threading.Timer] = None
+
+    def add_listener(self, listener: Callable[[dict[str, Any]], None]) -> None:
+        """状態変化の通知先を登録する。リスナーはタイマースレッドから呼ばれる。"""
+        self._listeners.append(listener)
+
+    def track(self, job_id: str, doc_ids: list[str]) -> None:
+        """開始したジョブと対象ドキュメントを登録し、ポーリングを予約する。"""
+        doc_ids = list(dict.fromkeys(doc_ids))
+        self._apply(doc_ids, STATUS_INDEXING, job_id)
+        with self._lock:
+            self._jobs[job_id] = _TrackedJob(job_id, doc_ids)
+        self._reschedule()
+
+    def refresh(self, job_id: str, doc_ids: list[str]) -> str:
+        """ジョブの状態を1回だけ確認して反映し、ドキュメントの状態を返す。"""
+        status = self._fetch_status(job_id)
+        if status != STATUS_INDEXING:
+            self._finish(job_id, doc_ids, status)
+        return status
+
+    def _fetch_status(self, job_id: str) -> str:
+        response = get_client("bedrock-agent").get_ingestion_job(
+            knowledgeBaseId=settings.BEDROCK_KB_ID,
+            dataSourceId=settings.BEDROCK_DATA_SOURCE_ID,
+            ingestionJobId=job_id,
+        )
+        return _JOB_STATUS_MAP.get(response["ingestionJob"]["status"], STATUS_INDEXING)
+
+    def _finish(self, job_id: str, doc_ids: list[str], status: str) -> None:
+        with self._lock:
+            self._jobs.pop(job_id, None)
+        if status == STATUS_READY:
+            bump_kb_generation()
+        self._apply(doc_ids, status, job_id)
+        logger.info("KB同期ジョブ終了: %s (%s, ドキュメント %d 件)", job_id, status, len(doc_ids))
+
+    def _apply(self, doc_ids: list[str], status: str, job_id: str) -> None:
+        if not doc_ids:
+            return
+        try:
+            self._update_documents(doc_ids, {"status": status, "ingestionJobId": job_id})
+        except Exception as e:
+            logger.error("ドキュメント状態の保存に失敗: %s", e)
+        for doc_id in doc_ids:
+            event = {"id": doc_id, "status": status, "ingestionJobId": job_id}
+            for listener in self._listeners:
+                try:
+                    listener(event)
+                except Exception as e:
+                    logger.warning("ドキュメント状態の通知に失敗: %s", e)
+
+    def _reschedule(self) -> None:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._jobs:
+                return
+            delay = max(min(j.next_poll_at for j in self._jobs.values()) - time.monotonic(), 0)
+            self._timer = threading.Timer(delay, self._poll)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _poll(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._timer = None
+            due = [job for job in self._jobs.values() if job.next_poll_at <= now]
+        for job in due:
+            try:
+                status = self._fetch_status(job.job_id)
+            except Exception as e:
+                logger.warning("KB同期ジョブの状態取得に失敗: %s: %s", job.job_id, e)
+                status = STATUS_INDEXING
+            if status != STATUS_INDEXING:
+                self._finish(job.job_id, job.doc_ids, status)
+                continue
+            # 長いジョブほど確認間隔を広げる
+            job.interval = min(
+                job.interval * settings.ingestion_status_backoff,
+                settings.ingestion_status_max_poll_seconds,
+            )
+            job.next_poll_at = time.monotonic() + job.interval
+        self._reschedule()
+
+    def status(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "trackedJobs": len(self._jobs),
+                "trackedDocuments": sum(len(j.doc_ids) for j in self._jobs.values()),
+            }
@@ -0,0 +1,367 @@
+import json
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Optional
+
+from app.config import settings
+from app.core.aws_clients import get_dynamodb_table, get_resource
+from app.core.pagination import LIST_KEY, decode_cursor, encode_cursor, query_page
+
+logger = logging.getLogger(__name__)
+
+# 一覧で取得する属性
+LIST_FIELDS = ["docId", "name", "uploadedAt", "status"]
+
+
+class DynamoDBDocumentStore:
+    """ドキュメントのメタデータを DynamoDB に保存する。パーティションキー `docId` (S)。"""
+
+    def __init__(self, table_name: str):
+        self._table_name = table_name
+
+    @property
+    def _table(self):
+        return get_dynamodb_table(self._table_name)
+
+    def put(self, doc_id: str, info: dict[str, Any]) -> None:
+        self._table.put_item(Item={"docId": doc_id, "listKey": LIST_KEY, **info})
+
+    def put_many(self, items: dict[str, dict[str, Any]]) -> None:
+        # batch_writer で 25 件ずつまとめて書き込む
+        with self._table.batch_writer() as batch:
+            for doc_id, info in items.items():
+                batch.put_item(Item={"docId": doc_id, "listKey": LIST_KEY, **info})
+
+    def get(self, doc_id: str) -> Optional[dict[str, Any]]:
+        return self._table.get_item(Key={"docId": doc_id}).get("Item")
+
+    def get_many(self, doc_ids: list[str]) -> dict[str, dict[str, Any]]:
+        # batch_get_item は1回 100 件まで。処理しきれなかったキーは再要求する
+        found: dict[str, dict[str, Any]] = {}
+        for start in range(0, len(doc_ids), 100):
+            request = {self._table_name: {"Keys": [{"docId": d} for d in doc_ids[start:start + 100]]}}
+            while request:
+                response = get_resource("dynamodb").batch_get_item(RequestItems=request)
+                for item in response.get("Responses", {}).get(self._table_name, []):
+                    found[item["docId"]] = item
+                request = response.get("UnprocessedKeys") or None
+        return found
+
+    def delete(self, doc_id: str) -> None:
+        self._table.delete_item(Key={"docId": doc_id})
+
+    def delete_many(self, doc_ids: list[str]) -> None:
+        with self._table.batch_writer() as batch:
+            for doc_id in doc_ids:
+                batch.delete_item(Key={"docId": doc_id})
+
+    def update(self, doc_ids: list[str], fields: dict[str, Any]) -> None:
+        table = self._table
+        names = {f"#f{i}": name for i, name in enumerate(fields)}
+        values = {f":v{i}": value for i, value in enumerate(fields.values())}
+        update = "SET " + ", ".join(f"#f{i} = :v{i}" for i in range(len(fields)))
+        for doc_id in doc_ids:
+            try:
+                table.update_item(
+                    Key={"docId": doc_id},
+                    UpdateExpression=update,
+                    ConditionExpression="attribute_exists(docId)",
+                    ExpressionAttributeNames=names,
+                    ExpressionAttributeValues=values,
+                )
+            except table.meta.client.exceptions.ConditionalCheckFailedException:
+                pass
+
+    def list_page(
+        self, limit: int, cursor: Optional[str]
+    ) -> tuple[list[dict[str, Any]], Optional[str]]:
+        # 一覧に必要な属性だけを GSI から取得
+        return query_page(self._table, limit, cursor, settings.list_index_name, LIST_FIELDS)
+
+
+class _SQLiteDatabase:
+    """WAL モードの SQLite ファイル。接続はスレッドごとに1つ持つ。"""
+
+    def __init__(self, path: Path, schema: str):
+        self._path = path
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._connect().executescript(f"BEGIN;\n{schema}\nCOMMIT;")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # 自動コミットにして、トランザクションは _transaction で明示的に張る
+            conn = sqlite3.connect(self._path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self) -> "_Transaction":
+        return _Transaction(self._connect())
+
+
+class SQLiteDocumentStore(_SQLiteDatabase):
+    """ドキュメントのメタデータを SQLite（WAL モード）に保存する（ローカル開発用）。
+
+    検索・並べ替えに使う列（docId, name, uploadedAt, createdAt）は索引付きの列に、
+    それ以外の属性は JSON で data 列に持つ。書き込みは1件ずつトランザクションで行うので、
+    同時リクエストでも更新が失われない。初回起動時に metadata.json があれば取り込む。
+    """
+
+    _COLUMNS = {"docId", "name", "uploadedAt", "createdAt"}
+
+    def __init__(self, path: Path, legacy_json: Optional[Path] = None):
+        super().__init__(
+            path,
+            """
+            CREATE TABLE IF NOT EXISTS documents (
+                doc_id      TEXT PRIMARY KEY,
+                name        TEXT NOT NULL,
+                uploaded_at TEXT NOT NULL,
+                created_at  TEXT NOT NULL DEFAULT '',
+                data        TEXT NOT NULL DEFAULT '{}'
+            );
+            CREATE INDEX IF NOT EXISTS documents_name ON documents (name);
+            CREATE INDEX IF NOT EXISTS documents_uploaded_at ON documents (uploaded_at);
+            CREATE INDEX IF NOT EXISTS documents_created_at ON documents (created_at, doc_id);
+            """,
+        )
+        if legacy_json is not None and legacy_json.exists():
+            self._migrate(legacy_json)
+
+    def _migrate(self, legacy_json: Path) -> None:
+        metadata = json.loads(legacy_json.read_text(encoding="utf-8"))
+        with self._transaction() as conn:
+            (count,) = conn.execute("SELECT COUNT(*) FROM documents").fetchone()
+            if count == 0:
+                self._upsert(conn, metadata)
+        # 移行は1回だけ。元ファイルは名前を変えて残す
+        migrated = legacy_json.with_name(legacy_json.name + ".migrated")
+        legacy_json.rename(migrated)
+        logger.info("metadata.json を SQLite に移行しました: %d 件（元ファイル: %s）", len(metadata), migrated)
+
+    def _upsert(self, conn: sqlite3.Connection, items: dict[str, dict[str, Any]]) -> None:
+        rows = []
+        for doc_id, info in items.items():
+            data = {k: v for k, v in info.items() if k not in self._COLUMNS}
+            rows.append((
+                doc_id,
+                info["name"],
+                info["uploadedAt"],
+                info.get("createdAt", ""),
+                json.dumps(data, ensure_ascii=False),
+            ))
+        conn.executemany(
+            """
+            INSERT INTO documents (doc_id, name, uploaded_at, created_at, data)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (doc_id) DO UPDATE SET
+                name = excluded.name,
+                uploaded_at = excluded.uploaded_at,
+                created_at = excluded.created_at,
+                data = excluded.data
+            """,
+            rows,
+        )
+
+    @staticmethod
+    def _to_item(row: sqlite3.Row) -> dict[str, Any]:
+        item = {
+            "docId": row["doc_id"],
+            "name": row["name"],
+            "uploadedAt": row["uploaded_at"],
+            **json.loads(row["data"]),
+        }
+        if row["created_at"]:
+            item["createdAt"] = row["created_at"]
+        return item
+
+    def put(self, doc_id: str, info: dict[str, Any]) -> None:
+        self.put_many({doc_id: info})
+
+    def put_many(self, items: dict[str, dict[str, Any]]) -> None:
+        with self._transaction() as conn:
+            self._upsert(conn, items)
+
+    def get(self, doc_id: str) -> Optional[dict[str, Any]]:
+        row = self._connect().execute(
+            "SELECT * FROM documents WHERE doc_id = ?", (doc_id,)
+        ).fetchone()
+        return self._to_item(row) if row else None
+
+    def get_many(self, doc_ids: list[str]) -> dict[str, dict[str, Any]]:
+        conn = self._connect()
+        found: dict[str, dict[str, Any]] = {}
+        # SQLite のプレースホルダ数の上限を超えないように分けて取得する
+        for start in range(0, len(doc_ids), 500):
+            chunk = doc_ids[start:start + 500]
+            rows = conn.execute(
+                f"SELECT * FROM documents WHERE doc_id IN ({', '.join('?' * len(chunk))})",
+                chunk,
+            ).fetchall()
+            found.update((row["doc_id"], self._to_item(row)) for row in rows)
+        return found
+
+    def delete(self, doc_id: str) -> None:
+        self.delete_many([doc_id])
+
+    def delete_many(self, doc_ids: list[str]) -> None:
+        with self._transaction() as conn:
+            conn.executemany(
+                "DELETE FROM documents WHERE doc_id = ?", [(doc_id,) for doc_id in doc_ids]
+            )
+
+    def update(self, doc_ids: list[str], fields: dict[str, Any]) -> None:
+        with self._transaction() as conn:
+            for doc_id in doc_ids:
+                row = conn.execute(
+                    "SELECT * FROM documents WHERE doc_id = ?", (doc_id,)
+                ).fetchone()
+                if row:
+                    self._upsert(conn, {doc_id: {**self._to_item(row), **fields}})
+
+    def list_page(
+        self, limit: int, cursor: Optional[str]
+    ) -> tuple[list[dict[str, Any]], Optional[str]]:
+        """新しい順に1ページ分返す（(createdAt, docId) によるキーセットページング）。"""
+        start = decode_cursor(cursor)
+        if start:
+            rows = self._connect().execute(
+                """
+                SELECT * FROM documents WHERE (created_at, doc_id) < (?, ?)
+                ORDER BY created_at DESC, doc_id DESC LIMIT ?
+                """,
+                (str(start.get("createdAt", "")), str(start.get("docId", "")), limit + 1),
+            ).fetchall()
+        else:
+            rows = self._connect().execute(
+                "SELECT * FROM documents ORDER BY created_at DESC, doc_id DESC LIMIT ?",
+                (limit + 1,),
+            ).fetchall()
+        items = [self._to_item(row) for row in rows[:limit]]
+        if len(rows) <= limit:
+            return items, None
+        last = items[-1]
+        return items, encode_cursor({"createdAt": last.get("createdAt", ""), "docId": last["docId"]})
+
+
+class SQLiteContentHashStore(_SQLiteDatabase):
+    """内容ハッシュの索引（SHA-256 → 共有する S3 キー・ドキュメントID・参照数）を SQLite に保存する。
+
+    メタデータと同じファイルの content_hashes テーブルに置き、参照数の増減は
+    BEGIN IMMEDIATE のトランザクション内で行うので、複数プロセスから更新しても失われない。
+    初回起動時に content_hashes.json があれば取り込む。
+    """
+
+    def __init__(self, path: Path, legacy_json: Optional[Path] = None):
+        super().__init__(
+            path,
+            """
+            CREATE TABLE IF NOT EXISTS content_hashes (
+                content_hash TEXT PRIMARY KEY,
+                s3_key       TEXT,
+                doc_id       TEXT NOT NULL,
+                ref_count    INTEGER NOT NULL
+            );
+            """,
+        )
+        if legacy_json is not None and legacy_json.exists():
+            self._migrate(legacy_json)
+
+    def _migrate(self, legacy_json: Path) -> None:
+        entries = json.loads(legacy_json.read_text(encoding="utf-8"))
+        with self._transaction() as conn:
+            conn.executemany(
+                """
+                INSERT OR IGNORE INTO content_hashes (content_hash, s3_key, doc_id, ref_count)
+                VALUES (?, ?, ?, ?)
+                """,
+                [
+                    (content_hash, e.get("s3Key"), e["docId"], e["refCount"])
+                    for content_hash, e in entries.items() if e.get("refCount", 0) > 0
+                ],
+            )
+        migrated = legacy_json.with_name(legacy_json.name + ".migrated")
+        legacy_json.rename(migrated)
+        logger.info("%s を SQLite に移行しました: %d 件", legacy_json.name, len(entries))
+
+    @staticmethod
+    def _to_entry(row: sqlite3.Row) -> dict[str, Any]:
+        return {"s3Key": row["s3_key"], "docId": row["doc_id"], "refCount": row["ref_count"]}
+
+    def add_ref(self, content_hash: str) -> Optional[dict[str, Any]]:
+        with self._transaction() as conn:
+            row = conn.execute(
+                """
+                UPDATE content_hashes SET ref_count = ref_count + 1
+                WHERE content_hash = ? AND ref_count > 0
+                RETURNING *
+                """,
+                (content_hash,),
+            ).fetchone()
+        return self._to_entry(row) if row else None
+
+    def create(self, content_hash: str, s3_key: Optional[str], doc_id: str) -> bool:
+        with self._transaction() as conn:
+            row = conn.execute(
+                """
+                INSERT INTO content_hashes (content_hash, s3_key, doc_id, ref_count)
+                VALUES (?, ?, ?, 1)
+                ON CONFLICT (content_hash) DO UPDATE SET
+                    s3_key = excluded.s3_key, doc_id = excluded.doc_id, ref_count = 1
+                WHERE content_hashes.ref_count <= 0
+                RETURNING content_hash
+                """,
+                (content_hash, s3_key, doc_id),
+            ).fetchone()
+        return row is not None
+
+    def release(self, content_hash: str) -> Optional[dict[str, Any]]:
+        with self._transaction() as conn:
+            row = conn.execute(
+                """
+                UPDATE content_hashes SET ref_count = ref_count - 1
+                WHERE content_hash = ?
+                RETURNING *
+                """,
+                (content_hash,),
+            ).fetchone()
+            if row and row["ref_count"] <= 0:
+                conn.execute("DELETE FROM content_hashes WHERE content_hash = ?", (content_hash,))
+        return self._to_entry(row) if row else None
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT / ROLLBACK を張るコンテキストマネージャ。"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        self._conn.execute("BEGIN IMMEDIATE")
+        return self._conn
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._conn.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+def create_document_store():
+    """settings.METADATA_BACKEND に応じたメタデータの保存先を返す。
+
+    未指定なら DYNAMODB_DOCUMENTS_TABLE があれば DynamoDB、なければ SQLite を使う。
+    """
+    backend = settings.METADATA_BACKEND or (
+        "dynamodb" if settings.DYNAMODB_DOCUMENTS_TABLE else "sqlite"
+    )
+    if backend == "dynamodb":
+        return DynamoDBDocumentStore(settings.DYNAMODB_DOCUMENTS_TABLE)
+    if backend == "sqlite":
+        return SQLiteDocumentStore(
+            Path(settings.LOCAL_METADATA_DB), legacy_json=Path("uploads") / "metadata.json"
+        )
+    raise ValueError(f"未知の METADATA_BACKEND です: {backend}")
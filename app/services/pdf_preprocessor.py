@@ -0,0 +1,160 @@
+import json
+import logging
+import multiprocessing
+import shutil
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import BinaryIO, Iterable, Iterator, Optional
+
+from pypdf import PdfReader
+
+from app.config import settings
+from app.core.aws_clients import get_client
+from app.core.local_retriever import split_text
+
+logger = logging.getLogger(__name__)
+
+
+def chunk_prefix(doc_id: str) -> str:
+    """前処理したチャンクを置く S3 プレフィックス（KB のデータソースが読む場所）。"""
+    return f"documents/{doc_id}/chunks/"
+
+
+def original_key(doc_id: str, filename: str) -> str:
+    """前処理した場合の元 PDF の S3 キー。KB に二重に取り込まれないよう documents/ の外に置く。"""
+    return f"originals/{doc_id}/{filename}"
+
+
+def _extract_range(path: str, start: int, end: int) -> list[str]:
+    """[start, end) ページのテキストを抽出する（子プロセスで実行）。"""
+    reader = PdfReader(path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+def _bounded(submit, tasks: Iterable, window: int) -> Iterator:
+    """tasks を順に submit し、同時に抱える Future を window 個までに抑えて結果を順番に返す。"""
+    pending: deque[Future] = deque()
+    for task in tasks:
+        pending.append(submit(task))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_unavailable = False
+_pool_lock = threading.Lock()
+
+
+def _process_pool() -> Optional[ProcessPoolExecutor]:
+    """テキスト抽出用のプロセスプールを返す（プロセス全体で1つ。使えない環境では None）。
+
+    サーバーは boto3 のコネクションプールや SQLite、タイマーなどのスレッドを抱えているので、
+    fork すると他のスレッドが握っていたロックを子プロセスが引き継いでデッドロックしうる。
+    そのため子プロセスは spawn で起動する。
+    """
+    global _pool, _pool_unavailable
+    if settings.preprocess_workers <= 1 or _pool_unavailable:
+        return None
+    with _pool_lock:
+        if _pool is None and not _pool_unavailable:
+            try:
+                _pool = ProcessPoolExecutor(
+                    max_workers=settings.preprocess_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            except (OSError, NotImplementedError) as e:
+                # Lambda など /dev/shm が使えない環境ではプロセスプールを作れない
+                logger.warning("プロセスプールを使えないため逐次抽出します: %s", e)
+                _pool_unavailable = True
+        return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def iter_pages(path: str) -> Iterator[tuple[int, str]]:
+    """PDF のページ番号（1始まり）とテキストを順に返す。
+
+    ページ範囲ごとにプロセスプールで並列に抽出し、先読みはワーカー数の2倍までに抑えるので、
+    数百ページの PDF でもメモリに載るのは一部のページだけになる。
+    """
+    page_count = len(PdfReader(path).pages)
+    step = settings.preprocess_pages_per_task
+    ranges = [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+    pool = _process_pool() if len(ranges) > 1 else None
+
+    if pool is None:
+        for start, end in ranges:
+            yield from enumerate(_extract_range(path, start, end), start=start + 1)
+        return
+    texts = _bounded(
+        lambda r: pool.submit(_extract_range, path, *r), ranges, settings.preprocess_workers * 2
+    )
+    for (start, _), page_texts in zip(ranges, texts):
+        yield from enumerate(page_texts, start=start + 1)
+
+
+def iter_chunks(pages: Iterable[tuple[int, str]]) -> Iterator[tuple[int, str]]:
+    """ページ単位でチャンク化する。チャンクはページをまたがないので引用ページが正確になる。"""
+    for page_number, text in pages:
+        for chunk in split_text(
+            text, settings.preprocess_chunk_size, settings.preprocess_chunk_overlap
+        ):
+            yield page_number, chunk
+
+
+def preprocess_pdf(doc_id: str, filename: str, fileobj: BinaryIO) -> int:
+    """PDF をページ単位のチャンクに分け、本文と .metadata.json を S3 に書き込む。チャンク数を返す。
+
+    メタデータファイルは Bedrock KB の形式（metadataAttributes）で、検索結果の
+    metadata に source と page が入る。
+    """
+    s3 = get_client("s3")
+    bucket = settings.S3_DOCUMENTS_BUCKET
+    prefix = chunk_prefix(doc_id)
+
+    def put_chunk(numbered: tuple[int, tuple[int, str]]) -> None:
+        index, (page_number, text) = numbered
+        key = f"{prefix}{index:05d}.txt"
+        s3.put_object(
+            Bucket=bucket, Key=key, Body=text.encode("utf-8"),
+            ContentType="text/plain; charset=utf-8",
+        )
+        metadata = {"metadataAttributes": {
+            "source": filename, "page": page_number, "docId": doc_id,
+        }}
+        s3.put_object(
+            Bucket=bucket, Key=f"{key}.metadata.json",
+            Body=json.dumps(metadata, ensure_ascii=False).encode("utf-8"),
+            ContentType="application/json",
+        )
+
+    # 子プロセスから読めるよう、アップロードされたファイルを一時ファイルに書き出す
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp:
+        fileobj.seek(0)
+        shutil.copyfileobj(fileobj, tmp)
+        tmp.flush()
+        fileobj.seek(0)
+
+        count = 0
+        with ThreadPoolExecutor(
+            max_workers=settings.preprocess_upload_concurrency, thread_name_prefix="chunk-upload"
+        ) as pool:
+            for _ in _bounded(
+                lambda numbered: pool.submit(put_chunk, numbered),
+                enumerate(iter_chunks(iter_pages(tmp.name))),
+                settings.preprocess_upload_concurrency * 2,
+            ):
+                count += 1
+
+    logger.info("PDF前処理完了: %s (%d チャンク)", filename, count)
+    return count
@@ -0,0 +1,129 @@
+import asyncio
+import json
+import logging
+from typing import Any, Awaitable, Callable, Optional
+
+from app.config import settings
+from app.core.aws_clients import get_client
+from app.core.executor import run_blocking
+
+logger = logging.getLogger(__name__)
+
+# (task_id, 実行に必要な値) を受け取り、最終ステータス（completed / failed / skipped）を返す
+RunJob = Callable[[str, dict[str, Any]], Awaitable[str]]
+
+
+class TaskQueueFull(Exception):
+    pass
+
+
+class TaskQueue:
+    """タスク分析ジョブの待ち行列と、それを処理する asyncio ワーカー群。
+
+    ワーカー数がそのまま同時に実行するパイプライン数の上限になる。ワーカーは最初の
+    submit で起動するので、イベントループ上（async のエンドポイント）から呼ぶこと。
+    待ち行列はプロセス内にしかないため、再起動で失われたジョブは起動時に
+    queued / running のまま残ったタスクから投入し直す。Lambda では使えない（SQSTaskQueue を使う）。
+    """
+
+    def __init__(self, run_job: RunJob, concurrency: int, max_size: int):
+        self._run_job = run_job
+        self._concurrency = concurrency
+        self._max_size = max_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: list[asyncio.Task] = []
+        self._running = 0
+        self._counts = {"submitted": 0, "completed": 0, "failed": 0, "skipped": 0}
+
+    def _ensure_workers(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self._max_size)
+            self._workers = [
+                asyncio.create_task(self._worker(i)) for i in range(self._concurrency)
+            ]
+            logger.info("タスクキューのワーカーを起動しました: %d 並列", self._concurrency)
+        return self._queue
+
+    def full(self) -> bool:
+        return self._queue is not None and self._queue.full()
+
+    async def submit(self, task_id: str, job: dict[str, Any]) -> None:
+        try:
+            self._ensure_workers().put_nowait((task_id, job))
+        except asyncio.QueueFull:
+            raise TaskQueueFull(task_id)
+        self._counts["submitted"] += 1
+
+    async def _worker(self, index: int) -> None:
+        queue = self._queue
+        while True:
+            task_id, job = await queue.get()
+            self._running += 1
+            try:
+                status = await self._run_job(task_id, job)
+            except Exception as e:
+                logger.error("[task-queue] タスク %s の実行エラー: %s", task_id, e, exc_info=True)
+                status = "failed"
+            finally:
+                self._running -= 1
+                queue.task_done()
+            self._counts[status if status in ("completed", "skipped") else "failed"] += 1
+
+    async def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+
+    def status(self) -> dict[str, Any]:
+        return {
+            "backend": "memory",
+            "concurrency": self._concurrency,
+            "maxQueued": self._max_size,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "running": self._running,
+            **self._counts,
+        }
+
+
+class SQSTaskQueue:
+    """ジョブを SQS に送る。実行は SQS をイベントソースにしたワーカー Lambda が行う。
+
+    メッセージ本文は {"taskId", "task", "createdAt"}。ワーカーがタイムアウトなどで落ちた
+    メッセージは可視性タイムアウト後に再配信される。
+    """
+
+    def __init__(self, queue_url: str):
+        self._queue_url = queue_url
+        self._submitted = 0
+
+    def full(self) -> bool:
+        return False
+
+    async def submit(self, task_id: str, job: dict[str, Any]) -> None:
+        created_at = job.get("created_at")
+        body = {"taskId": task_id, "task": job["task"], "createdAt": str(created_at) if created_at else None}
+        await run_blocking(
+            get_client("sqs").send_message,
+            QueueUrl=self._queue_url,
+            MessageBody=json.dumps(body, ensure_ascii=False),
+        )
+        self._submitted += 1
+
+    async def stop(self) -> None:
+        pass
+
+    def status(self) -> dict[str, Any]:
+        return {"backend": "sqs", "submitted": self._submitted}
+
+
+def create_task_queue(run_job: RunJob):
+    """TASK_QUEUE_URL があれば SQS、なければプロセス内のワーカーでタスクを実行する。"""
+    if settings.TASK_QUEUE_URL:
+        return SQSTaskQueue(settings.TASK_QUEUE_URL)
+    return TaskQueue(
+        run_job=run_job,
+        concurrency=settings.task_queue_concurrency,
+        max_size=settings.task_queue_max_size,
+    )
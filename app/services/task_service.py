@@ -1,18 +1,30 @@
+import asyncio
+import json
 import uuid
 import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+from fastapi import HTTPException
+
+from app.config import settings
+from app.core.admission import admission_lane
+from app.core.executor import run_blocking
 from app.models.task import TaskRequest,TaskResponse
-from app.agents.graph import agent_graph
+from app.agents.graph import PIPELINE, agent_graph, thread_config
 from app.services.firestore_service import firestore_service
+from app.services.task_queue import TaskQueueFull, create_task_queue
 
 logger = logging.getLogger(__name__)
 
-def process_task(request: TaskRequest) -> TaskResponse:
-    task_id = str(uuid.uuid4())
-
-    result = agent_graph.invoke({
-        "original_task":request.task
-    })
+UNFINISHED_STATUSES = ["queued", "running"]
 
+def _save_result(
+        task_id: str,
+        task: str,
+        result: dict[str, Any],
+        created_at: Optional[Any] = None,
+        ) -> TaskResponse:
     # エラー検知: 主要フィールドが全てNoneかチェック
     has_result = any([
         result.get("analysis"),
@@ -29,7 +41,7 @@ def process_task(request: TaskRequest) -> TaskResponse:
 
     response = TaskResponse(
         id=task_id,
-        task=request.task,
+        task=task,
         status=status,
         analysis=result.get("analysis"),
         subtasks=result.get("subtasks"),
@@ -39,12 +51,164 @@ def process_task(request: TaskRequest) -> TaskResponse:
         schedule=result.get("schedule"),
         total_days=result.get("total_days"),
         warnings=result.get("warnings"),
+        **({"created_at": created_at} if created_at else {}),
     )
 
     firestore_service.save(task_id, response.model_dump())
 
     return response
 
+def process_task(request: TaskRequest) -> TaskResponse:
+    task_id = str(uuid.uuid4())
+
+    # タスク分析は対話（/chat）より後回しにしてよい
+    with admission_lane("background"):
+        result = agent_graph.invoke({
+            "original_task":request.task
+        }, thread_config(task_id))
+
+    return _save_result(task_id, request.task, result)
+
+def _save_status(task_id: str, task: str, status: str, created_at: Any) -> None:
+    response = TaskResponse(
+        id=task_id, task=task, status=status, **({"created_at": created_at} if created_at else {})
+    )
+    firestore_service.save(task_id, response.model_dump())
+
+async def _run_job(task_id: str, job: dict[str, Any]) -> str:
+    """キューから取り出したタスクを実行する。queued → running → completed / failed。
+
+    queued → running は条件付き更新で行い、取れたワーカーだけが実行する。他のワーカーが実行中・
+    実行済み・削除済みのタスク（SQS の再配信や投入し直しの重複）は実行しない。
+    """
+    task, created_at = job["task"], job["created_at"]
+    if not await run_blocking(firestore_service.transition, task_id, "queued", "running"):
+        logger.info("タスク %s は他のワーカーが実行中か、実行済み・削除済みのためスキップします", task_id)
+        return "skipped"
+    try:
+        with admission_lane("background"):
+            result = await agent_graph.ainvoke({"original_task": task}, thread_config(task_id))
+    except Exception as e:
+        logger.error("タスク %s の実行エラー: %s", task_id, e, exc_info=True)
+        await run_blocking(_save_status, task_id, task, "failed", created_at)
+        return "failed"
+    response = await run_blocking(_save_result, task_id, task, result, created_at)
+    return response.status
+
+task_queue = create_task_queue(_run_job)
+
+QUEUE_FULL_DETAIL = "タスクの待ち行列が満杯です。しばらくしてから再試行してください"
+
+async def submit_task(request: TaskRequest) -> TaskResponse:
+    """タスクを queued として保存し、ワーカーに渡す。結果は GET /tasks/{id} で確認する。"""
+    if settings.AWS_LAMBDA_FUNCTION_NAME and not settings.TASK_QUEUE_URL:
+        # プロセス内のワーカーはレスポンス後に凍結されるので、受け付けても実行されない
+        raise HTTPException(status_code=503, detail="非同期実行のキュー（TASK_QUEUE_URL）が設定されていません")
+    if task_queue.full():
+        raise HTTPException(status_code=503, detail=QUEUE_FULL_DETAIL)
+    task_id = str(uuid.uuid4())
+    response = TaskResponse(id=task_id, task=request.task, status="queued")
+    await run_blocking(firestore_service.save, task_id, response.model_dump())
+    try:
+        await task_queue.submit(task_id, {"task": request.task, "created_at": response.created_at})
+    except Exception as e:
+        # 保存している間に他のリクエストで埋まった、または SQS に送れなかった
+        await run_blocking(firestore_service.delete, task_id)
+        if isinstance(e, TaskQueueFull):
+            raise HTTPException(status_code=503, detail=QUEUE_FULL_DETAIL)
+        logger.error("タスク %s をキューに投入できません: %s", task_id, e)
+        raise HTTPException(status_code=503, detail="タスクをキューに投入できませんでした")
+    return response
+
+def run_queued_messages(records: list[dict[str, Any]]) -> list[str]:
+    """SQS から届いたジョブを実行する（ワーカー Lambda 用）。再配信させるメッセージIDを返す。"""
+    failed: list[str] = []
+    for record in records:
+        body = json.loads(record["body"])
+        try:
+            asyncio.run(_run_job(body["taskId"], {"task": body["task"], "created_at": body["createdAt"]}))
+        except Exception as e:
+            logger.error("タスク %s の実行エラー（再配信します）: %s", body.get("taskId"), e, exc_info=True)
+            failed.append(record["messageId"])
+    return failed
+
+async def recover_unfinished_tasks(min_age_seconds: float) -> int:
+    """queued / running のまま min_age_seconds 以上更新がないタスクを投入し直し、その件数を返す。
+
+    プロセス内のキューでは再起動で失われたジョブを起動時に、SQS ではワーカーが落ちて
+    再配信も尽きたジョブを定期実行で拾う。別のプロセスが実行中のタスクを奪わないよう、
+    min_age_seconds はワーカーが1つのタスクに掛ける最長時間より長くすること。
+    """
+    tasks = await run_blocking(firestore_service.list_by_status, UNFINISHED_STATUSES)
+    threshold = datetime.now(timezone.utc) - timedelta(seconds=min_age_seconds)
+    count = 0
+    for task in tasks:
+        updated_at = task.get("updatedAt")
+        if updated_at and datetime.fromisoformat(updated_at) > threshold:
+            continue
+        task_id = task["taskId"]
+        # 読み取った後に他のワーカーが取った（更新した）タスクは投入し直さない
+        if not await run_blocking(
+            firestore_service.transition, task_id, task["status"], "queued", updated_at or ""
+        ):
+            continue
+        try:
+            await task_queue.submit(task_id, {"task": task["task"], "created_at": task.get("created_at")})
+        except TaskQueueFull:
+            logger.warning("待ち行列が満杯のため、残りのタスクは次の機会に投入し直します")
+            break
+        count += 1
+    if count:
+        logger.info("未完了のタスクを %d 件投入し直しました", count)
+    return count
+
+def _first_failed_node(values: dict[str, Any]) -> Optional[int]:
+    """出力がない最初のノードの位置（後続のノードは前段の失敗でスキップされている）。"""
+    for i, (_, key) in enumerate(PIPELINE):
+        if not values.get(key):
+            return i
+    return None
+
+def resume_task(task_id: str) -> TaskResponse:
+    """保存済みのチェックポイントから、最初に失敗したノード以降だけを実行し直す。"""
+    task = firestore_service.get(task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    if agent_graph.checkpointer is None:
+        raise HTTPException(status_code=409, detail="チェックポイントが無効なため再開できません")
+
+    config = thread_config(task_id)
+    snapshot = agent_graph.get_state(config)
+    if not snapshot.values:
+        raise HTTPException(status_code=409, detail="このタスクのチェックポイントがありません")
+
+    with admission_lane("background"):
+        if snapshot.next:
+            # 途中で止まった実行（タイムアウトなど）はそのまま続きから
+            logger.info("タスク %s: %s から再開します", task_id, ", ".join(snapshot.next))
+            result = agent_graph.invoke(None, config)
+        else:
+            failed = _first_failed_node(snapshot.values)
+            if failed is None:
+                raise HTTPException(status_code=409, detail="再開が必要な失敗ノードがありません")
+            logger.info("タスク %s: %s から再開します", task_id, PIPELINE[failed][0])
+            if failed == 0:
+                result = agent_graph.invoke(
+                    {"original_task": snapshot.values["original_task"], "error": None}, config
+                )
+            else:
+                # 直前のノードが書き込んだことにして、次に失敗したノードが実行されるようにする
+                config = agent_graph.update_state(
+                    config, {"error": None}, as_node=PIPELINE[failed - 1][0]
+                )
+                result = agent_graph.invoke(None, config)
+
+    return _save_result(task_id, task["task"], result, task.get("created_at"))
+
+def discard_checkpoints(task_id: str) -> None:
+    if agent_graph.checkpointer is not None:
+        agent_graph.checkpointer.delete_thread(task_id)
+
 async def process_task_streaming(
         task_id:str,
         task:str,
@@ -52,18 +216,20 @@ async def process_task_streaming(
         ):
     final_state = None
     try:
-        async for chunk in agent_graph.astream(
-            {
-            "original_task":task
-            },
-            stream_mode="updates"
-        ):
-            logger.info("[stream] チャンク受信: %s", list(chunk.keys()))
-            await callback(task_id,chunk)
-            if final_state is None:
-                final_state = chunk
-            else:
-                final_state.update(chunk)
+        with admission_lane("background"):
+            async for chunk in agent_graph.astream(
+                {
+                "original_task":task
+                },
+                thread_config(task_id),
+                stream_mode="updates"
+            ):
+                logger.info("[stream] チャンク受信: %s", list(chunk.keys()))
+                await callback(task_id,chunk)
+                if final_state is None:
+                    final_state = chunk
+                else:
+                    final_state.update(chunk)
     except Exception as e:
         logger.error("[stream] エラー: %s", e, exc_info=True)
         error_chunk = {"error": str(e)}
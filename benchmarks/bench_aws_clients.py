@@ -0,0 +1,55 @@
+"""AWS クライアント生成コストのマイクロベンチマーク。
+
+リクエストごとに boto3.client / boto3.resource を作っていた従来の方式と、
+app/core/aws_clients.py のレジストリ経由で共有クライアントを取得する方式で、
+1リクエストあたりのオーバーヘッドを比較する（ネットワーク通信は発生しない）。
+
+    python -m benchmarks.bench_aws_clients [回数]
+"""
+import os
+import sys
+import time
+
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "bench")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "bench")
+
+import boto3  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.core.aws_clients import get_client, get_dynamodb_table  # noqa: E402
+
+SERVICES = ["bedrock-agent-runtime", "s3", "bedrock-agent"]
+
+
+def _per_request_legacy() -> None:
+    for service in SERVICES:
+        boto3.client(service, region_name=settings.AWS_REGION)
+    boto3.resource("dynamodb", region_name=settings.AWS_REGION).Table("bench")
+
+
+def _per_request_registry() -> None:
+    for service in SERVICES:
+        get_client(service)
+    get_dynamodb_table("bench")
+
+
+def _measure(func, iterations: int) -> float:
+    func()  # 初回（モデル読み込みなど）はウォームアップとして除外
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - started) / iterations * 1000
+
+
+def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    legacy = _measure(_per_request_legacy, iterations)
+    registry = _measure(_per_request_registry, iterations)
+    print(f"iterations: {iterations}")
+    print(f"per-request (boto3.client 毎回生成): {legacy:8.3f} ms")
+    print(f"per-request (共有レジストリ)       : {registry:8.3f} ms")
+    print(f"speedup: {legacy / registry:,.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,14 @@ from aws_cdk import (
     Stack, Duration, RemovalPolicy, CfnOutput, BundlingOptions,
     aws_cognito as cognito,
     aws_dynamodb as dynamodb,
+    aws_events as events,
+    aws_events_targets as targets,
     aws_lambda as _lambda,
     aws_apigateway as apigw,
     aws_iam as iam,
+    aws_lambda_event_sources as lambda_event_sources,
     aws_s3 as s3,
+    aws_sqs as sqs,
     aws_ssm as ssm,
 )
 from constructs import Construct
@@ -19,6 +23,8 @@ class RagKnowledgeAssistantStack(Stack):
         bedrock_model_id = self.node.try_get_context("bedrock_model_id") or "anthropic.claude-sonnet-4-20250514"
         s3_bucket_name = self.node.try_get_context("s3_documents_bucket_name") or "rag-app-documents"
         amplify_domain = self.node.try_get_context("amplify_domain") or ""
+        # 一覧用 GSI は scripts/backfill_list_keys.py の実行後に有効にする（-c list_index_name=byCreatedAt）
+        list_index_name = self.node.try_get_context("list_index_name") or ""
 
         # ---- Cognito ----
         user_pool = cognito.UserPool(
@@ -53,6 +59,7 @@ class RagKnowledgeAssistantStack(Stack):
                 allowed_methods=[s3.HttpMethods.GET, s3.HttpMethods.PUT],
                 allowed_origins=["*"],
                 allowed_headers=["*"],
+                exposed_headers=["ETag"],  # マルチパートの完了に必要
             )],
         )
 
@@ -79,6 +86,30 @@ class RagKnowledgeAssistantStack(Stack):
             billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
         )
 
+        # 一覧を新しい順に取得するための GSI（listKey は全アイテム共通の固定値）
+        documents_table.add_global_secondary_index(
+            index_name="byCreatedAt",
+            partition_key=dynamodb.Attribute(
+                name="listKey", type=dynamodb.AttributeType.STRING
+            ),
+            sort_key=dynamodb.Attribute(
+                name="createdAt", type=dynamodb.AttributeType.STRING
+            ),
+            projection_type=dynamodb.ProjectionType.INCLUDE,
+            non_key_attributes=["name", "uploadedAt", "status"],
+        )
+        tasks_table.add_global_secondary_index(
+            index_name="byCreatedAt",
+            partition_key=dynamodb.Attribute(
+                name="listKey", type=dynamodb.AttributeType.STRING
+            ),
+            sort_key=dynamodb.Attribute(
+                name="createdAt", type=dynamodb.AttributeType.STRING
+            ),
+            projection_type=dynamodb.ProjectionType.INCLUDE,
+            non_key_attributes=["task", "status", "total_minutes", "total_days"],
+        )
+
         connections_table = dynamodb.Table(
             self,
             "ConnectionsTable",
@@ -90,6 +121,125 @@ class RagKnowledgeAssistantStack(Stack):
             billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
         )
 
+        cache_table = dynamodb.Table(
+            self,
+            "CacheTable",
+            table_name="rag-cache",
+            partition_key=dynamodb.Attribute(
+                name="cacheKey", type=dynamodb.AttributeType.STRING
+            ),
+            time_to_live_attribute="expiresAt",
+            removal_policy=RemovalPolicy.DESTROY,
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+        )
+
+        ingestion_table = dynamodb.Table(
+            self,
+            "IngestionStateTable",
+            table_name="rag-ingestion-state",
+            partition_key=dynamodb.Attribute(
+                name="stateKey", type=dynamodb.AttributeType.STRING
+            ),
+            removal_policy=RemovalPolicy.DESTROY,
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+        )
+
+        content_hash_table = dynamodb.Table(
+            self,
+            "ContentHashTable",
+            table_name="rag-content-hashes",
+            partition_key=dynamodb.Attribute(
+                name="contentHash", type=dynamodb.AttributeType.STRING
+            ),
+            removal_policy=RemovalPolicy.DESTROY,
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+        )
+
+        checkpoint_table = dynamodb.Table(
+            self,
+            "CheckpointTable",
+            table_name="rag-task-checkpoints",
+            partition_key=dynamodb.Attribute(
+                name="threadId", type=dynamodb.AttributeType.STRING
+            ),
+            sort_key=dynamodb.Attribute(
+                name="sortKey", type=dynamodb.AttributeType.STRING
+            ),
+            time_to_live_attribute="expiresAt",
+            removal_policy=RemovalPolicy.DESTROY,
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+        )
+
+        # ---- SQS（タスク分析の非同期実行）----
+        # 可視性タイムアウトはワーカー Lambda のタイムアウトより長くする
+        task_dlq = sqs.Queue(
+            self,
+            "TaskDeadLetterQueue",
+            queue_name="rag-task-dlq",
+            retention_period=Duration.days(14),
+        )
+        task_queue = sqs.Queue(
+            self,
+            "TaskQueue",
+            queue_name="rag-task-queue",
+            visibility_timeout=Duration.minutes(16),
+            dead_letter_queue=sqs.DeadLetterQueue(max_receive_count=3, queue=task_dlq),
+        )
+
+        # ---- Lambda 共通（コードと環境変数）----
+        code = _lambda.Code.from_asset(
+            "..",
+            exclude=[
+                "cdk", "cdk.out",
+                "venv", ".venv",
+                "__pycache__", "**/__pycache__",
+                "*.pyc",
+                ".git", ".github",
+                ".pytest_cache",
+                "tests", "test_data", "benchmarks",
+                "docs", "spec",
+                "logs",
+                "uploads",
+                "chroma_data", "chroma_test",
+                ".grepai", ".vscode", ".claude",
+                ".DS_Store", "**/.DS_Store",
+                "Dockerfile", "docker-compose.yml",
+                ".env", ".env.example",
+                ".dockerignore", ".gitignore", ".mcp.json",
+                "AGENTS.md",
+            ],
+            bundling=BundlingOptions(
+                image=_lambda.Runtime.PYTHON_3_12.bundling_image,
+                command=[
+                    "bash", "-c",
+                    " && ".join([
+                        "pip install -r requirements.txt -t /asset-output",
+                        "cp -r app /asset-output/",
+                        "cp lambda_handler.py /asset-output/",
+                    ]),
+                ],
+            ),
+        )
+
+        environment = {
+            "AWS_REGION_NAME": "ap-northeast-1",
+            "BEDROCK_KB_ID": bedrock_kb_id,
+            "BEDROCK_DATA_SOURCE_ID": bedrock_datasource_id,
+            "BEDROCK_MODEL_ID": bedrock_model_id,
+            "S3_DOCUMENTS_BUCKET": s3_bucket_name,
+            "DYNAMODB_DOCUMENTS_TABLE": documents_table.table_name,
+            "DYNAMODB_TASKS_TABLE": tasks_table.table_name,
+            "DYNAMODB_CONNECTIONS_TABLE": connections_table.table_name,
+            "DYNAMODB_CACHE_TABLE": cache_table.table_name,
+            "ANSWER_CACHE_BACKEND": "dynamodb",
+            "DYNAMODB_INGESTION_TABLE": ingestion_table.table_name,
+            "DYNAMODB_CONTENT_HASH_TABLE": content_hash_table.table_name,
+            "DYNAMODB_CHECKPOINT_TABLE": checkpoint_table.table_name,
+            "LIST_INDEX_NAME": list_index_name,
+            "TASK_QUEUE_URL": task_queue.queue_url,
+            "CORS_ALLOWED_ORIGIN": f"https://{amplify_domain}" if amplify_domain else "http://localhost:3000",
+        }
+
         # ---- Lambda (REST API) ----
         rest_lambda = _lambda.Function(
             self,
@@ -97,69 +247,63 @@ class RagKnowledgeAssistantStack(Stack):
             function_name="rag-rest-api",
             runtime=_lambda.Runtime.PYTHON_3_12,
             handler="lambda_handler.handler",
-            code=_lambda.Code.from_asset(
-                "..",
-                exclude=[
-                    "cdk", "cdk.out",
-                    "venv", ".venv",
-                    "__pycache__", "**/__pycache__",
-                    "*.pyc",
-                    ".git", ".github",
-                    ".pytest_cache",
-                    "tests", "test_data",
-                    "docs", "spec",
-                    "logs",
-                    "uploads",
-                    "chroma_data", "chroma_test",
-                    ".grepai", ".vscode", ".claude",
-                    ".DS_Store", "**/.DS_Store",
-                    "Dockerfile", "docker-compose.yml",
-                    ".env", ".env.example",
-                    ".dockerignore", ".gitignore", ".mcp.json",
-                    "AGENTS.md",
-                ],
-                bundling=BundlingOptions(
-                    image=_lambda.Runtime.PYTHON_3_12.bundling_image,
-                    command=[
-                        "bash", "-c",
-                        " && ".join([
-                            "pip install -r requirements.txt -t /asset-output",
-                            "cp -r app /asset-output/",
-                            "cp lambda_handler.py /asset-output/",
-                        ]),
-                    ],
-                ),
-            ),
+            code=code,
             timeout=Duration.seconds(60),
             memory_size=512,
-            environment={
-                "AWS_REGION_NAME": "ap-northeast-1",
-                "BEDROCK_KB_ID": bedrock_kb_id,
-                "BEDROCK_DATA_SOURCE_ID": bedrock_datasource_id,
-                "BEDROCK_MODEL_ID": bedrock_model_id,
-                "S3_DOCUMENTS_BUCKET": s3_bucket_name,
-                "DYNAMODB_DOCUMENTS_TABLE": documents_table.table_name,
-                "DYNAMODB_TASKS_TABLE": tasks_table.table_name,
-                "DYNAMODB_CONNECTIONS_TABLE": connections_table.table_name,
-                "CORS_ALLOWED_ORIGIN": f"https://{amplify_domain}" if amplify_domain else "http://localhost:3000",
-            },
+            environment=environment,
+        )
+
+        # ---- Lambda (タスク分析ワーカー) ----
+        # REST API の 60 秒に収まらないタスク分析（POST /tasks?async=true）を SQS から受け取って実行する
+        task_worker_lambda = _lambda.Function(
+            self,
+            "TaskWorkerLambda",
+            function_name="rag-task-worker",
+            runtime=_lambda.Runtime.PYTHON_3_12,
+            handler="lambda_handler.handler",
+            code=code,
+            timeout=Duration.minutes(15),
+            memory_size=512,
+            environment=environment,
         )
+        task_worker_lambda.add_event_source(lambda_event_sources.SqsEventSource(
+            task_queue, batch_size=1, report_batch_item_failures=True,
+        ))
 
         # ---- IAM ポリシー ----
-        documents_table.grant_read_write_data(rest_lambda)
-        tasks_table.grant_read_write_data(rest_lambda)
-        connections_table.grant_read_write_data(rest_lambda)
+        for function in (rest_lambda, task_worker_lambda):
+            documents_table.grant_read_write_data(function)
+            tasks_table.grant_read_write_data(function)
+            connections_table.grant_read_write_data(function)
+            cache_table.grant_read_write_data(function)
+            ingestion_table.grant_read_write_data(function)
+            content_hash_table.grant_read_write_data(function)
+            checkpoint_table.grant_read_write_data(function)
 
-        documents_bucket.grant_read_write(rest_lambda)
+            documents_bucket.grant_read_write(function)
 
-        rest_lambda.add_to_role_policy(iam.PolicyStatement(
-            actions=[
-                "bedrock:InvokeModel",
-                "bedrock:Retrieve",
-                "bedrock:StartIngestionJob",
-            ],
-            resources=["*"],
-        ))
+            function.add_to_role_policy(iam.PolicyStatement(
+                actions=[
+                    "bedrock:InvokeModel",
+                    "bedrock:Retrieve",
+                    "bedrock:StartIngestionJob",
+                    "bedrock:GetIngestionJob",
+                ],
+                resources=["*"],
+            ))
+
+        # REST API は受け付けたタスクと、定期実行で見つけた未完了のタスクを送る
+        task_queue.grant_send_messages(rest_lambda)
+
+        # ---- EventBridge ----
+        # Lambda ではレスポンス後にタイマーが凍結されるため、保留中の KB 同期は定期実行で開始する
+        # （未完了のまま残ったタスクの投入し直しも同じ定期実行で行う）
+        events.Rule(
+            self,
+            "IngestionSchedulerRule",
+            schedule=events.Schedule.rate(Duration.minutes(1)),
+            targets=[targets.LambdaFunction(rest_lambda)],
+        )
 
         # ---- API Gateway ----
         cognito_authorizer = apigw.CognitoUserPoolsAuthorizer(
@@ -1,4 +1,25 @@
+import asyncio
+
 from mangum import Mangum
+from app.config import settings
 from app.main import app
+from app.services.document_service import ingestion_scheduler
+from app.services.task_service import recover_unfinished_tasks, run_queued_messages
+
+_http_handler = Mangum(app, lifespan="off")
+
 
-handler = Mangum(app, lifespan="off")
+def handler(event, context):
+    # EventBridge の定期実行: Lambda ではタイマーが動かないので、保留中の KB 同期をここで開始する。
+    # 実行されないまま残ったタスクもここで SQS に投入し直す
+    if event.get("source") == "aws.events":
+        ingestion_scheduler.run_pending()
+        if settings.TASK_QUEUE_URL:
+            asyncio.run(recover_unfinished_tasks(settings.task_stale_seconds))
+        return {"status": "ok"}
+    # SQS（タスク分析のワーカー Lambda）
+    records = event.get("Records") or []
+    if records and records[0].get("eventSource") == "aws:sqs":
+        failed = run_queued_messages(records)
+        return {"batchItemFailures": [{"itemIdentifier": message_id} for message_id in failed]}
+    return _http_handler(event, context)
@@ -0,0 +1,85 @@
+"""一覧用 GSI（listKey + createdAt）導入前に書き込まれたアイテムに listKey / createdAt を補う。
+
+GET /documents と GET /tasks は LIST_INDEX_NAME の GSI を query するため、
+この2属性を持たないアイテムは一覧に出てこない。次の順で切り替えること。
+
+1. GSI を追加した版をデプロイする（LIST_INDEX_NAME は空のまま = scan でページング）
+2. このスクリプトを実行する（何度実行してもよい。既に値があるアイテムは変更しない）
+3. LIST_INDEX_NAME=byCreatedAt を設定して再デプロイする（cdk deploy -c list_index_name=byCreatedAt）
+
+    python -m scripts.backfill_list_keys [--dry-run]
+"""
+import sys
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from app.config import settings
+from app.core.aws_clients import get_dynamodb_table
+from app.core.pagination import LIST_KEY
+
+# 作成日時が分からないアイテムは一覧の末尾に並べる
+UNKNOWN_CREATED_AT = "1970-01-01T00:00:00+00:00"
+
+
+def _created_at(item: dict[str, Any], source_field: str) -> str:
+    """createdAt と同じ形式（UTC の ISO 8601）に揃える。"""
+    value: Optional[str] = item.get(source_field)
+    if not value:
+        return UNKNOWN_CREATED_AT
+    try:
+        parsed = datetime.fromisoformat(str(value))
+    except ValueError:
+        return UNKNOWN_CREATED_AT
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).isoformat()
+
+
+def backfill(table_name: str, key_name: str, source_field: str, dry_run: bool) -> int:
+    """listKey か createdAt が欠けているアイテムを更新し、更新した件数を返す。"""
+    table = get_dynamodb_table(table_name)
+    params: dict[str, Any] = {
+        "FilterExpression": "attribute_not_exists(listKey) OR attribute_not_exists(createdAt)",
+        "ProjectionExpression": "#key, #source, createdAt",
+        "ExpressionAttributeNames": {"#key": key_name, "#source": source_field},
+    }
+    updated = 0
+    while True:
+        response = table.scan(**params)
+        for item in response.get("Items", []):
+            updated += 1
+            if dry_run:
+                continue
+            # 実行中に書き込まれた値は上書きしない
+            table.update_item(
+                Key={key_name: item[key_name]},
+                UpdateExpression=(
+                    "SET listKey = :listKey, createdAt = if_not_exists(createdAt, :createdAt)"
+                ),
+                ExpressionAttributeValues={
+                    ":listKey": LIST_KEY,
+                    ":createdAt": item.get("createdAt") or _created_at(item, source_field),
+                },
+            )
+        last_key = response.get("LastEvaluatedKey")
+        if not last_key:
+            return updated
+        params["ExclusiveStartKey"] = last_key
+
+
+def main() -> None:
+    dry_run = "--dry-run" in sys.argv[1:]
+    targets = [
+        # (テーブル, パーティションキー, createdAt の元にする属性)
+        (settings.DYNAMODB_DOCUMENTS_TABLE, "docId", "uploadedAt"),
+        (settings.DYNAMODB_TASKS_TABLE, "taskId", "created_at"),
+    ]
+    for table_name, key_name, source_field in targets:
+        if not table_name:
+            continue
+        count = backfill(table_name, key_name, source_field, dry_run)
+        print(f"{table_name}: {count} 件{'（dry-run）' if dry_run else ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import json
+
+from app.services.metadata_store import SQLiteContentHashStore
+
+
+def test_ref_counting(tmp_path):
+    store = SQLiteContentHashStore(tmp_path / "metadata.db")
+
+    assert store.add_ref("h") is None
+    assert store.create("h", "documents/a.pdf", "a") is True
+    assert store.create("h", "documents/b.pdf", "b") is False
+    assert store.add_ref("h") == {"s3Key": "documents/a.pdf", "docId": "a", "refCount": 2}
+    assert store.release("h")["refCount"] == 1
+    assert store.release("h")["refCount"] == 0
+    # 最後の参照を外したら、同じ内容を新しく登録できる
+    assert store.add_ref("h") is None
+    assert store.release("h") is None
+    assert store.create("h", "documents/b.pdf", "b") is True
+
+
+def test_updates_from_separate_connections_are_not_lost(tmp_path):
+    path = tmp_path / "metadata.db"
+    first, second = SQLiteContentHashStore(path), SQLiteContentHashStore(path)
+    first.create("h", None, "a")
+    for _ in range(10):
+        first.add_ref("h")
+        second.add_ref("h")
+
+    assert second.release("h")["refCount"] == 20
+
+
+def test_migrates_legacy_json(tmp_path):
+    legacy = tmp_path / "content_hashes.json"
+    legacy.write_text(json.dumps({
+        "h1": {"s3Key": "documents/a.pdf", "docId": "a", "refCount": 2},
+        "h2": {"s3Key": "documents/b.pdf", "docId": "b", "refCount": 0},
+    }))
+    store = SQLiteContentHashStore(tmp_path / "metadata.db", legacy_json=legacy)
+
+    assert store.add_ref("h1")["refCount"] == 3
+    assert store.add_ref("h2") is None
+    assert not legacy.exists()
+    assert (tmp_path / "content_hashes.json.migrated").exists()
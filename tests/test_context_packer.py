@@ -0,0 +1,55 @@
+from langchain_core.documents import Document
+
+from app.core.context_packer import ContextPacker, estimate_tokens, truncate_to_tokens
+
+
+def _packer(token_budget: int) -> ContextPacker:
+    return ContextPacker(
+        token_budget=token_budget,
+        dedup_threshold=0.8,
+        shingle_size=5,
+        num_perm=64,
+        mmr_enabled=False,
+        mmr_lambda=0.7,
+    )
+
+
+def _doc(text: str, score: float) -> Document:
+    return Document(page_content=text, metadata={"score": score})
+
+
+def test_truncate_to_tokens():
+    assert truncate_to_tokens("あいうえお", 3) == "あいう"
+    assert estimate_tokens(truncate_to_tokens("abcd" * 100, 10)) == 10
+    assert truncate_to_tokens("short", 100) == "short"
+
+
+def test_top_chunk_over_budget_is_truncated_not_dropped():
+    result = _packer(100).pack([_doc("あ" * 2000, 0.9)])
+
+    assert result.stats.selected == 1
+    assert result.stats.over_budget_dropped == 0
+    assert result.stats.packed_tokens == 100
+    assert result.documents[0].page_content == "あ" * 100
+    assert result.documents[0].metadata["truncated"] is True
+
+
+def test_top_chunk_is_kept_and_lower_chunks_fill_remaining_budget():
+    docs = [_doc("い" * 30, 0.5), _doc("あ" * 2000, 0.9), _doc("う" * 10, 0.1)]
+    result = _packer(100).pack(docs)
+
+    # 最上位が予算を使い切るので、残りは予算超過で落ちる
+    assert [d.page_content[0] for d in result.documents] == ["あ"]
+    assert result.stats.over_budget_dropped == 2
+
+    result = _packer(50).pack([_doc("あ" * 20, 0.9), _doc("い" * 20, 0.5), _doc("う" * 20, 0.1)])
+    assert [d.page_content[0] for d in result.documents] == ["あ", "い"]
+    assert result.stats.packed_tokens == 40
+
+
+def test_near_duplicates_are_dropped():
+    text = "検索拡張生成はドキュメントを検索してから回答を生成する手法です。" * 3
+    result = _packer(1000).pack([_doc(text, 0.9), _doc(text + "。", 0.8)])
+
+    assert result.stats.duplicates_dropped == 1
+    assert result.stats.selected == 1
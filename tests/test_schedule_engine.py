@@ -0,0 +1,129 @@
+from datetime import date
+
+import pytest
+
+from app.agents.schedule_engine import (
+    WorkingHours,
+    build_schedule,
+    pack_days,
+    topological_order,
+)
+
+MONDAY = date(2025, 1, 6)
+
+
+def _hours(**overrides) -> WorkingHours:
+    values = dict(
+        day_start=9 * 60,
+        day_end=18 * 60,
+        lunch_start=12 * 60,
+        lunch_end=13 * 60,
+        break_minutes=0,
+        min_segment_minutes=30,
+    )
+    values.update(overrides)
+    return WorkingHours(**values)
+
+
+def _slots(schedule):
+    return [
+        (e["subtask_id"], e["scheduled_date"], e["scheduled_time"], e["duration_minutes"])
+        for e in schedule
+    ]
+
+
+def test_pack_days_fills_blocks_in_order():
+    schedule = pack_days(["a", "b"], {"a": 60, "b": 90}, _hours(), MONDAY)
+
+    assert _slots(schedule) == [
+        ("a", "2025-01-06", "09:00", 60),
+        ("b", "2025-01-06", "10:00", 90),
+    ]
+
+
+def test_pack_days_splits_across_lunch_and_days():
+    schedule = pack_days(["a"], {"a": 600}, _hours(), MONDAY)
+
+    assert _slots(schedule) == [
+        ("a", "2025-01-06", "09:00", 180),
+        ("a", "2025-01-06", "13:00", 300),
+        ("a", "2025-01-07", "09:00", 120),
+    ]
+
+
+def test_pack_days_skips_weekends_and_holidays():
+    friday = date(2025, 1, 10)
+    hours = _hours(holidays={date(2025, 1, 13)})
+    schedule = pack_days(["a"], {"a": 600}, hours, friday)
+
+    assert [e["scheduled_date"] for e in schedule] == ["2025-01-10", "2025-01-10", "2025-01-14"]
+
+
+def test_pack_days_does_not_split_into_short_segments():
+    # 午前の残り20分には置かず、午後のブロックから始める
+    schedule = pack_days(["a", "b"], {"a": 160, "b": 60}, _hours(), MONDAY)
+
+    assert _slots(schedule)[1] == ("b", "2025-01-06", "13:00", 60)
+
+
+def test_pack_days_never_emits_zero_minute_entries():
+    schedule = pack_days(["a", "b"], {"a": 180, "b": 60}, _hours(min_segment_minutes=0), MONDAY)
+
+    assert _slots(schedule) == [
+        ("a", "2025-01-06", "09:00", 180),
+        ("b", "2025-01-06", "13:00", 60),
+    ]
+
+
+def test_pack_days_inserts_breaks_between_tasks():
+    schedule = pack_days(["a", "b"], {"a": 60, "b": 60}, _hours(break_minutes=10), MONDAY)
+
+    assert schedule[1]["scheduled_time"] == "10:10"
+
+
+@pytest.mark.parametrize("overrides", [
+    dict(day_start=18 * 60, day_end=9 * 60),
+    dict(lunch_start=9 * 60, lunch_end=18 * 60),
+    dict(day_start=9 * 60, day_end=9 * 60 + 20),
+])
+def test_working_hours_without_usable_block_is_rejected(overrides):
+    with pytest.raises(ValueError):
+        _hours(**overrides)
+
+
+def test_topological_order_respects_dependencies_then_priority():
+    order, cyclic = topological_order(
+        ["a", "b", "c"], {"a": ["c"]}, {"a": 1, "b": 3, "c": 2}
+    )
+
+    assert order == ["c", "a", "b"]
+    assert cyclic == []
+
+
+def test_topological_order_places_cycles_by_priority():
+    order, cyclic = topological_order(
+        ["a", "b", "c"], {"a": ["b"], "b": ["a"]}, {"a": 2, "b": 1, "c": 3}
+    )
+
+    assert order == ["c", "b", "a"]
+    assert cyclic == ["b", "a"]
+
+
+def test_build_schedule_reports_cycles_and_missing_data():
+    result = build_schedule(
+        subtasks=[
+            {"id": "a", "dependencies": ["b"]},
+            {"id": "b", "dependencies": ["a", "zzz"]},
+        ],
+        estimates=[{"subtask_id": "a", "estimated_minutes": 30}],
+        priorities=[{"subtask_id": "a", "priority": "最高"}],
+        start=MONDAY,
+        hours=_hours(),
+    )
+
+    assert [e["subtask_id"] for e in result["schedule"]] == ["a", "b"]
+    assert result["total_days"] == 1
+    warnings = "\n".join(result["warnings"])
+    assert "循環" in warnings
+    assert "zzz" in warnings
+    assert "b の見積もりがない" in warnings